@@ -0,0 +1,102 @@
+""" Benchmark catch-up of ticks after the clock jumped ahead.
+
+Log lines are generated like in `bench_log_converter.py`, spread over ten minutes, and
+processed. The clock then jumps one week ahead (e.g. set by NTP, or device suspended)
+and inactivity is checked. Time needed to catch up with the current tick is compared
+to the former behavior, reproduced below, where every missed minute was processed as
+a tick. Each run uses a new SQLite database in a temporary folder.
+
+Usage: python dev_tools/bench_catch_up.py
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from bench_ingestion import use_new_database
+from bench_log_converter import PACKAGES_CONF, generate_lines
+
+from offspot_metrics_backend.business import processor as processor_module
+from offspot_metrics_backend.business.caddy_log_converter import (
+    CaddyLogConverter,
+    ProcessingResult,
+)
+from offspot_metrics_backend.business.indicators import ALL_INDICATORS
+from offspot_metrics_backend.business.kpis import ALL_KPIS
+from offspot_metrics_backend.business.period import Tick
+from offspot_metrics_backend.business.processor import Processor
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.constants import BackendConf, logger
+
+NB_LINES = 10_000
+JUMP_SECONDS = 7 * 24 * 3600
+
+
+class FakeNow:
+    """Current time, as returned by `Now`, but set by the benchmark"""
+
+    timestamp = 0
+
+    def __call__(self) -> "FakeNow":
+        return self
+
+
+class FormerProcessor(Processor):
+    """Processor processing every missed minute as a tick, as formerly done"""
+
+    def check_for_inactivity(self):
+        with self.lock:
+            now = processor_module.Now().timestamp
+            if not self.last_tick_processed:
+                self.last_tick_processed = Tick(now)
+            while Tick(now) != self.last_tick_processed:
+                next_tick = self.last_tick_processed.get_next()
+                self._process_natural_tick(now=next_tick.ts)
+                self.last_action = now
+
+
+def measure(name: str, processor: Processor, results: list[ProcessingResult]) -> float:
+    """Log and return duration of the catch-up, in seconds"""
+    fake_now = FakeNow()
+    processor_module.Now = fake_now
+    with tempfile.TemporaryDirectory() as folder:
+        use_new_database(Path(folder))
+        processor.startup()
+        processor.indicator_processor.indicators = [
+            type(indicator)() for indicator in ALL_INDICATORS
+        ]
+        processor.kpi_processor.kpis = [type(kpi)() for kpi in ALL_KPIS]
+        for result in results:
+            if result.ts:
+                fake_now.timestamp = int(result.ts)
+            processor.process_inputs(result)
+
+        fake_now.timestamp += JUMP_SECONDS
+        start = time.perf_counter()
+        processor.check_for_inactivity()
+        duration = time.perf_counter() - start
+
+    logger.info(
+        f"{name:>8}: {duration * 1e3:>10.1f} ms, {processor.tick_stats()['ticks']}"
+        " ticks processed"
+    )
+    return duration
+
+
+def main():
+    BackendConf.package_conf_file_location = str(PACKAGES_CONF)
+    config = ReverseProxyConfig()
+    config.parse_configuration()
+    converter = CaddyLogConverter(config)
+
+    results = [
+        converter.process(line) for line in generate_lines(NB_LINES, duration=600)
+    ]
+
+    baseline = measure("former", FormerProcessor(), results)
+    current = measure("current", Processor(), results)
+    logger.info(f"{'speedup':>8}: {baseline / current:>10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+""" Benchmark conversion of batches of log lines in worker processes.
+
+Log lines are generated like in `bench_log_converter.py` and grouped in batches of
+`LOGWATCHER_BATCH_MAX_LINES` lines. Throughput (lines/second) of the conversion in the
+current process is compared to the conversion in a pool of 1 to 4 worker processes,
+batches being handled in order in the current process. Workers are started before
+measures.
+
+Scaling obviously depends on the number of CPU cores available.
+
+Usage: python dev_tools/bench_converter_pool.py
+"""
+
+import os
+import time
+from pathlib import Path
+
+from bench_log_converter import NB_LINES, PACKAGES_CONF, generate_lines
+
+from offspot_metrics_backend.business.caddy_log_converter import CaddyLogConverter
+from offspot_metrics_backend.business.converter_pool import ConverterPool
+from offspot_metrics_backend.business.log_watcher import NewLinesEvent
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.constants import BackendConf, logger
+
+MAX_WORKERS = 4
+
+
+def main():
+    BackendConf.package_conf_file_location = str(PACKAGES_CONF)
+    config = ReverseProxyConfig()
+    config.parse_configuration()
+
+    lines = generate_lines(NB_LINES, duration=3600)
+    batch_size = BackendConf.logwatcher_batch_max_lines
+    events = [
+        NewLinesEvent(
+            file_path=Path("access.log"),
+            lines=lines[start : start + batch_size],
+            offsets=list(range(start, start + batch_size)),
+        )
+        for start in range(0, len(lines), batch_size)
+    ]
+    logger.info(
+        f"{len(lines)} lines in batches of {batch_size} lines,"
+        f" {os.cpu_count()} CPU cores"
+    )
+
+    converter = CaddyLogConverter(config)
+    start = time.perf_counter()
+    for event in events:
+        converter.process_many(event.lines)
+    baseline = len(lines) / (time.perf_counter() - start)
+    logger.info(f"{'in process':>12}: {baseline:>10.0f} lines/s")
+
+    handled: list[int] = []
+    for workers in range(1, MAX_WORKERS + 1):
+        pool = ConverterPool(
+            converter=CaddyLogConverter(config),
+            config=config,
+            workers=workers,
+            handler=lambda event, _: handled.append(len(event.lines)),
+        )
+        # start all workers
+        for _ in range(workers):
+            pool.submit(events[0])
+        pool.flush()
+        handled.clear()
+
+        start = time.perf_counter()
+        for event in events:
+            pool.submit(event)
+        pool.flush()
+        throughput = sum(handled) / (time.perf_counter() - start)
+        pool.close()
+        logger.info(
+            f"{workers:>4} workers: {throughput:>10.0f} lines/s"
+            f" ({throughput / baseline:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
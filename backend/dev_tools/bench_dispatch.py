@@ -0,0 +1,101 @@
+""" Benchmark dispatch of inputs to indicators as the number of indicators grows.
+
+Log lines are generated like in `bench_log_converter.py`, spread over one hour, and
+converted once. Inputs are passed one by one to all indicators, plus additional
+indicators processing another type of input (standing for indicators to come).
+Dispatch through the input type table is compared to the former behavior, reproduced
+below, where every input was passed to every indicator.
+
+Usage: python dev_tools/bench_dispatch.py
+"""
+
+import time
+from dataclasses import dataclass
+
+from bench_log_converter import NB_LINES, PACKAGES_CONF, ROUNDS, generate_lines
+
+from offspot_metrics_backend.business.caddy_log_converter import CaddyLogConverter
+from offspot_metrics_backend.business.indicators import ALL_INDICATORS
+from offspot_metrics_backend.business.indicators.dimensions import DimensionsValues
+from offspot_metrics_backend.business.indicators.indicator import Indicator
+from offspot_metrics_backend.business.indicators.processor import Processor
+from offspot_metrics_backend.business.indicators.recorder import (
+    IntCounterRecorder,
+    Recorder,
+)
+from offspot_metrics_backend.business.inputs.input import Input
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.constants import BackendConf, logger
+
+NB_INDICATORS = [len(ALL_INDICATORS), 10, 25, 50, 100]
+
+
+@dataclass(frozen=True, slots=True)
+class OtherInput(Input):
+    """An input never generated from log lines"""
+
+
+class OtherIndicator(Indicator):
+    """An indicator processing other inputs only"""
+
+    unique_id = -1
+    input_types = (OtherInput,)
+
+    def get_new_recorder(self) -> Recorder:
+        return IntCounterRecorder()
+
+    def get_dimensions_values(self, input_: Input) -> DimensionsValues:  # noqa: ARG002
+        return DimensionsValues(None, None, None)
+
+
+class FormerProcessor(Processor):
+    """Processor passing every input to every indicator, as formerly done"""
+
+    def process_input(self, input_: Input) -> None:
+        for indicator in self.indicators:
+            try:
+                indicator.process_input(input_=input_)
+            except Exception as exc:
+                logger.warning(
+                    f"Error processing input for indicator {indicator.unique_id}",
+                    exc_info=exc,
+                )
+
+
+def measure(processor_type: type[Processor], nb: int, inputs: list[Input]) -> float:
+    """Return best duration of the update of `nb` indicators, in seconds"""
+    durations: list[float] = []
+    for _ in range(ROUNDS):
+        processor = processor_type()
+        processor.indicators = [type(indicator)() for indicator in ALL_INDICATORS] + [
+            OtherIndicator() for _ in range(nb - len(ALL_INDICATORS))
+        ]
+        start = time.perf_counter()
+        for input_ in inputs:
+            processor.process_input(input_)
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def main():
+    BackendConf.package_conf_file_location = str(PACKAGES_CONF)
+    config = ReverseProxyConfig()
+    config.parse_configuration()
+    converter = CaddyLogConverter(config)
+
+    lines = generate_lines(NB_LINES, duration=3600)
+    inputs = [input_ for line in lines for input_ in converter.process(line).inputs]
+    logger.info(f"{len(lines)} lines, {len(inputs)} inputs")
+
+    for nb in NB_INDICATORS:
+        baseline = measure(FormerProcessor, nb, inputs)
+        current = measure(Processor, nb, inputs)
+        logger.info(
+            f"{nb:>4} indicators: former {baseline * 1e3:>8.1f} ms,"
+            f" dispatch table {current * 1e3:>8.1f} ms"
+            f" ({baseline / current:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
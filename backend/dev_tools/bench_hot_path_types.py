@@ -0,0 +1,119 @@
+""" Benchmark creation of the objects built for every log line.
+
+For every log line, one LogData is created along with one or two inputs. This compares
+time and memory needed to create these objects from the log line timestamp with their
+current definitions and with their former ones (validated pydantic dataclass for
+LogData, dataclasses without slots for inputs, datetime timestamps), which are
+reproduced below.
+
+Usage: python dev_tools/bench_hot_path_types.py
+"""
+
+import datetime
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from pydantic.dataclasses import dataclass as pydantic_dataclass
+
+from offspot_metrics_backend.business.inputs.package import (
+    PackageHomeVisit,
+    PackageRequest,
+)
+from offspot_metrics_backend.business.log_data import LogData
+from offspot_metrics_backend.constants import logger
+
+NB_LINES = 100000
+ROUNDS = 3
+
+
+@pydantic_dataclass
+class FormerLogData:
+    content_type: str | None
+    status: int
+    uri: str
+    method: str
+    ts: datetime.datetime
+    x_tfm_files_added: int | None
+    x_tfm_files_deleted: int | None
+
+
+@dataclass(eq=True, frozen=True)
+class FormerPackageHomeVisit:
+    package_title: str
+
+
+@dataclass(eq=True, frozen=True)
+class FormerPackageRequest:
+    ts: datetime.datetime
+    package_title: str
+
+
+def create_former(ts: float) -> list[object]:
+    """Create objects of one log line, with former definitions"""
+    log = FormerLogData(
+        content_type="text/html",
+        status=200,
+        uri="/content/wikipedia_en_all/",
+        method="GET",
+        ts=datetime.datetime.fromtimestamp(ts),
+        x_tfm_files_added=None,
+        x_tfm_files_deleted=None,
+    )
+    return [
+        log,
+        FormerPackageHomeVisit(package_title="Wikipedia"),
+        FormerPackageRequest(ts=log.ts, package_title="Wikipedia"),
+    ]
+
+
+def create_current(ts: float) -> list[object]:
+    """Create objects of one log line, with current definitions"""
+    log = LogData(
+        content_type="text/html",
+        status=200,
+        uri="/content/wikipedia_en_all/",
+        method="GET",
+        ts=int(ts),
+        x_tfm_files_added=None,
+        x_tfm_files_deleted=None,
+    )
+    return [
+        log,
+        PackageHomeVisit(package_title="Wikipedia"),
+        PackageRequest(ts=log.ts, package_title="Wikipedia"),
+    ]
+
+
+def measure(name: str, create: Callable[[float], list[object]]):
+    """Log time and memory needed to create objects of one log line"""
+    ts = time.time()
+
+    durations: list[float] = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(NB_LINES):
+            create(ts)
+        durations.append(time.perf_counter() - start)
+
+    # keep objects alive to measure the memory they use
+    tracemalloc.start()
+    objects = [create(ts) for _ in range(NB_LINES)]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+
+    logger.info(
+        f"{name:>8}: {min(durations) / NB_LINES * 1e6:>6.2f} µs/line,"
+        f" {allocated / NB_LINES:>6.0f} bytes/line"
+    )
+
+
+def main():
+    measure("former", create_former)
+    measure("current", create_current)
+
+
+if __name__ == "__main__":
+    main()
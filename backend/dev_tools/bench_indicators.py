@@ -0,0 +1,72 @@
+""" Benchmark dispatch of inputs to indicators.
+
+Log lines are generated like in `bench_log_converter.py`, spread over one hour, and
+converted once. This compares the time needed to update all indicators with inputs
+passed one by one, and with the columnar batch where identical inputs of the same
+minute are coalesced.
+
+Usage: python dev_tools/bench_indicators.py
+"""
+
+import time
+from collections.abc import Callable
+
+from bench_log_converter import NB_LINES, PACKAGES_CONF, ROUNDS, generate_lines
+
+from offspot_metrics_backend.business.caddy_log_converter import CaddyLogConverter
+from offspot_metrics_backend.business.indicators import ALL_INDICATORS
+from offspot_metrics_backend.business.indicators.processor import Processor
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
+from offspot_metrics_backend.business.inputs.input import Input
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.constants import BackendConf, logger
+
+
+def new_processor() -> Processor:
+    """Return an indicator processor with fresh instances of all indicators"""
+    processor = Processor()
+    processor.indicators = [type(indicator)() for indicator in ALL_INDICATORS]
+    return processor
+
+
+def measure(name: str, process: Callable[[Processor], None]) -> float:
+    """Log and return best duration of the update of all indicators, in seconds"""
+    durations: list[float] = []
+    for _ in range(ROUNDS):
+        processor = new_processor()
+        start = time.perf_counter()
+        process(processor)
+        durations.append(time.perf_counter() - start)
+    logger.info(f"{name:>10}: {min(durations) * 1e3:>8.1f} ms")
+    return min(durations)
+
+
+def process_inputs(processor: Processor, inputs: list[Input]) -> None:
+    """Pass inputs one by one to the indicators"""
+    for input_ in inputs:
+        processor.process_input(input_)
+
+
+def main():
+    BackendConf.package_conf_file_location = str(PACKAGES_CONF)
+    config = ReverseProxyConfig()
+    config.parse_configuration()
+    converter = CaddyLogConverter(config)
+
+    lines = generate_lines(NB_LINES, duration=3600)
+    inputs = [input_ for line in lines for input_ in converter.process(line).inputs]
+    batch: InputsBatch = converter.process_many(lines)
+    logger.info(
+        f"{len(lines)} lines, {len(inputs)} inputs,"
+        f" {len(batch.kinds)} coalesced batch entries"
+    )
+
+    baseline = measure("per input", lambda processor: process_inputs(processor, inputs))
+    current = measure(
+        "batch", lambda processor: processor.process_batch(batch, 0, len(batch.kinds))
+    )
+    logger.info(f"{'speedup':>10}: {baseline / current:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+""" Benchmark ingestion of log lines by the processor, line by line.
+
+Log lines are generated like in `bench_log_converter.py`, spread over ten minutes, and
+converted once. Throughput (lines/second) of `Processor.process_inputs` is compared
+to the former behavior, where a DB session was opened and committed for every line,
+reproduced below. Ticks are processed in both cases, each run using a new SQLite
+database in a temporary folder, and indicator records must be identical.
+
+Usage: python dev_tools/bench_ingestion.py
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from bench_log_converter import NB_LINES, PACKAGES_CONF, generate_lines
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from offspot_metrics_backend.business.caddy_log_converter import (
+    CaddyLogConverter,
+    ProcessingResult,
+)
+from offspot_metrics_backend.business.indicators import ALL_INDICATORS
+from offspot_metrics_backend.business.indicators.holder import Record
+from offspot_metrics_backend.business.kpis import ALL_KPIS
+from offspot_metrics_backend.business.processor import Processor
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.constants import BackendConf, logger
+from offspot_metrics_backend.db import Session as SessionMaker
+from offspot_metrics_backend.db import dbsession
+from offspot_metrics_backend.db.initializer import Initializer
+
+
+class FormerProcessor(Processor):
+    """Processor opening a DB session for every log line, as formerly done"""
+
+    @dbsession
+    def process_inputs(
+        self,
+        result: ProcessingResult,
+        session: Session,  # noqa: ARG002
+    ):
+        super().process_inputs(result)
+
+
+def use_new_database(folder: Path) -> None:
+    """Use a new SQLite database, with up-to-date schema"""
+    url = f"sqlite+pysqlite:///{folder.joinpath('metrics.db')}"
+    os.environ["DATABASE_URL"] = url
+    BackendConf.database_url = url
+    SessionMaker.configure(bind=create_engine(url, echo=False))
+    Initializer.upgrade_db_schema()
+
+
+def measure(
+    name: str, processor: Processor, results: list[ProcessingResult]
+) -> tuple[float, list[list[Record]]]:
+    """Log and return throughput of the processor, with final indicator records"""
+    with tempfile.TemporaryDirectory() as folder:
+        use_new_database(Path(folder))
+        processor.startup()
+        processor.indicator_processor.indicators = [
+            type(indicator)() for indicator in ALL_INDICATORS
+        ]
+        processor.kpi_processor.kpis = [type(kpi)() for kpi in ALL_KPIS]
+
+        start = time.perf_counter()
+        for result in results:
+            processor.process_inputs(result)
+        throughput = len(results) / (time.perf_counter() - start)
+
+    logger.info(f"{name:>10}: {throughput:>10.0f} lines/s")
+    return throughput, [
+        list(indicator.get_records())
+        for indicator in processor.indicator_processor.indicators
+    ]
+
+
+def main():
+    BackendConf.package_conf_file_location = str(PACKAGES_CONF)
+    config = ReverseProxyConfig()
+    config.parse_configuration()
+    converter = CaddyLogConverter(config)
+
+    results = [
+        converter.process(line) for line in generate_lines(NB_LINES, duration=600)
+    ]
+
+    baseline, former_records = measure("former", FormerProcessor(), results)
+    current, records = measure("current", Processor(), results)
+    logger.info(f"{'speedup':>10}: {current / baseline:>10.1f}x")
+    logger.info(f"{'identical':>10}: {records == former_records}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+""" Benchmark conversion of Caddy log lines into inputs.
+
+Lines are either read from a real Caddy log file passed as argument, or generated to
+look like real Caddy access logs: a mix of requests to configured packages, requests
+to hosts which are not configured, and other Caddy messages.
+
+Throughput (lines/second) of the converter is compared to decoding every line with
+the complete pydantic model, which was the only decoding path before the fast decoding
+path was introduced. Generated lines are also measured by kind, with the inputs cache
+disabled, so that no kind of line is slower to convert than with the pydantic model.
+
+Usage: python dev_tools/bench_log_converter.py [caddy_log_file]
+"""
+
+import json
+import random
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from offspot_metrics_backend.business.caddy_log_converter import (
+    CaddyLogConverter,
+    ProcessingResult,
+    decode_log_model,
+    orjson,
+)
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.constants import BackendConf, logger
+
+PACKAGES_CONF = Path(__file__).parent.parent.joinpath(
+    "tests/unit/conf_files/conf_ok.yaml"
+)
+NB_LINES = 100000
+NB_LINES_BY_KIND = 30000
+ROUNDS = 3
+
+
+def caddy_line(
+    host: str, uri: str, msg: str = "handled request", ts: float | None = None
+) -> str:
+    """Return a Caddy log line, with as much noise as real Caddy logs"""
+    return json.dumps(
+        {
+            "level": "info",
+            "ts": ts or time.time(),
+            "logger": "http.log.access.log0",
+            "msg": msg,
+            "request": {
+                "remote_ip": "167.94.145.58",
+                "remote_port": "33716",
+                "proto": "HTTP/1.1",
+                "method": "GET",
+                "host": host,
+                "uri": uri,
+                "headers": {
+                    "User-Agent": [
+                        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_7_0) AppleWebKit"
+                        "/535.11 (KHTML, like Gecko) Chrome/17.0.963.56 Safari/535.11"
+                    ],
+                    "Accept-Encoding": ["gzip"],
+                    "Referer": [f"http://{host}/"],
+                },
+            },
+            "user_id": "",
+            "duration": 0.000123,
+            "size": 506,
+            "status": 200,
+            "resp_headers": {
+                "Server": ["Caddy"],
+                "Etag": ['"rzvxcle2"'],
+                "Content-Type": ["text/html; charset=utf-8"],
+                "Last-Modified": ["Thu, 24 Aug 2023 07:41:09 GMT"],
+                "Accept-Ranges": ["bytes"],
+                "Content-Length": ["506"],
+            },
+        },
+        separators=(",", ":"),
+    )
+
+
+# Kinds of generated lines, with their weight in the mix and their generator
+LINE_KINDS: dict[str, tuple[int, Callable[[float], str]]] = {
+    "configured host": (
+        60,
+        lambda ts: caddy_line(
+            "kiwix.renaud.test", f"/content/wikipedia_en_all/A/{ts}", ts=ts
+        ),
+    ),
+    "configured host (/)": (10, lambda ts: caddy_line("nomad.renaud.test", "/", ts=ts)),
+    "unknown host": (
+        20,
+        lambda ts: caddy_line("captive.renaud.test", "/assets/logo.png", ts=ts),
+    ),
+    "other msg": (
+        10,
+        lambda ts: caddy_line("kiwix.renaud.test", "/", msg="NOP", ts=ts),
+    ),
+}
+
+
+def generate_lines(nb_lines: int, duration: float = 0) -> list[str]:
+    """Generate a realistic mix of Caddy log lines
+
+    Lines timestamps are spread over `duration` seconds, ending now.
+    """
+    generators = list(LINE_KINDS.values())
+    weights = [weight for weight, _ in generators]
+    start = time.time() - duration
+    return [
+        generator(start + duration * index / nb_lines)
+        for index, (_, generator) in enumerate(
+            random.choices(generators, weights=weights, k=nb_lines)  # noqa: S311
+        )
+    ]
+
+
+def process_with_model(converter: CaddyLogConverter, line: str) -> ProcessingResult:
+    """Convert a line by decoding it with the pydantic model only"""
+    decoded = decode_log_model(line)
+    if isinstance(decoded, ProcessingResult):
+        return decoded
+    host, log_data = decoded
+    inputs = [
+        input_
+        for generator in converter.generators
+        if generator.host == host
+        for input_ in generator.process(log_data)
+    ]
+    return ProcessingResult(inputs=inputs, ts=log_data.ts, warning=None)
+
+
+def measure(name: str, lines: list[str], process: Callable[[str], object]) -> float:
+    """Print and return best throughput of a conversion function, in lines/second"""
+    best = min(timed(lines, process) for _ in range(ROUNDS))
+    throughput = len(lines) / best
+    logger.info(f"{name:>20}: {throughput:>10.0f} lines/s")
+    return throughput
+
+
+def timed(lines: list[str], process: Callable[[str], object]) -> float:
+    """Return duration of the conversion of all lines, in seconds"""
+    start = time.perf_counter()
+    for line in lines:
+        process(line)
+    return time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) > 1:
+        lines = Path(sys.argv[1]).read_text().splitlines()
+    else:
+        lines = generate_lines(NB_LINES)
+
+    BackendConf.package_conf_file_location = str(PACKAGES_CONF)
+    config = ReverseProxyConfig()
+    config.parse_configuration()
+    converter = CaddyLogConverter(config)
+
+    logger.info(f"{len(lines)} lines, JSON backend: {'orjson' if orjson else 'json'}")
+    baseline = measure(
+        "pydantic model", lines, lambda line: process_with_model(converter, line)
+    )
+    current = measure("converter", lines, converter.process)
+    logger.info(f"{'speedup':>20}: {current / baseline:>10.1f}x")
+
+    # by kind of line, without cache, every line being actually decoded
+    uncached = CaddyLogConverter(config, cache_max_size=0)
+    start = time.time()
+    for kind, (_, generator) in LINE_KINDS.items():
+        kind_lines = [generator(start + index) for index in range(NB_LINES_BY_KIND)]
+        logger.info(f"{kind} lines")
+        baseline = measure(
+            "pydantic model",
+            kind_lines,
+            lambda line: process_with_model(uncached, line),
+        )
+        current = measure("converter", kind_lines, uncached.process)
+        logger.info(f"{'speedup':>20}: {current / baseline:>10.1f}x")
+        # converter also counts lines dropped, which costs a few percents
+        if current < baseline * 0.9:
+            logger.warning(f"{kind} lines are slower to convert than with the model")
+
+
+if __name__ == "__main__":
+    main()
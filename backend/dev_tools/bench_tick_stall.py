@@ -0,0 +1,84 @@
+""" Benchmark ingestion stall time at every tick.
+
+Log lines are generated like in `bench_log_converter.py`, spread over one hour, and
+converted once. They are then processed line by line, with ticks persisted either
+synchronously, as formerly done, or on the tick worker. For both, ingestion stall
+time per tick (time during which the processor lock is held to process the tick) and
+overall throughput are reported. Each run uses a new SQLite database in a temporary
+folder, and indicator records must be identical.
+
+Usage: python dev_tools/bench_tick_stall.py
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from bench_ingestion import use_new_database
+from bench_log_converter import NB_LINES, PACKAGES_CONF, generate_lines
+
+from offspot_metrics_backend.business.caddy_log_converter import (
+    CaddyLogConverter,
+    ProcessingResult,
+)
+from offspot_metrics_backend.business.indicators import ALL_INDICATORS
+from offspot_metrics_backend.business.indicators.holder import Record
+from offspot_metrics_backend.business.kpis import ALL_KPIS
+from offspot_metrics_backend.business.processor import Processor
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.constants import BackendConf, logger
+
+
+def measure(
+    name: str, results: list[ProcessingResult], *, use_worker: bool
+) -> list[list[Record]]:
+    """Log stall times and throughput, returning final indicator records"""
+    processor = Processor()
+    with tempfile.TemporaryDirectory() as folder:
+        use_new_database(Path(folder))
+        processor.startup()
+        processor.indicator_processor.indicators = [
+            type(indicator)() for indicator in ALL_INDICATORS
+        ]
+        processor.kpi_processor.kpis = [type(kpi)() for kpi in ALL_KPIS]
+        if use_worker:
+            processor.start_tick_worker()
+
+        start = time.perf_counter()
+        for result in results:
+            processor.process_inputs(result)
+        ingest_duration = time.perf_counter() - start
+        processor.stop_tick_worker()
+        total_duration = time.perf_counter() - start
+
+    stats = processor.tick_stats()
+    logger.info(
+        f"{name:>8}: {stats['ticks']} ticks,"
+        f" stall {float(stats['total_stall_ms']) / float(stats['ticks']):.3f}ms/tick"
+        f" (max {stats['max_stall_ms']}ms),"
+        f" {len(results) / ingest_duration:.0f} lines/s ingested,"
+        f" {len(results) / total_duration:.0f} lines/s persisted"
+    )
+    return [
+        list(indicator.get_records())
+        for indicator in processor.indicator_processor.indicators
+    ]
+
+
+def main():
+    BackendConf.package_conf_file_location = str(PACKAGES_CONF)
+    config = ReverseProxyConfig()
+    config.parse_configuration()
+    converter = CaddyLogConverter(config)
+
+    results = [
+        converter.process(line) for line in generate_lines(NB_LINES, duration=3600)
+    ]
+
+    former_records = measure("sync", results, use_worker=False)
+    records = measure("worker", results, use_worker=True)
+    logger.info(f"{'identical':>8}: {records == former_records}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
-import datetime
-from typing import NamedTuple
+import json
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, replace
+from typing import Any, NamedTuple
 
 from pydantic import BaseModel, Field, ValidationError
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    # orjson is an optional dependency, standard json module is used without it
+    orjson = None
+
 from offspot_metrics_backend.business.input_generator import (
     CommonInputGenerator,
     EdupiInputGenerator,
@@ -11,9 +19,29 @@ from offspot_metrics_backend.business.input_generator import (
     InputGenerator,
     ZimInputGenerator,
 )
-from offspot_metrics_backend.business.inputs.input import Input
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
+from offspot_metrics_backend.business.inputs.input import Input, TimedInput
 from offspot_metrics_backend.business.log_data import LogData
+from offspot_metrics_backend.business.lru_cache import LruCache
 from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.business.telemetry import Metrics
+from offspot_metrics_backend.constants import BackendConf, logger
+
+# Fastest JSON decoding function available
+json_loads: Callable[[str], Any] = orjson.loads if orjson else json.loads
+
+# Message of Caddy logs which are access logs, the only ones we are interested in
+HANDLED_REQUEST_MSG = "handled request"
+LEVEL_INFO_TOKEN = '"level":"info"'  # as written by Caddy in JSON log lines
+
+# Reasons why log lines do not generate any input, by processing warning
+DROP_REASONS = {
+    "JSON parsing failed": "invalid_json",
+    "Unexpected log level": "wrong_level",
+    "Unexpected log msg": "wrong_msg",
+    None: "unknown_host",  # access log of a host which is not configured
+}
+ALL_DROP_REASONS = [*DROP_REASONS.values(), "no_inputs", "conversion_failed"]
 
 
 class CaddyLogRequest(BaseModel):
@@ -45,27 +73,169 @@ class CaddyLog(BaseModel):
     ts: float
 
 
+@dataclass
+class ConversionCounters:
+    """Counters of a converter, so that they can be passed between processes"""
+
+    lines: int
+    drops: dict[str, int]
+    generator_hits: dict[str, int]
+    cache_hits: int
+    cache_misses: int
+
+
 class ProcessingResult(NamedTuple):
     inputs: list[Input]
-    ts: datetime.datetime | None
+    ts: int | None  # seconds since Unix epoch
     warning: str | None
 
 
+def first_value(values: list[str] | None) -> str | None:
+    """Return first value of a response header, if any"""
+    return values[0] if values and len(values) > 0 else None
+
+
+def first_int_value(values: list[str] | None) -> int | None:
+    """Return first value of a response header as an int, if any"""
+    value = first_value(values)
+    return int(value) if value is not None else None
+
+
+def decode_log_model(line: str) -> tuple[str, LogData] | ProcessingResult:
+    """Decode a Caddy JSON log line with the (complete but slower) pydantic model
+
+    Returns the request host with the log data, or a result with a warning when the
+    log line is not an access log.
+    """
+    try:
+        log = CaddyLog.model_validate_json(line)
+    except ValidationError:
+        return ProcessingResult(inputs=[], ts=None, warning="JSON parsing failed")
+
+    if log.level != "info":
+        return ProcessingResult(inputs=[], ts=None, warning="Unexpected log level")
+
+    if log.msg != HANDLED_REQUEST_MSG:
+        return ProcessingResult(inputs=[], ts=None, warning="Unexpected log msg")
+
+    return log.request.host, LogData(
+        content_type=first_value(log.resp_headers.content_type),
+        status=log.status,
+        uri=log.request.uri,
+        method=log.request.method,
+        ts=int(log.ts),
+        x_tfm_files_added=first_int_value(log.resp_headers.x_tfm_files_added),
+        x_tfm_files_deleted=first_int_value(log.resp_headers.x_tfm_files_deleted),
+    )
+
+
+def is_str_list(value: Any) -> bool:
+    """Whether value is a list of strings"""
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def decode_log_fast(line: str) -> tuple[str, LogData] | None:
+    """Decode only the fields needed from a Caddy access log line, without model
+
+    This only supports lines having exactly the expected structure and types, i.e.
+    lines which would be accepted as-is by the pydantic model. None is returned in
+    all other cases, so that the line is decoded with the pydantic model (which is
+    more tolerant and reports appropriate warnings). Lines which are obviously not
+    info-level access logs, as written by Caddy, are not even decoded, so that they are
+    decoded only once.
+    """
+    if LEVEL_INFO_TOKEN not in line or HANDLED_REQUEST_MSG not in line:
+        return None
+    try:
+        data = json_loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    request = data.get("request")
+    headers = data.get("resp_headers")
+    if not isinstance(request, dict) or not isinstance(headers, dict):
+        return None
+    host = request.get("host")
+    uri = request.get("uri")
+    method = request.get("method")
+    status = data.get("status")
+    ts = data.get("ts")
+    if (
+        data.get("level") != "info"
+        or data.get("msg") != HANDLED_REQUEST_MSG
+        or not isinstance(host, str)
+        or not isinstance(uri, str)
+        or not isinstance(method, str)
+        or not isinstance(status, int)
+        or not isinstance(ts, int | float)
+        or isinstance(status, bool)
+        or isinstance(ts, bool)
+    ):
+        return None
+    content_type = headers.get("Content-Type")
+    files_added = headers.get("X-Tfm-Files-Added")
+    files_deleted = headers.get("X-Tfm-Files-Deleted")
+    for values in (content_type, files_added, files_deleted):
+        if values is not None and not is_str_list(values):
+            return None
+    return host, LogData(
+        content_type=first_value(content_type),
+        status=status,
+        uri=uri,
+        method=method,
+        ts=int(ts),
+        x_tfm_files_added=first_int_value(files_added),
+        x_tfm_files_deleted=first_int_value(files_deleted),
+    )
+
+
 class CaddyLogConverter:
-    """Converts logs received from Caddy reverse proxy into inputs to process"""
+    """Converts logs received from Caddy reverse proxy into inputs to process
+
+    Log lines are decoded once, with a fast path extracting only the fields needed
+    from access logs, and falling back to the complete pydantic model for other lines.
+    Access logs of hosts which are not configured are then dropped.
+
+    Inputs generated for a given request (host, method, URI, status and shared files
+    headers) are cached, so that repeated requests skip input generators: inputs
+    being immutable, they are reused as-is for requests of the same second, and only
+    timed inputs are re-created otherwise. The cache is cleared every time the
+    converter is configured.
+
+    Number of lines processed, of lines dropped by reason, and of lines for which
+    every input generator produced inputs are counted, see `stats`.
+    """
+
+    def __init__(
+        self,
+        config: ReverseProxyConfig,
+        cache_max_size: int = BackendConf.classification_cache_max_size,
+    ) -> None:
+        # timestamp, inputs generated by a request and names of generators which
+        # produced them, by host, method, uri, status and headers
+        self.cache: LruCache[
+            tuple[str, str, str, int, int | None, int | None],
+            tuple[int, list[Input], list[str]],
+        ] = LruCache(max_size=cache_max_size)
+        self.lines = 0
+        self.drops = dict.fromkeys(ALL_DROP_REASONS, 0)
+        self.configure(config)
 
-    def __init__(self, config: ReverseProxyConfig) -> None:
+    def configure(self, config: ReverseProxyConfig) -> None:
+        """Build input generators of a given package configuration"""
+        self.cache.clear()
         self.generators: list[InputGenerator] = []
         for file in config.files:
             self.generators.append(
                 FilesInputGenerator(host=file.host, package_title=file.title)
             )
+        zims_by_host: dict[str, dict[str, list[str]]] = {}
         for zim in config.zims:
-            self.generators.append(
-                ZimInputGenerator(
-                    host=zim.host, zim_name=zim.zim_name, package_title=zim.title
-                )
-            )
+            zims = zims_by_host.setdefault(zim.host, {})
+            zims.setdefault(zim.zim_name, []).append(zim.title)
+        for host, zims in zims_by_host.items():
+            self.generators.append(ZimInputGenerator(host=host, zims=zims))
         for app in config.apps:
             if app.ident == "edupi.offspot.kiwix.org":
                 self.generators.append(
@@ -79,51 +249,119 @@ class CaddyLogConverter:
                 self.generators.append(
                     CommonInputGenerator(host=app.host, package_title=app.title),
                 )
+        # Generators of every host, so that a line is passed only to generators of
+        # its host with a single lookup ; generators order is preserved
+        self.generators_by_host: dict[str, list[InputGenerator]] = {}
+        for generator in self.generators:
+            self.generators_by_host.setdefault(generator.host, []).append(generator)
+        # all keys are set upfront, so that stats can be read from another thread
+        self.generator_hits = {generator.name: 0 for generator in self.generators}
+
+    def stats(self) -> Metrics:
+        """Current conversion metrics"""
+        return {
+            "lines": self.lines,
+            **{f"dropped_{reason}": count for reason, count in self.drops.items()},
+            **{f"hits_{name}": count for name, count in self.generator_hits.items()},
+        }
+
+    def take_counters(self) -> ConversionCounters:
+        """Return current counters and reset them"""
+        counters = ConversionCounters(
+            lines=self.lines,
+            drops=dict(self.drops),
+            generator_hits=dict(self.generator_hits),
+            cache_hits=self.cache.hits,
+            cache_misses=self.cache.misses,
+        )
+        self.lines = self.cache.hits = self.cache.misses = 0
+        self.drops = dict.fromkeys(self.drops, 0)
+        self.generator_hits = dict.fromkeys(self.generator_hits, 0)
+        return counters
+
+    def add_counters(self, counters: ConversionCounters) -> None:
+        """Add counters of another converter, e.g. running in another process"""
+        self.lines += counters.lines
+        for reason, count in counters.drops.items():
+            if reason in self.drops:
+                self.drops[reason] += count
+        for name, count in counters.generator_hits.items():
+            if name in self.generator_hits:
+                self.generator_hits[name] += count
+        self.cache.hits += counters.cache_hits
+        self.cache.misses += counters.cache_misses
+
+    def _dropped(self, result: ProcessingResult) -> ProcessingResult:
+        """Count a line which was dropped before reaching input generators"""
+        self.drops[DROP_REASONS.get(result.warning, "invalid_json")] += 1
+        return result
 
     def process(self, line: str) -> ProcessingResult:
         """Transform one Caddy log line into corresponding inputs"""
 
-        try:
-            log = CaddyLog.model_validate_json(line)
-            del line
-        except ValidationError:
-            return ProcessingResult(inputs=[], ts=None, warning="JSON parsing failed")
-
-        if log.level != "info":
-            return ProcessingResult(inputs=[], ts=None, warning="Unexpected log level")
-
-        if log.msg != "handled request":
-            return ProcessingResult(inputs=[], ts=None, warning="Unexpected log msg")
-
-        ts = datetime.datetime.fromtimestamp(log.ts)
-        log_data = LogData(
-            content_type=(
-                log.resp_headers.content_type[0]
-                if log.resp_headers.content_type
-                and len(log.resp_headers.content_type) > 0
-                else None
-            ),
-            status=log.status,
-            uri=log.request.uri,
-            method=log.request.method,
-            ts=ts,
-            x_tfm_files_added=(
-                int(log.resp_headers.x_tfm_files_added[0])
-                if log.resp_headers.x_tfm_files_added
-                and len(log.resp_headers.x_tfm_files_added) > 0
-                else None
-            ),
-            x_tfm_files_deleted=(
-                int(log.resp_headers.x_tfm_files_deleted[0])
-                if log.resp_headers.x_tfm_files_deleted
-                and len(log.resp_headers.x_tfm_files_deleted) > 0
-                else None
-            ),
+        self.lines += 1
+        decoded = decode_log_fast(line) or decode_log_model(line)
+        del line
+        if isinstance(decoded, ProcessingResult):
+            return self._dropped(decoded)
+
+        host, log_data = decoded
+        generators = self.generators_by_host.get(host)
+        if not generators:
+            # logs whose host is not matching any generator host are ignored
+            return self._dropped(
+                ProcessingResult(inputs=[], ts=log_data.ts, warning=None)
+            )
+
+        key = (
+            host,
+            log_data.method,
+            log_data.uri,
+            log_data.status,
+            log_data.x_tfm_files_added,
+            log_data.x_tfm_files_deleted,
         )
-        inputs: list[Input] = []
-        for generator in self.generators:
-            if generator.host != log.request.host:
-                # ignore logs whose host are not matching the generator host
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached_ts, inputs, generator_names = cached
+            if cached_ts != log_data.ts:
+                inputs = [
+                    (
+                        replace(input_, ts=log_data.ts)
+                        if isinstance(input_, TimedInput)
+                        else input_
+                    )
+                    for input_ in inputs
+                ]
+                self.cache.put(key, (log_data.ts, inputs, generator_names))
+        else:
+            inputs, generator_names = [], []
+            for generator in generators:
+                if generated := generator.process(log_data):
+                    inputs.extend(generated)
+                    generator_names.append(generator.name)
+            self.cache.put(key, (log_data.ts, inputs, generator_names))
+
+        for name in generator_names:
+            self.generator_hits[name] += 1
+        if not inputs:
+            self.drops["no_inputs"] += 1
+        return ProcessingResult(inputs=list(inputs), ts=log_data.ts, warning=None)
+
+    def process_many(self, lines: Iterable[str]) -> InputsBatch:
+        """Transform many Caddy log lines into a columnar batch of inputs
+
+        The batch has one line per log line, even for lines which could not be
+        converted, so that positions of lines in the batch are preserved.
+        """
+        batch = InputsBatch()
+        for line in lines:
+            try:
+                result = self.process(line)
+            except Exception as exc:
+                logger.warning("Error converting log line", exc_info=exc)
+                self.drops["conversion_failed"] += 1
+                batch.add_line(ts=None, inputs=[])
                 continue
-            inputs.extend(generator.process(log_data))
-        return ProcessingResult(inputs=inputs, ts=ts, warning=None)
+            batch.add_line(ts=result.ts, inputs=result.inputs)
+        return batch
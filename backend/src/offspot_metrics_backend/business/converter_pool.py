@@ -0,0 +1,130 @@
+import multiprocessing
+import threading
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from offspot_metrics_backend.business.caddy_log_converter import (
+    CaddyLogConverter,
+    ConversionCounters,
+)
+from offspot_metrics_backend.business.ingest_queue import IngestQueue
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
+from offspot_metrics_backend.business.inputs.package import PACKAGE_TITLES
+from offspot_metrics_backend.business.log_watcher import NewLinesEvent
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.constants import logger
+
+# Batch of inputs converted in a worker, with package titles interned in the worker
+# and counters of the conversion
+type ConversionResult = tuple[InputsBatch, list[str], ConversionCounters]
+
+# Converter of the current worker process
+_worker_converter: CaddyLogConverter | None = None
+
+
+def init_worker(config: ReverseProxyConfig) -> None:
+    """Build the converter of a worker process"""
+    global _worker_converter  # noqa: PLW0603
+    _worker_converter = CaddyLogConverter(config)
+
+
+def convert_lines(lines: list[str]) -> ConversionResult:
+    """Convert log lines in a worker process"""
+    if not _worker_converter:
+        raise ValueError("Worker converter has not been initialized")
+    batch = _worker_converter.process_many(lines)
+    batch.coalesced.clear()  # not needed anymore, no need to pickle it
+    return batch, list(PACKAGE_TITLES.values), _worker_converter.take_counters()
+
+
+class ConverterPool:
+    """Converts batches of log lines in a pool of worker processes
+
+    JSON decoding and input generation are spread over `workers` processes, while
+    converted batches are passed to `handler` in the current process, in the order
+    in which they have been submitted, so that lines of every log file are still
+    processed in order. At most `max_pending` batches are converted at once.
+
+    When a worker fails, the batch is converted in the current process instead.
+
+    Once closed, batches are not submitted nor handled anymore.
+    """
+
+    def __init__(
+        self,
+        converter: CaddyLogConverter,
+        config: ReverseProxyConfig,
+        workers: int,
+        handler: Callable[[NewLinesEvent, InputsBatch], None],
+        max_pending: int | None = None,
+    ) -> None:
+        self.converter = converter
+        self.handler = handler
+        self.max_pending = max_pending or workers * 2
+        self.pending: deque[tuple[NewLinesEvent, Future[ConversionResult]]] = deque()
+        self.closed = False
+        # set while the pool is not consuming a queue
+        self.consume_stopped = threading.Event()
+        self.consume_stopped.set()
+        # workers are spawned since current process has many threads running
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(config,),
+        )
+
+    def submit(self, event: NewLinesEvent) -> None:
+        """Start the conversion of a batch of lines"""
+        while len(self.pending) >= self.max_pending and not self.closed:
+            self.complete_oldest()
+        if self.closed:
+            return
+        self.pending.append((event, self.executor.submit(convert_lines, event.lines)))
+
+    def complete_oldest(self) -> None:
+        """Wait for the conversion of the oldest batch and pass it to the handler"""
+        if self.closed or not self.pending:
+            return
+        event, future = self.pending.popleft()
+        try:
+            batch, package_titles, counters = future.result()
+            batch.remap_package_ids(package_titles)
+            self.converter.add_counters(counters)
+        except Exception as exc:
+            logger.warning("Error converting log lines in worker", exc_info=exc)
+            batch = self.converter.process_many(event.lines)
+        self.handler(event, batch)
+
+    def flush(self) -> None:
+        """Wait for the conversion of all batches and pass them to the handler"""
+        while self.pending and not self.closed:
+            self.complete_oldest()
+
+    def consume(self, queue: IngestQueue) -> None:
+        """Convert all batches of the queue, until the queue or the pool is closed"""
+        self.consume_stopped.clear()
+        try:
+            while not self.closed:
+                event = queue.get(timeout=0 if self.pending else None)
+                if event:
+                    self.submit(event)
+                elif queue.closed:
+                    break
+                else:
+                    # nothing else queued for now
+                    self.complete_oldest()
+        finally:
+            self.consume_stopped.set()
+
+    def close(self) -> None:
+        """Stop all workers, dropping batches not yet converted
+
+        The queue being consumed, if any, must have been closed already: the batch
+        being handled is completed first, so that workers are not stopped under it.
+        """
+        self.closed = True
+        self.consume_stopped.wait()
+        self.pending.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
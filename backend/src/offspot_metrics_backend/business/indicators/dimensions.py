@@ -1,5 +1,8 @@
 from dataclasses import dataclass
 
+from offspot_metrics_backend.business.inputs.package import PACKAGE_TITLES
+from offspot_metrics_backend.business.interner import Interner
+
 
 @dataclass(frozen=True)
 class DimensionsValues:
@@ -8,3 +11,23 @@ class DimensionsValues:
     value0: str | None
     value1: str | None
     value2: str | None
+
+
+# ids of dimensions values, recorders of indicators being keyed by these ids
+DIMENSIONS_IDS: Interner[DimensionsValues] = Interner()
+
+# id of dimensions values of indicators without dimension
+NO_DIMENSIONS_ID = DIMENSIONS_IDS.get_id(DimensionsValues(None, None, None))
+
+# ids of dimensions values made of the package title only, by package id
+_package_dimensions_ids: dict[int, int] = {}
+
+
+def get_package_dimensions_id(package_id: int) -> int:
+    """Return the id of dimensions values made of the title of a given package"""
+    dimensions_id = _package_dimensions_ids.get(package_id)
+    if dimensions_id is None:
+        dimensions_id = _package_dimensions_ids[package_id] = DIMENSIONS_IDS.get_id(
+            DimensionsValues(PACKAGE_TITLES.get_value(package_id), None, None)
+        )
+    return dimensions_id
@@ -1,11 +1,40 @@
 import abc
-from collections.abc import Generator
+from collections.abc import Callable, Generator, Iterable, Iterator
+from dataclasses import dataclass
 
-from offspot_metrics_backend.business.indicators.dimensions import DimensionsValues
+from offspot_metrics_backend.business.indicators.dimensions import (
+    DIMENSIONS_IDS,
+    DimensionsValues,
+)
 from offspot_metrics_backend.business.indicators.holder import Record, State
 from offspot_metrics_backend.business.indicators.recorder import Recorder
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
 from offspot_metrics_backend.business.inputs.input import Input
 
+# Method processing an input of an indicator
+type InputHandler = Callable[[Input], None]
+
+
+@dataclass
+class IndicatorSnapshot:
+    """Records and states of an indicator, frozen at a given time
+
+    Snapshots can be persisted like indicators, while the indicator keeps processing
+    inputs."""
+
+    unique_id: int
+    records: list[Record]
+    states: list[State]
+    restore_reopened_records: bool = True
+
+    def get_records(self) -> Iterator[Record]:
+        """Return all records, as frozen"""
+        return iter(self.records)
+
+    def get_states(self) -> Iterator[State]:
+        """Return all states, as frozen"""
+        return iter(self.states)
+
 
 class Indicator(abc.ABC):
     """A generic indicator interface
@@ -15,18 +44,44 @@ class Indicator(abc.ABC):
     indicator implementation. A recorder has an internal state with will allow to
     compute a record, i.e. a value for the associated dimensions values, typically for
     a given processing period.
+
+    Recorders are keyed by the id of their dimensions values (see `DIMENSIONS_IDS`),
+    dimensions values being resolved only to retrieve records and states.
     """
 
     unique_id = 1000  # this ID is unique to each kind of indicator
 
+    # types of inputs processed by the indicator, used to dispatch inputs ; indicators
+    # not declaring any type are passed all inputs
+    input_types: tuple[type[Input], ...] = ()
+
+    # whether recorders are restored from records of a period which is re-opened (when
+    # the clock went back), their values then replacing the stored ones when it is
+    # closed again ; indicators measuring time keep the greatest values instead, since
+    # same minutes are lived again
+    restore_reopened_records = True
+
     def __init__(self) -> None:
         super().__init__()
-        self.recorders: dict[DimensionsValues, Recorder] = {}
+        self.recorders: dict[int, Recorder] = {}
 
-    @abc.abstractmethod
     def can_process_input(self, input_: Input) -> bool:
         """Indicates if this indicator can process a given kind of input"""
-        ...  # pragma: no cover
+        return isinstance(input_, self.input_types)
+
+    def get_input_handler(self, input_type: type[Input]) -> InputHandler | None:
+        """Return the method to call for inputs of a given type, None if none
+
+        Inputs of declared types are recorded without checking them again, unless
+        `can_process_input` is overriden. Indicators which do not declare any input
+        type are passed every input."""
+        if not self.input_types:
+            return self.process_input
+        if not issubclass(input_type, self.input_types):
+            return None
+        if type(self).can_process_input is not Indicator.can_process_input:
+            return self.process_input
+        return self.record_input
 
     @abc.abstractmethod
     def get_dimensions_values(self, input_: Input) -> DimensionsValues:
@@ -34,6 +89,14 @@ class Indicator(abc.ABC):
         indicator dimensions as a tuple (or an empty tuple)."""
         ...  # pragma: no cover
 
+    def get_dimensions_id(self, input_: Input) -> int:
+        """For a given input (which can be processed), returns the id of the values
+        of each indicator dimensions.
+
+        Indicators can override it to avoid building and hashing dimensions values
+        for every input."""
+        return DIMENSIONS_IDS.get_id(self.get_dimensions_values(input_))
+
     @abc.abstractmethod
     def get_new_recorder(self) -> Recorder:
         """Gets a new recorder of appropriate type.
@@ -47,16 +110,37 @@ class Indicator(abc.ABC):
 
         Either return the already existing recorder whose dimensions values are
         matching, or creates a new recorder with appropriate dimension values"""
-        dimensions_values = self.get_dimensions_values(input_)
-        if dimensions_values not in self.recorders:
-            self.add_recorder(dimensions_values, self.get_new_recorder())
-        return self.recorders[dimensions_values]
+        return self.get_or_create_recorder_by_id(self.get_dimensions_id(input_))
+
+    def get_or_create_recorder_for(
+        self, dimensions_values: DimensionsValues
+    ) -> Recorder:
+        """Get or create the recorder of given dimension values"""
+        return self.get_or_create_recorder_by_id(
+            DIMENSIONS_IDS.get_id(dimensions_values)
+        )
+
+    def get_or_create_recorder_by_id(self, dimensions_id: int) -> Recorder:
+        """Get or create the recorder of given dimension values id"""
+        recorder = self.recorders.get(dimensions_id)
+        if recorder is None:
+            recorder = self.recorders[dimensions_id] = self.get_new_recorder()
+        return recorder
 
     def add_recorder(
         self, dimensions_values: DimensionsValues, recorder: Recorder
     ) -> None:
         """Add a recorder for given dimension values"""
-        self.recorders[dimensions_values] = recorder
+        self.recorders[DIMENSIONS_IDS.get_id(dimensions_values)] = recorder
+
+    def restore_records(self, records: Iterable[Record]) -> None:
+        """Restore recorders from records of a closed period, which is re-opened
+
+        Only recorders whose state is their value (i.e. counters) can be restored."""
+        for record in records:
+            recorder = self.get_new_recorder()
+            recorder.restore_state(f"{record.value}")
+            self.add_recorder(record.dimensions, recorder)
 
     def reset_state(self) -> None:
         """Reset the list of recorders.
@@ -68,8 +152,11 @@ class Indicator(abc.ABC):
         self,
     ) -> Generator[Record, None, None]:
         """Return all records (values with associated dimensions)."""
-        for dimensions_values, recorder in self.recorders.items():
-            yield Record(value=recorder.value, dimensions=dimensions_values)
+        for dimensions_id, recorder in self.recorders.items():
+            yield Record(
+                value=recorder.value,
+                dimensions=DIMENSIONS_IDS.get_value(dimensions_id),
+            )
 
     def get_states(
         self,
@@ -77,8 +164,19 @@ class Indicator(abc.ABC):
         """Return all states
 
         (internal state representation for each associated dimensions)."""
-        for dimensions_values, recorder in self.recorders.items():
-            yield State(value=recorder.state, dimensions=dimensions_values)
+        for dimensions_id, recorder in self.recorders.items():
+            yield State(
+                value=recorder.state, dimensions=DIMENSIONS_IDS.get_value(dimensions_id)
+            )
+
+    def snapshot(self) -> IndicatorSnapshot:
+        """Return a frozen copy of all records and states"""
+        return IndicatorSnapshot(
+            unique_id=self.unique_id,
+            records=list(self.get_records()),
+            states=list(self.get_states()),
+            restore_reopened_records=self.restore_reopened_records,
+        )
 
     def process_input(self, input_: Input) -> None:
         """Process a given input event
@@ -89,5 +187,24 @@ class Indicator(abc.ABC):
         """
         if not self.can_process_input(input_):
             return
-        record = self.get_or_create_recorder(input_)
-        record.process_input(input_=input_)
+        self.record_input(input_)
+
+    def record_input(self, input_: Input) -> None:
+        """Update the recorder matching an input, known to be processable"""
+        self.get_or_create_recorder(input_).process_input(input_=input_)
+
+    def process_batch(self, batch: InputsBatch, start: int, stop: int) -> None:
+        """Process inputs of a batch, in a given range of inputs
+
+        Inputs are processed one by one by default, indicators can override this to
+        process all inputs at once, with identical results. All inputs are processed
+        even if some fail, the first error being raised at the end.
+        """
+        error: Exception | None = None
+        for input_ in batch.get_inputs(start, stop):
+            try:
+                self.process_input(input_)
+            except Exception as exc:
+                error = error or exc
+        if error:
+            raise error
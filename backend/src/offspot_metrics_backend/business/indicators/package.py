@@ -1,11 +1,15 @@
 from typing import cast
 
-from offspot_metrics_backend.business.indicators.dimensions import DimensionsValues
+from offspot_metrics_backend.business.indicators.dimensions import (
+    DimensionsValues,
+    get_package_dimensions_id,
+)
 from offspot_metrics_backend.business.indicators.indicator import Indicator
 from offspot_metrics_backend.business.indicators.recorder import (
     IntCounterRecorder,
     Recorder,
 )
+from offspot_metrics_backend.business.inputs.batch import InputKind, InputsBatch
 from offspot_metrics_backend.business.inputs.input import Input
 from offspot_metrics_backend.business.inputs.package import (
     PackageHomeVisit as PackageHomeVisitInput,
@@ -16,9 +20,7 @@ class PackageHomeVisit(Indicator):
     """An indicator counting number of visit of a given package home page"""
 
     unique_id = 1001
-
-    def can_process_input(self, input_: Input) -> bool:
-        return isinstance(input_, PackageHomeVisitInput)
+    input_types = (PackageHomeVisitInput,)
 
     def get_new_recorder(self) -> Recorder:
         return IntCounterRecorder()
@@ -26,3 +28,16 @@ class PackageHomeVisit(Indicator):
     def get_dimensions_values(self, input_: Input) -> DimensionsValues:
         input_ = cast(PackageHomeVisitInput, input_)
         return DimensionsValues(input_.package_title, None, None)
+
+    def get_dimensions_id(self, input_: Input) -> int:
+        return get_package_dimensions_id(cast(PackageHomeVisitInput, input_).package_id)
+
+    def process_batch(self, batch: InputsBatch, start: int, stop: int) -> None:
+        """Process all home visits of a batch at once"""
+        for package_id, count in batch.count_by_package(
+            InputKind.PACKAGE_HOME_VISIT, start, stop
+        ).items():
+            recorder = self.get_or_create_recorder_by_id(
+                get_package_dimensions_id(package_id)
+            )
+            cast(IntCounterRecorder, recorder).process_count(count)
@@ -1,30 +1,90 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+
 from sqlalchemy.orm import Session
 
-from offspot_metrics_backend.business.indicators.indicator import Indicator
+from offspot_metrics_backend.business.indicators.indicator import (
+    Indicator,
+    IndicatorSnapshot,
+    InputHandler,
+)
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
 from offspot_metrics_backend.business.inputs.input import Input
 from offspot_metrics_backend.business.period import Period
 from offspot_metrics_backend.constants import logger
 from offspot_metrics_backend.db.persister import Persister
 
+# Indicators which may process a type of input, with the method to call
+type IndicatorHandlers = list[tuple[Indicator, InputHandler]]
+
+
+@dataclass
+class TickSnapshot:
+    """Indicators of a period, frozen at a clock tick to be persisted"""
+
+    period: Period
+    indicators: list[IndicatorSnapshot]
+    period_closed: bool  # records are persisted when closed, states otherwise
+
 
 class Processor:
     """A processor is responsible for transforming inputs into indicator records"""
 
     def __init__(self) -> None:
-        self.indicators: list[Indicator] = []
+        self.dispatch_table: dict[type[Input], IndicatorHandlers] = {}
+        self._indicators: tuple[Indicator, ...] = ()
         self.current_period: Period | None = None
 
+    @property
+    def indicators(self) -> tuple[Indicator, ...]:
+        """Indicators to update, which cannot be modified in place
+
+        Indicators are assigned at once, so that the dispatch table is reset."""
+        return self._indicators
+
+    @indicators.setter
+    def indicators(self, indicators: Iterable[Indicator]) -> None:
+        self._indicators = tuple(indicators)
+        self.dispatch_table.clear()
+
+    def get_input_handlers(self, input_type: type[Input]) -> IndicatorHandlers:
+        """Return indicators which may process a type of input, with their handler
+
+        Handlers are looked up once per input type, and then kept in the dispatch
+        table, so that every input is passed only to relevant indicators."""
+        handlers = self.dispatch_table.get(input_type)
+        if handlers is None:
+            handlers = self.dispatch_table[input_type] = [
+                (indicator, handler)
+                for indicator in self.indicators
+                if (handler := indicator.get_input_handler(input_type))
+            ]
+        return handlers
+
     def process_input(self, input_: Input) -> None:
-        """Update all indicators for a given input"""
-        for indicator in self.indicators:
+        """Update all relevant indicators for a given input"""
+        for indicator, handler in self.get_input_handlers(type(input_)):
             try:
-                indicator.process_input(input_=input_)
+                handler(input_)
             except Exception as exc:
                 logger.warning(
                     f"Error processing input for indicator {indicator.unique_id}",
                     exc_info=exc,
                 )
 
+    def process_batch(self, batch: InputsBatch, start: int, stop: int) -> None:
+        """Update all indicators for a range of inputs of a batch"""
+        if start == stop:
+            return
+        for indicator in self.indicators:
+            try:
+                indicator.process_batch(batch=batch, start=start, stop=stop)
+            except Exception as exc:
+                logger.warning(
+                    f"Error processing inputs for indicator {indicator.unique_id}",
+                    exc_info=exc,
+                )
+
     def reset_state(self) -> None:
         """Reset all indicators"""
         for indicator in self.indicators:
@@ -40,6 +100,17 @@ class Processor:
 
     def process_tick(self, tick_period: Period, session: Session) -> None:
         """Process a clock tick"""
+        snapshot = self.snapshot_tick(tick_period=tick_period)
+        if snapshot:
+            self.persist_tick(snapshot=snapshot, session=session)
+
+    def snapshot_tick(self, tick_period: Period) -> TickSnapshot | None:
+        """Process a clock tick in memory, returning what has to be persisted
+
+        Nothing has to be persisted when no indicator has any record. When the tick
+        closes the current period, records are frozen and indicators are reset, so
+        that inputs of the new period go to fresh recorders while the snapshot is
+        persisted."""
 
         # If we do not have a current period, then it means that we are starting from a
         # fresh DB, so let's set the current period to the tick one
@@ -51,34 +122,46 @@ class Processor:
         if not self.has_records_for_our_indicators:
             if self.current_period != tick_period:
                 self.current_period = tick_period
-            return
+            return None
 
-        # persist the current period in DB
-        db_period = Persister.persist_period(
-            period=self.current_period, session=session
+        snapshot = TickSnapshot(
+            period=self.current_period,
+            indicators=[indicator.snapshot() for indicator in self.indicators],
+            period_closed=self.current_period != tick_period,
         )
 
+        # if we changed of period, clear in-memory states
+        if snapshot.period_closed:
+            self.reset_state()
+            self.current_period = tick_period
+
+        return snapshot
+
+    @staticmethod
+    def persist_tick(snapshot: TickSnapshot, session: Session) -> None:
+        """Persist the snapshot of indicators taken at a clock tick"""
+
+        # persist the snapshot period in DB
+        db_period = Persister.persist_period(period=snapshot.period, session=session)
+
         # persist all indicators dimensions
         Persister.persist_indicator_dimensions(
-            indicators=self.indicators, session=session
+            indicators=snapshot.indicators, session=session
         )
 
         # clear former indicator states that have been saved previously
         Persister.clear_indicator_states(session)
 
-        # check if we are still in the same period or not
-        if self.current_period == tick_period:
-            # if we are in the same period, simply persist new states
-            Persister.persist_indicator_states(
-                period=db_period, indicators=self.indicators, session=session
+        if snapshot.period_closed:
+            # period is over, persist records
+            Persister.persist_indicator_records(
+                period=db_period, indicators=snapshot.indicators, session=session
             )
         else:
-            # otherwise, persist records and clear in-memory states
-            Persister.persist_indicator_records(
-                period=db_period, indicators=self.indicators, session=session
+            # if we are still in the same period, simply persist new states
+            Persister.persist_indicator_states(
+                period=db_period, indicators=snapshot.indicators, session=session
             )
-            self.reset_state()
-            self.current_period = tick_period
 
     def post_process_tick(self, tick_period: Period, session: Session):
         """Process a clock tick - cleanup after KPIs have been computed"""
@@ -97,6 +180,14 @@ class Processor:
         if not last_period:
             return
 
+        # states are stored only for the current period, which is not the last one
+        # when it has been re-opened since the clock went back
+        states_period = Persister.get_indicator_states_period(session)
+        if states_period:
+            self.current_period = states_period
+            self._restore_states(session)
+            return
+
         # check if we have indicator records for the last period ; if we have,
         # then it means that everything has been recorded, we do not need to restore
         # states (there are none anyway) and the current_period is the next after
@@ -107,13 +198,34 @@ class Processor:
             self.current_period = last_period.get_next()
             return
 
-        # set current period as the last one and restore state from DB
+        # set current period as the last one, there is no state to restore
         self.current_period = last_period
+
+    def _restore_states(self, session: Session) -> None:
+        """Restore indicator states of current period from DB"""
+        if not self.current_period:
+            return
         for indicator in self.indicators:
             states = Persister.get_restore_data(
-                last_period, indicator.unique_id, session
+                self.current_period, indicator.unique_id, session
             )
             for state in states:
                 recorder = indicator.get_new_recorder()
                 recorder.restore_state(state.state)
                 indicator.add_recorder(state.dimension.to_values(), recorder)
+
+    def restore_reopened_period(self, session: Session) -> None:
+        """Restore recorders from records of current period, closed already
+
+        This happens when the period is re-opened since the clock went back. Only
+        indicators whose recorders can be restored from their records are restored,
+        see `Indicator.restore_reopened_records`."""
+        if not self.current_period:
+            return
+        for indicator in self.indicators:
+            if indicator.restore_reopened_records:
+                indicator.restore_records(
+                    Persister.get_indicator_records(
+                        self.current_period, indicator.unique_id, session
+                    )
+                )
@@ -1,6 +1,5 @@
 import abc
 import datetime
-import math
 
 from offspot_metrics_backend.business.exceptions import (
     TooWideUsageError,
@@ -52,6 +51,10 @@ class IntCounterRecorder(Recorder):
         """Processing an input consists simply in updating the counter"""
         self.counter += 1
 
+    def process_count(self, count: int) -> None:
+        """Process many inputs at once, `count` being the number of inputs"""
+        self.counter += count
+
     @property
     def value(self) -> int:
         """Retrieving the value consists simply is getting the counter"""
@@ -90,6 +93,10 @@ class CountCounterRecorder(Recorder):
 
         self.counter += input_.count
 
+    def process_count(self, count: int) -> None:
+        """Process many inputs at once, `count` being the sum of inputs counts"""
+        self.counter += count
+
     @property
     def value(self) -> int:
         """Retrieving the value consists simply is getting the counter"""
@@ -164,8 +171,26 @@ class UsageRecorder(Recorder):
                 f"{UsageRecorder.__name__} recorder can only process "
                 f"{TimedInput.__name__} inputs"
             )
-        active_minute = math.floor(input_.ts.timestamp() / 60)
+        self._process_minute(input_.ts // 60)
 
+    def process_minutes(self, minutes: list[int]) -> None:
+        """Process many inputs at once, given the minutes (since epoch) they occured
+
+        Processing the same minute twice has no effect, so only distinct minutes need
+        to be passed. Minutes are processed in order, even if some of them fail, the
+        first error being raised at the end.
+        """
+        error: TooWideUsageError | None = None
+        for minute in minutes:
+            try:
+                self._process_minute(minute)
+            except TooWideUsageError as exc:
+                error = error or exc
+        if error:
+            raise error
+
+    def _process_minute(self, active_minute: int) -> None:
+        """Mark the slot of a given minute (since epoch) as active"""
         if not self.active_slots_starts:
             # If there are no active intervals yet, use the current minute
             active_slot_start = active_minute
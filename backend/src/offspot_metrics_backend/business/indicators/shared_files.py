@@ -6,6 +6,10 @@ from offspot_metrics_backend.business.indicators.recorder import (
     CountCounterRecorder,
     Recorder,
 )
+from offspot_metrics_backend.business.inputs.batch import (
+    SHARED_FILES_KINDS,
+    InputsBatch,
+)
 from offspot_metrics_backend.business.inputs.input import Input
 from offspot_metrics_backend.business.inputs.shared_files import SharedFilesOperation
 
@@ -14,9 +18,7 @@ class SharedFilesOperations(Indicator):
     """An indicator counting operations on shared files"""
 
     unique_id = 1003
-
-    def can_process_input(self, input_: Input) -> bool:
-        return isinstance(input_, SharedFilesOperation)
+    input_types = (SharedFilesOperation,)
 
     def get_new_recorder(self) -> Recorder:
         return CountCounterRecorder()
@@ -24,3 +26,14 @@ class SharedFilesOperations(Indicator):
     def get_dimensions_values(self, input_: Input) -> DimensionsValues:
         input_ = cast(SharedFilesOperation, input_)
         return DimensionsValues(input_.kind, None, None)
+
+    def process_batch(self, batch: InputsBatch, start: int, stop: int) -> None:
+        """Process all shared files operations of a batch at once"""
+        for operation_kind, input_kind in SHARED_FILES_KINDS.items():
+            total = batch.sum_counts(input_kind, start, stop)
+            if total is None:
+                continue
+            recorder = self.get_or_create_recorder_for(
+                DimensionsValues(operation_kind, None, None)
+            )
+            cast(CountCounterRecorder, recorder).process_count(total)
@@ -1,11 +1,16 @@
 from typing import cast
 
-from offspot_metrics_backend.business.indicators.dimensions import DimensionsValues
+from offspot_metrics_backend.business.indicators.dimensions import (
+    NO_DIMENSIONS_ID,
+    DimensionsValues,
+    get_package_dimensions_id,
+)
 from offspot_metrics_backend.business.indicators.indicator import Indicator
 from offspot_metrics_backend.business.indicators.recorder import (
     Recorder,
     UsageRecorder,
 )
+from offspot_metrics_backend.business.inputs.batch import InputKind, InputsBatch
 from offspot_metrics_backend.business.inputs.input import Input
 from offspot_metrics_backend.business.inputs.package import PackageRequest
 
@@ -14,9 +19,8 @@ class TotalUsageOverall(Indicator):
     """An indicator counting usage activity on all packages"""
 
     unique_id = 1005
-
-    def can_process_input(self, input_: Input) -> bool:
-        return isinstance(input_, PackageRequest)
+    input_types = (PackageRequest,)
+    restore_reopened_records = False
 
     def get_new_recorder(self) -> Recorder:
         return UsageRecorder()
@@ -24,14 +28,24 @@ class TotalUsageOverall(Indicator):
     def get_dimensions_values(self, input_: Input) -> DimensionsValues:  # noqa: ARG002
         return DimensionsValues(None, None, None)
 
+    def get_dimensions_id(self, input_: Input) -> int:  # noqa: ARG002
+        return NO_DIMENSIONS_ID
+
+    def process_batch(self, batch: InputsBatch, start: int, stop: int) -> None:
+        """Process all package requests of a batch at once"""
+        minutes = batch.minutes(InputKind.PACKAGE_REQUEST, start, stop)
+        if not minutes:
+            return
+        recorder = self.get_or_create_recorder_by_id(NO_DIMENSIONS_ID)
+        cast(UsageRecorder, recorder).process_minutes(minutes)
+
 
 class TotalUsageByPackage(Indicator):
     """An indicator counting usage activity by packages"""
 
     unique_id = 1006
-
-    def can_process_input(self, input_: Input) -> bool:
-        return isinstance(input_, PackageRequest)
+    input_types = (PackageRequest,)
+    restore_reopened_records = False
 
     def get_new_recorder(self) -> Recorder:
         return UsageRecorder()
@@ -39,3 +53,22 @@ class TotalUsageByPackage(Indicator):
     def get_dimensions_values(self, input_: Input) -> DimensionsValues:
         input_ = cast(PackageRequest, input_)
         return DimensionsValues(input_.package_title, None, None)
+
+    def get_dimensions_id(self, input_: Input) -> int:
+        return get_package_dimensions_id(cast(PackageRequest, input_).package_id)
+
+    def process_batch(self, batch: InputsBatch, start: int, stop: int) -> None:
+        """Process all package requests of a batch at once"""
+        error: Exception | None = None
+        for package_id, minutes in batch.minutes_by_package(
+            InputKind.PACKAGE_REQUEST, start, stop
+        ).items():
+            recorder = self.get_or_create_recorder_by_id(
+                get_package_dimensions_id(package_id)
+            )
+            try:
+                cast(UsageRecorder, recorder).process_minutes(minutes)
+            except Exception as exc:
+                error = error or exc
+        if error:
+            raise error
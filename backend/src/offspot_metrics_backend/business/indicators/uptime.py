@@ -4,6 +4,7 @@ from offspot_metrics_backend.business.indicators.recorder import (
     IntCounterRecorder,
     Recorder,
 )
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
 from offspot_metrics_backend.business.inputs.clock_tick import ClockTick
 from offspot_metrics_backend.business.inputs.input import Input
 
@@ -12,12 +13,20 @@ class Uptime(Indicator):
     """An indicator counting the offspot uptime"""
 
     unique_id = 1004
-
-    def can_process_input(self, input_: Input) -> bool:
-        return isinstance(input_, ClockTick)
+    input_types = (ClockTick,)
+    restore_reopened_records = False
 
     def get_new_recorder(self) -> Recorder:
         return IntCounterRecorder()
 
     def get_dimensions_values(self, input_: Input) -> DimensionsValues:  # noqa: ARG002
         return DimensionsValues(None, None, None)
+
+    def process_batch(
+        self,
+        batch: InputsBatch,  # noqa: ARG002
+        start: int,  # noqa: ARG002
+        stop: int,  # noqa: ARG002
+    ) -> None:
+        """Batches of log lines inputs never contain clock ticks"""
+        return
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+from collections import deque
+from collections.abc import Callable
+from dataclasses import asdict
+from pathlib import Path
+
+from offspot_metrics_backend.business.log_watcher import NewLinesEvent
+from offspot_metrics_backend.business.telemetry import Metrics
+from offspot_metrics_backend.constants import logger
+
+
+def serialize(event: NewLinesEvent) -> bytes:
+    """Serialize a batch of lines as one line of the spill file"""
+    return json.dumps(asdict(event), default=str).encode() + b"\n"
+
+
+class IngestQueue:
+    """A bounded queue of log lines between the log watcher and the processing logic
+
+    At most `max_lines` lines are kept in memory. Once this high-water mark is
+    reached, new batches are appended to a spill file on disk, and they are read back
+    in order once the in-memory queue has been consumed. As soon as something has been
+    spilled, all new batches go to the spill file as well, so that order is preserved.
+
+    The spill file is reset once fully drained, and on startup: lines still queued
+    when the queue is closed are not lost, since they are located after the log file
+    positions checkpointed in DB, and hence read again from log files on next startup.
+    """
+
+    def __init__(self, spill_file: Path, max_lines: int) -> None:
+        self.spill_file = spill_file
+        self.max_lines = max_lines
+        self.items: deque[NewLinesEvent] = deque()
+        self.memory_lines = 0
+        self.spilled_items = 0
+        self.spilled_lines = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.spill_writer = open(spill_file, "wb")
+        self.spill_reader = open(spill_file, "rb")
+
+    @property
+    def depth(self) -> int:
+        """Number of lines waiting to be processed, in memory or spilled to disk"""
+        return self.memory_lines + self.spilled_lines
+
+    @property
+    def spill_size(self) -> int:
+        """Size of the spill file, in bytes"""
+        return self.spill_file.stat().st_size if self.spill_file.exists() else 0
+
+    def stats(self) -> Metrics:
+        """Current queue metrics"""
+        with self.condition:
+            return {
+                "depth_lines": self.depth,
+                "memory_lines": self.memory_lines,
+                "spilled_lines": self.spilled_lines,
+                "spill_size_bytes": self.spill_size,
+            }
+
+    def put(self, event: NewLinesEvent) -> None:
+        """Add a batch of lines at the end of the queue"""
+        with self.condition:
+            if self.closed:
+                # late batch, lines will be read again from log file on next startup
+                logger.debug(f"Ignoring {len(event.lines)} lines, queue is closed")
+                return
+            if self.spilled_items or (
+                self.items and self.memory_lines + len(event.lines) > self.max_lines
+            ):
+                self._spill(event)
+            else:
+                self.items.append(event)
+                self.memory_lines += len(event.lines)
+            self.condition.notify()
+
+    def _spill(self, event: NewLinesEvent) -> None:
+        """Append a batch to the spill file, assuming lock is already acquired"""
+        self.spill_writer.write(serialize(event))
+        self.spill_writer.flush()
+        self.spilled_items += 1
+        self.spilled_lines += len(event.lines)
+
+    def _unspill(self) -> None:
+        """Move spilled batches back to memory, assuming lock is already acquired"""
+        while self.spilled_items and self.memory_lines < self.max_lines:
+            event = NewLinesEvent.from_dict(json.loads(self.spill_reader.readline()))
+            self.items.append(event)
+            self.memory_lines += len(event.lines)
+            self.spilled_items -= 1
+            self.spilled_lines -= len(event.lines)
+        if not self.spilled_items:
+            # spill file is drained, reset it so that it does not grow forever
+            os.ftruncate(self.spill_writer.fileno(), 0)
+            self.spill_writer.seek(0)
+            self.spill_reader.seek(0)
+
+    def get(self, timeout: float | None = None) -> NewLinesEvent | None:
+        """Remove and return the batch at the start of the queue
+
+        Blocks until a batch is available, or at most `timeout` seconds when set.
+        Returns None once the queue is closed, or when timeout expired.
+        """
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: self.closed or self.items or self.spilled_items, timeout
+            ):
+                return None
+            if self.closed:
+                return None
+            if not self.items:
+                self._unspill()
+            event = self.items.popleft()
+            self.memory_lines -= len(event.lines)
+            return event
+
+    def consume(self, handler: Callable[[NewLinesEvent], None]) -> None:
+        """Pass all batches to the handler, until the queue is closed"""
+        while event := self.get():
+            handler(event)
+
+    def close(self) -> None:
+        """Stop the queue, dropping batches not yet processed"""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+            self.spill_writer.close()
+            self.spill_reader.close()
@@ -6,6 +6,7 @@ from pydantic.dataclasses import dataclass
 
 from offspot_metrics_backend.business.inputs.input import Input
 from offspot_metrics_backend.business.inputs.package import (
+    PACKAGE_TITLES,
     PackageHomeVisit,
     PackageRequest,
 )
@@ -27,6 +28,11 @@ class InputGenerator(abc.ABC):
 
     host: str
 
+    @property
+    def name(self) -> str:
+        """Name of the generator, as reported in telemetry"""
+        return f"{type(self).__name__}:{self.host}"
+
     @abc.abstractmethod
     def process(self, log: LogData) -> list[Input]:
         """Process a given log line and generate corresponding inputs"""
@@ -35,32 +41,47 @@ class InputGenerator(abc.ABC):
 
 @dataclass
 class ZimInputGenerator(InputGenerator):
-    """A generator for zim packages"""
+    """A generator for all zim packages served on a given host
 
-    zim_name: str
-    package_title: str
+    ZIM name is parsed once from the URI, and package titles of this ZIM name are
+    retrieved from the `zims` lookup table, so that processing cost does not depend on
+    the number of ZIMs served on the host.
+    """
+
+    zims: dict[str, list[str]]  # package titles, by ZIM name
 
     zim_re = re.compile(r"^/content/(?P<zim_name>.+?)(?P<zim_path>/.*)?$")
 
+    def __post_init__(self):
+        # titles and ids of packages, by ZIM name
+        self.zim_packages = {
+            zim_name: [(title, PACKAGE_TITLES.get_id(title)) for title in titles]
+            for zim_name, titles in self.zims.items()
+        }
+
     def process(self, log: LogData) -> list[Input]:
         """Process a given log line and generate corresponding inputs"""
         match = self.zim_re.match(log.uri)
         if not match:
             return []
 
-        zim_name = match.group("zim_name")
-        zim_path = match.group("zim_path")
-
-        if zim_name != self.zim_name:
+        packages = self.zim_packages.get(match.group("zim_name"))
+        if not packages:
             return []
 
-        if zim_path is None or zim_path == "/":
-            return [
-                PackageHomeVisit(package_title=self.package_title),
-                PackageRequest(ts=log.ts, package_title=self.package_title),
-            ]
-
-        return [PackageRequest(ts=log.ts, package_title=self.package_title)]
+        zim_path = match.group("zim_path")
+        inputs: list[Input] = []
+        for package_title, package_id in packages:
+            if zim_path is None or zim_path == "/":
+                inputs.append(
+                    PackageHomeVisit(package_title=package_title, package_id=package_id)
+                )
+            inputs.append(
+                PackageRequest(
+                    ts=log.ts, package_title=package_title, package_id=package_id
+                )
+            )
+        return inputs
 
 
 @dataclass
@@ -69,6 +90,9 @@ class EdupiInputGenerator(InputGenerator):
 
     package_title: str
 
+    def __post_init__(self):
+        self.package_id = PACKAGE_TITLES.get_id(self.package_title)
+
     def process(self, log: LogData) -> list[Input]:
         """Transform one log event identified as edupi into inputs"""
         if (
@@ -77,7 +101,11 @@ class EdupiInputGenerator(InputGenerator):
             and log.uri == "/api/documents/"
         ):
             return [
-                PackageRequest(ts=log.ts, package_title=self.package_title),
+                PackageRequest(
+                    ts=log.ts,
+                    package_title=self.package_title,
+                    package_id=self.package_id,
+                ),
                 SharedFilesOperation(
                     kind=SharedFilesOperationKind.FILE_CREATED, count=1
                 ),
@@ -89,13 +117,23 @@ class EdupiInputGenerator(InputGenerator):
             and len(log.uri) > len("/api/documents/")
         ):
             return [
-                PackageRequest(ts=log.ts, package_title=self.package_title),
+                PackageRequest(
+                    ts=log.ts,
+                    package_title=self.package_title,
+                    package_id=self.package_id,
+                ),
                 SharedFilesOperation(
                     kind=SharedFilesOperationKind.FILE_DELETED, count=1
                 ),
             ]
         else:
-            return [PackageRequest(ts=log.ts, package_title=self.package_title)]
+            return [
+                PackageRequest(
+                    ts=log.ts,
+                    package_title=self.package_title,
+                    package_id=self.package_id,
+                )
+            ]
 
 
 @dataclass
@@ -104,10 +142,17 @@ class FileManagerInputGenerator(InputGenerator):
 
     package_title: str
 
+    def __post_init__(self):
+        self.package_id = PACKAGE_TITLES.get_id(self.package_title)
+
     def process(self, log: LogData) -> list[Input]:
         """Transform one log event identified as edupi into inputs"""
         result: list[Input] = [
-            PackageRequest(ts=log.ts, package_title=self.package_title)
+            PackageRequest(
+                ts=log.ts,
+                package_title=self.package_title,
+                package_id=self.package_id,
+            )
         ]
         if log.x_tfm_files_added:
             result.append(
@@ -132,15 +177,30 @@ class FilesInputGenerator(InputGenerator):
 
     package_title: str
 
+    def __post_init__(self):
+        self.package_id = PACKAGE_TITLES.get_id(self.package_title)
+
     def process(self, log: LogData) -> list[Input]:
         """Process a given log line and generate corresponding inputs"""
         if log.uri == "/":
             return [
-                PackageRequest(ts=log.ts, package_title=self.package_title),
-                PackageHomeVisit(package_title=self.package_title),
+                PackageRequest(
+                    ts=log.ts,
+                    package_title=self.package_title,
+                    package_id=self.package_id,
+                ),
+                PackageHomeVisit(
+                    package_title=self.package_title, package_id=self.package_id
+                ),
             ]
         else:
-            return [PackageRequest(ts=log.ts, package_title=self.package_title)]
+            return [
+                PackageRequest(
+                    ts=log.ts,
+                    package_title=self.package_title,
+                    package_id=self.package_id,
+                )
+            ]
 
 
 @dataclass
@@ -149,6 +209,15 @@ class CommonInputGenerator(InputGenerator):
 
     package_title: str
 
+    def __post_init__(self):
+        self.package_id = PACKAGE_TITLES.get_id(self.package_title)
+
     def process(self, log: LogData) -> list[Input]:
         """Process a given log line and generate corresponding inputs"""
-        return [PackageRequest(ts=log.ts, package_title=self.package_title)]
+        return [
+            PackageRequest(
+                ts=log.ts,
+                package_title=self.package_title,
+                package_id=self.package_id,
+            )
+        ]
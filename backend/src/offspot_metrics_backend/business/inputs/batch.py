@@ -0,0 +1,202 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Generator
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from offspot_metrics_backend.business.inputs.input import Input
+from offspot_metrics_backend.business.inputs.package import (
+    PACKAGE_TITLES,
+    PackageHomeVisit,
+    PackageRequest,
+)
+from offspot_metrics_backend.business.inputs.shared_files import (
+    SharedFilesOperation,
+    SharedFilesOperationKind,
+)
+
+
+class InputKind(IntEnum):
+    """Kinds of inputs which can be stored in a batch"""
+
+    PACKAGE_HOME_VISIT = 0
+    PACKAGE_REQUEST = 1
+    FILES_CREATED = 2
+    FILES_DELETED = 3
+
+
+SHARED_FILES_KINDS = {
+    SharedFilesOperationKind.FILE_CREATED: InputKind.FILES_CREATED,
+    SharedFilesOperationKind.FILE_DELETED: InputKind.FILES_DELETED,
+}
+SHARED_FILES_OPERATIONS = {kind: op for op, kind in SHARED_FILES_KINDS.items()}
+PACKAGE_KINDS = (InputKind.PACKAGE_HOME_VISIT, InputKind.PACKAGE_REQUEST)
+
+
+@dataclass
+class InputsBatch:
+    """Columnar representation of the inputs generated by a batch of log lines
+
+    Lines are stored in `lines_ts`, the timestamp (seconds since Unix epoch) of every
+    line, 0 when line is not valid.
+
+    Inputs are stored in arrays of same length, one item per input, ordered by line:
+    - `lines`: index of the line which generated the input
+    - `kinds`: kind of input
+    - `ts`: timestamp of the input
+    - `package_ids`: id of the package title (see `PACKAGE_TITLES`), -1 when not
+      applicable
+    - `counts`: number of items concerned, i.e. number of identical inputs merged
+      for package inputs, and sum of files counts for shared files operations
+
+    This allows indicators to process all inputs of a batch at once.
+
+    Identical inputs (same kind and package) occuring during the same minute are
+    coalesced into a single entry whose count is incremented: loading a single ZIM
+    article typically generates dozens of requests for its assets. Coalescing is
+    limited to consecutive lines of the same minute, i.e. lines which are never
+    separated by a tick, so that ranges of inputs of every tick stay contiguous.
+    """
+
+    lines_ts: array[int] = field(default_factory=lambda: array("q"))
+    lines: array[int] = field(default_factory=lambda: array("l"))
+    kinds: array[int] = field(default_factory=lambda: array("b"))
+    ts: array[int] = field(default_factory=lambda: array("q"))
+    package_ids: array[int] = field(default_factory=lambda: array("l"))
+    counts: array[int] = field(default_factory=lambda: array("l"))
+    # index of inputs of current minute, by kind, package id and minute
+    coalesced: dict[tuple[int, int, int], int] = field(default_factory=dict)
+    coalesced_minute: int | None = None
+
+    @property
+    def nb_lines(self) -> int:
+        """Number of lines in the batch"""
+        return len(self.lines_ts)
+
+    def add_line(self, ts: int | None, inputs: list[Input]) -> None:
+        """Add a line with the inputs it generated"""
+        line = len(self.lines_ts)
+        self.lines_ts.append(ts or 0)
+        if ts and ts // 60 != self.coalesced_minute:
+            # a tick might be processed before this line, stop coalescing
+            self.coalesced.clear()
+            self.coalesced_minute = ts // 60
+        for input_ in inputs:
+            self.add_input(line, input_)
+
+    def add_input(self, line: int, input_: Input) -> None:
+        """Add an input generated by a given line"""
+        if isinstance(input_, PackageRequest):
+            kind, ts = InputKind.PACKAGE_REQUEST, input_.ts
+            package_id, count = input_.package_id, 1
+        elif isinstance(input_, PackageHomeVisit):
+            kind, ts = InputKind.PACKAGE_HOME_VISIT, self.lines_ts[line]
+            package_id, count = input_.package_id, 1
+        elif isinstance(input_, SharedFilesOperation):
+            kind, ts = SHARED_FILES_KINDS[input_.kind], self.lines_ts[line]
+            package_id, count = -1, input_.count
+        else:
+            raise ValueError(f"Unsupported input in batch: {input_}")
+        key = (kind, package_id, ts // 60)
+        index = self.coalesced.get(key)
+        if index is not None:
+            self.counts[index] += count
+            return
+        self.coalesced[key] = len(self.kinds)
+        self.lines.append(line)
+        self.kinds.append(kind)
+        self.ts.append(ts)
+        self.package_ids.append(package_id)
+        self.counts.append(count)
+
+    def remap_package_ids(self, package_titles: list[str]) -> None:
+        """Replace package ids interned in another process by ids of this process
+
+        `package_titles` are the titles interned in the other process, by id.
+        """
+        ids = [PACKAGE_TITLES.get_id(title) for title in package_titles]
+        self.package_ids = array(
+            "l", (ids[id_] if id_ >= 0 else id_ for id_ in self.package_ids)
+        )
+
+    def inputs_range(self, start_line: int, stop_line: int) -> tuple[int, int]:
+        """Return the range of inputs generated by a range of lines"""
+        return bisect_left(self.lines, start_line), bisect_left(self.lines, stop_line)
+
+    def get_input(self, index: int) -> Input:
+        """Return the input object at a given index"""
+        kind, package_id = self.kinds[index], self.package_ids[index]
+        if kind == InputKind.PACKAGE_REQUEST:
+            return PackageRequest(
+                ts=self.ts[index],
+                package_title=PACKAGE_TITLES.get_value(package_id),
+                package_id=package_id,
+            )
+        if kind == InputKind.PACKAGE_HOME_VISIT:
+            return PackageHomeVisit(
+                package_title=PACKAGE_TITLES.get_value(package_id),
+                package_id=package_id,
+            )
+        return SharedFilesOperation(
+            kind=SHARED_FILES_OPERATIONS[InputKind(kind)], count=self.counts[index]
+        )
+
+    def get_inputs(self, start: int, stop: int) -> Generator[Input, None, None]:
+        """Return input objects in a range of inputs
+
+        Coalesced package inputs are repeated as many times as they occured.
+        """
+        for index in range(start, stop):
+            input_ = self.get_input(index)
+            if self.kinds[index] in PACKAGE_KINDS:
+                for _ in range(self.counts[index]):
+                    yield input_
+            else:
+                yield input_
+
+    def count_by_package(
+        self, kind: InputKind, start: int, stop: int
+    ) -> dict[int, int]:
+        """Count inputs of a given kind, by package id"""
+        totals: dict[int, int] = {}
+        kinds, package_ids, counts = self.kinds, self.package_ids, self.counts
+        for index in range(start, stop):
+            if kinds[index] == kind:
+                package_id = package_ids[index]
+                totals[package_id] = totals.get(package_id, 0) + counts[index]
+        return totals
+
+    def sum_counts(self, kind: InputKind, start: int, stop: int) -> int | None:
+        """Sum the counts of inputs of a given kind, None if there is no such input"""
+        total = None
+        kinds, counts = self.kinds, self.counts
+        for index in range(start, stop):
+            if kinds[index] == kind:
+                total = (total or 0) + counts[index]
+        return total
+
+    def minutes(self, kind: InputKind, start: int, stop: int) -> list[int]:
+        """Distinct minutes (since Unix epoch) of inputs of a given kind
+
+        Minutes are in order of first appearance.
+        """
+        kinds, ts = self.kinds, self.ts
+        return list(
+            dict.fromkeys(
+                ts[index] // 60 for index in range(start, stop) if kinds[index] == kind
+            )
+        )
+
+    def minutes_by_package(
+        self, kind: InputKind, start: int, stop: int
+    ) -> dict[int, list[int]]:
+        """Distinct minutes (since Unix epoch) of inputs of a given kind, by package id
+
+        Minutes are in order of first appearance.
+        """
+        minutes: dict[int, dict[int, None]] = {}
+        kinds, package_ids, ts = self.kinds, self.package_ids, self.ts
+        for index in range(start, stop):
+            if kinds[index] == kind:
+                minutes.setdefault(package_ids[index], {})[ts[index] // 60] = None
+        return {package_id: list(values) for package_id, values in minutes.items()}
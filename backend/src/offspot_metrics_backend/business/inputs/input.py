@@ -1,22 +1,24 @@
-import datetime
 from dataclasses import dataclass
 
 
 class Input:
-    """A generic input interface"""
+    """A generic input interface
 
-    ...
+    Inputs are created for every log line, so they all use slots to avoid the cost
+    of a per-instance __dict__"""
 
+    __slots__ = ()
 
-@dataclass(eq=True, frozen=True)
+
+@dataclass(eq=True, frozen=True, slots=True)
 class TimedInput(Input):
     """Input with information about when it happened"""
 
-    # moment where the input occured
-    ts: datetime.datetime
+    # moment where the input occured, in seconds since Unix epoch
+    ts: int
 
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=True, frozen=True, slots=True)
 class CountInput(Input):
     """An input with a number of items"""
 
@@ -1,19 +1,41 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from offspot_metrics_backend.business.inputs.input import Input, TimedInput
+from offspot_metrics_backend.business.interner import Interner
 
+# ids of package titles, so that packages are identified by an integer on the hot path
+PACKAGE_TITLES: Interner[str] = Interner()
 
-@dataclass(eq=True, frozen=True)
+
+@dataclass(eq=True, frozen=True, slots=True)
 class PackageHomeVisit(Input):
     """Input representing a visit of the home page of a package"""
 
     # title of the package
     package_title: str
 
+    # id of the package title, interned when not passed
+    package_id: int = field(default=-1, compare=False, repr=False)
+
+    def __post_init__(self):
+        if self.package_id < 0:
+            object.__setattr__(
+                self, "package_id", PACKAGE_TITLES.get_id(self.package_title)
+            )
+
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=True, frozen=True, slots=True)
 class PackageRequest(TimedInput):
     """Input representing a web request on any asset of a package"""
 
     # title of the package
     package_title: str
+
+    # id of the package title, interned when not passed
+    package_id: int = field(default=-1, compare=False, repr=False)
+
+    def __post_init__(self):
+        if self.package_id < 0:
+            object.__setattr__(
+                self, "package_id", PACKAGE_TITLES.get_id(self.package_title)
+            )
@@ -11,7 +11,7 @@ class SharedFilesOperationKind(str, Enum):
     FILE_DELETED = "FILE_DELETED"
 
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=True, frozen=True, slots=True)
 class SharedFilesOperation(CountInput):
     """Input representing an operation on a shared files software
 
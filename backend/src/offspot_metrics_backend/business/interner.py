@@ -0,0 +1,34 @@
+import threading
+from collections.abc import Hashable
+
+
+class Interner[T: Hashable]:
+    """Give a small integer id to every distinct value
+
+    Values are hashed once, when they are first interned, and can then be used as
+    integer ids, whose hashing and comparison are cheap, on the processing hot path.
+    Values are resolved back from their id only when needed, e.g. when persisting.
+
+    Ids are only valid in the current process, they are never persisted.
+    """
+
+    def __init__(self) -> None:
+        self.values: list[T] = []
+        self.ids: dict[T, int] = {}
+        self.lock = threading.Lock()
+
+    def get_id(self, value: T) -> int:
+        """Return the id of a value, interning it if needed"""
+        id_ = self.ids.get(value)
+        if id_ is None:
+            # lock is needed only to ensure that a value never gets two ids
+            with self.lock:
+                id_ = self.ids.get(value)
+                if id_ is None:
+                    id_ = self.ids[value] = len(self.values)
+                    self.values.append(value)
+        return id_
+
+    def get_value(self, id_: int) -> T:
+        """Return the value of an id"""
+        return self.values[id_]
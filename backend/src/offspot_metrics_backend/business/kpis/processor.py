@@ -25,7 +25,9 @@ class Processor:
         if not self.current_period:
             self.current_period = tick_period
 
-        # if we are in the same period, nothing to do
+        # if we are in the same period, nothing to do ; when ticks jumped over
+        # several periods, KPIs are computed only once, for the period which has been
+        # closed
         if self.current_period == tick_period:
             return False
 
@@ -1,19 +1,20 @@
-import datetime
+from dataclasses import dataclass
 
-from pydantic.dataclasses import dataclass
 
-
-@dataclass
+@dataclass(slots=True)
 class LogData:
     """Generic log dataclass holding data found in a log line
 
     This is typically generated from a reverse proxy, but is meant to make
-    this independant of the reverse proxy really used"""
+    this independant of the reverse proxy really used
+
+    One instance is created per log line, so this is a plain slotted dataclass
+    without any validation: data is validated once when the log line is decoded"""
 
     content_type: str | None
     status: int
     uri: str
     method: str
-    ts: datetime.datetime
+    ts: int  # seconds since Unix epoch
     x_tfm_files_added: int | None  # files added in tiny file manager
     x_tfm_files_deleted: int | None  # files deleted in tiny file manager
@@ -1,9 +1,16 @@
+import asyncio
+import heapq
 import json
-from asyncio import sleep
-from collections.abc import Callable
-from dataclasses import dataclass
+import os
+import re
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable
+from dataclasses import asdict, dataclass, replace
+from enum import Enum
+from operator import itemgetter
 from pathlib import Path
-from typing import TypeGuard
+from typing import Any, TypeGuard
 
 from watchdog.events import (
     EVENT_TYPE_CREATED,
@@ -15,36 +22,228 @@ from watchdog.events import (
     FileSystemMovedEvent,
 )
 from watchdog.observers import Observer
-
+from watchdog.observers.polling import PollingObserver
+
+from offspot_metrics_backend.business.tail_reader import (
+    FINGERPRINT_SIZE,
+    READ_CHUNK_SIZE,
+    CompressedTailReader,
+    FileId,
+    TailReader,
+    open_reader,
+    uncompressed_path,
+)
+from offspot_metrics_backend.business.telemetry import Metrics
 from offspot_metrics_backend.constants import BackendConf, logger
 
 
+@dataclass
+class FileState:
+    """Reading state of a log file
+
+    A file is identified by its device and inode numbers, so that its state is not
+    lost when it is moved (e.g. rotated). Since inode numbers are reused by the file
+    system once a file has been deleted, a fingerprint of the first bytes of the file
+    (`fingerprint_size` bytes) is kept as well.
+
+    For compressed files, `position` and fingerprint are based on uncompressed data,
+    and `complete_size` is the (compressed) file size once it has been fully read.
+    """
+
+    device: int
+    inode: int
+    fingerprint: str
+    fingerprint_size: int
+    position: int
+    path: str  # informative only, last known path of the file
+    complete_size: int | None = None
+
+    @property
+    def file_id(self) -> FileId:
+        """Return the file identifier"""
+        return (self.device, self.inode)
+
+
 @dataclass
 class NewLineEvent:
     file_path: Path
     line_content: str
 
 
-ENCODING = "utf-8"
+@dataclass
+class NewLinesEvent:
+    """A batch of new lines appended to a given file
+
+    `offsets` holds, for every line, the position in the file just after this line.
+
+    `file_state` is a snapshot of the file state once the batch has been read, so
+    that the position up to which lines have been processed can be checkpointed. A
+    batch might have no lines when only the file state has changed.
+    """
+
+    file_path: Path
+    lines: list[str]
+    offsets: list[int]
+    file_state: FileState | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "NewLinesEvent":
+        """Restore a batch from its dict representation (see `dataclasses.asdict`)"""
+        file_state = data.get("file_state")
+        return cls(
+            file_path=Path(data["file_path"]),
+            lines=data["lines"],
+            offsets=data["offsets"],
+            file_state=FileState(**file_state) if file_state else None,
+        )
+
 
 OBSERVER_STOP_MAX_SECONDS = 10
-OBSERVER_PAUSE_SECONDS = 0.001
+
+# Time left for file system events to be received before considering they are missing
+SILENCE_GRACE_SECONDS = 1
+
+
+class WatchMode(str, Enum):
+    """How the log watcher detects modifications of log files"""
+
+    EVENTS = "events"  # file system events (e.g. inotify) sent by watchdog
+    POLLING = "polling"  # regular polling of files status
+
+
+# Timestamp of a Caddy JSON log line, a top-level key located before nested objects
+TS_RE = re.compile(r'"ts":\s*(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)')
+
+
+def is_legacy_position_valid(
+    reader: TailReader, position: int, saved_at: float
+) -> bool:
+    """Whether a position saved by former versions is consistent with current file
+
+    The file must be at least as big as the position, which must be at the end of a
+    line, and this line must have been logged before the file was last modified and
+    before state was saved (`saved_at`, seconds since Unix epoch).
+    """
+    if not position:
+        return True
+    stat = os.fstat(reader.handle.fileno())
+    if stat.st_size < position:
+        return False
+    size = min(position, READ_CHUNK_SIZE)
+    data = os.pread(reader.handle.fileno(), size, position - size)
+    if not data.endswith(b"\n"):
+        return False
+    last_line = data[:-1].rsplit(b"\n", 1)[-1].decode(errors="replace")
+    match = TS_RE.search(last_line)
+    return match is not None and float(match.group(1)) <= min(saved_at, stat.st_mtime)
 
 
 class LogWatcherHandler(FileSystemEventHandler):
     """Handler of watchdog events"""
 
-    def __init__(self, data_folder: str, handler: Callable[[NewLineEvent], None]):
-        self.file_positions_map: dict[str, int] = {}
+    def __init__(
+        self,
+        data_folder: str,
+        handler: Callable[[NewLineEvent], None] | None = None,
+        *,
+        batch_handler: Callable[[NewLinesEvent], None] | None = None,
+        batch_max_lines: int = BackendConf.logwatcher_batch_max_lines,
+        batch_max_wait: float = BackendConf.logwatcher_batch_max_wait_seconds,
+        read_chunk_size: int = READ_CHUNK_SIZE,
+        persist_state: bool = True,
+        forget_handler: Callable[[list[FileId]], None] | None = None,
+    ):
+        if (handler is None) == (batch_handler is None):
+            raise ValueError("Exactly one of handler or batch_handler must be provided")
+        self.file_states: dict[FileId, FileState] = {}
+        self.file_ids: dict[str, FileId] = {}  # last known identifier of each path
         self.line_process_func = handler
+        self.batch_process_func = batch_handler
+        self.forget_func = forget_handler
+        self.batch_max_lines = batch_max_lines
+        self.batch_max_wait = batch_max_wait
+        self.read_chunk_size = read_chunk_size
+        self.readers: dict[FileId, TailReader] = {}
+        # files moved away from the path they were read at (e.g. rotated)
+        self.rotated_files: set[FileId] = set()
+        # last state passed to the batch handler, for every file
+        self.delivered_states: dict[FileId, FileState] = {}
         if not Path(data_folder).exists():
             raise ValueError(f"Logwatcher data folder is missing: {data_folder}")
         self.state_file_path = Path(data_folder).joinpath("log_watcher_state.json")
+        self.persist_state = persist_state
+        if persist_state:
+            self.restore_states(self.read_state_file())
+
+    def read_state_file(self) -> list[FileState]:
+        """Read files state saved to disk"""
         if not self.state_file_path.exists():
-            return  # This is ok on first startup
+            return []  # This is ok on first startup
         with open(self.state_file_path) as fh:
             state = json.load(fh)
-            self.file_positions_map = state["file_pointers"]
+        if "file_pointers" in state:
+            return self._read_legacy_state(state["file_pointers"])
+        return [FileState(**file_state_data) for file_state_data in state["files"]]
+
+    def _read_legacy_state(self, file_pointers: dict[str, int]) -> list[FileState]:
+        """Read state saved by former versions, where files were keyed by path
+
+        Since the file found at a given path might have been recreated since state was
+        saved, a position is trusted only when it is consistent with current file (see
+        `is_legacy_position_valid`), the file being read from start otherwise.
+        """
+        saved_at = self.state_file_path.stat().st_mtime
+        file_states: list[FileState] = []
+        for path, saved_position in file_pointers.items():
+            try:
+                reader = TailReader(Path(path))
+            except OSError:
+                continue  # file is gone, nothing to restore
+            fingerprint, fingerprint_size = reader.fingerprint()
+            position = saved_position
+            if not is_legacy_position_valid(reader, saved_position, saved_at):
+                logger.warning(
+                    f"Saved position {saved_position} does not match current {path}"
+                    " file, reading it from start"
+                )
+                position = 0
+            reader.close()
+            file_states.append(
+                FileState(
+                    device=reader.file_id[0],
+                    inode=reader.file_id[1],
+                    fingerprint=fingerprint,
+                    fingerprint_size=fingerprint_size,
+                    position=position,
+                    path=path,
+                )
+            )
+        return file_states
+
+    def archive_state_file(self):
+        """Rename state file saved to disk, once it has been migrated elsewhere"""
+        if self.state_file_path.exists():
+            self.state_file_path.rename(
+                self.state_file_path.with_name(f"{self.state_file_path.name}.migrated")
+            )
+
+    def restore_states(self, file_states: list[FileState]):
+        """Restore files state, typically at startup"""
+        self.file_states = {
+            file_state.file_id: file_state for file_state in file_states
+        }
+        self.delivered_states = {
+            file_state.file_id: replace(file_state) for file_state in file_states
+        }
+
+    def save_state(self):
+        """Save state to disk, unless it is persisted by the batch handler"""
+        if not self.persist_state:
+            return
+        with open(self.state_file_path, "w") as fh:
+            json.dump(
+                {"files": [asdict(state) for state in self.file_states.values()]}, fh
+            )
 
     def _is_moved_event(
         self, event: FileSystemEvent
@@ -52,46 +251,296 @@ class LogWatcherHandler(FileSystemEventHandler):
         """TypeGuard to help type checker detect moved event class"""
         return event.event_type == EVENT_TYPE_MOVED
 
-    def process_new_lines(self, file_path: Path):
-        """Process file to detect new lines appended"""
-        # Reset position if it looks like file has been truncated
-        if file_path.stat().st_size < self.file_positions_map[str(file_path)]:
-            self.file_positions_map[str(file_path)] = 0
-
-        with open(file_path, encoding=ENCODING) as file:
-            file.seek(self.file_positions_map[str(file_path)])
-            new_data = file.read()
-            if not new_data:
-                return
+    def is_fully_consumed(self, stat: os.stat_result) -> bool:
+        """Check if a file has already been read up to its end"""
+        state = self.file_states.get((stat.st_dev, stat.st_ino))
+        return state is not None and stat.st_size in (
+            state.position,
+            state.complete_size,
+        )
 
-            # Process all lines but the last one
-            for line in new_data.splitlines(keepends=True):
-                if not line.endswith("\n"):
-                    break
-                try:
-                    self.line_process_func(
-                        NewLineEvent(file_path=file_path, line_content=line.strip())
-                    )
-                except Exception as exc:
-                    logger.warning(
-                        f"Error occured while processing line in {file_path} at"
-                        f" {self.file_positions_map[str(file_path)]}",
-                        exc_info=exc,
-                    )
-                self.file_positions_map[str(file_path)] += len(
-                    line.encode(encoding=ENCODING)
+    def forget_missing_files(self, file_ids: set[FileId]):
+        """Forget state of files which are not in the given set of identifiers"""
+        self.forget_files(
+            [file_id for file_id in self.file_states if file_id not in file_ids]
+        )
+
+    def forget_files(self, file_ids: list[FileId]):
+        """Forget state of given files, and notify the forget handler"""
+        if not file_ids:
+            return
+        for file_id in file_ids:
+            self.file_states.pop(file_id, None)
+            self.delivered_states.pop(file_id, None)
+            self.rotated_files.discard(file_id)
+            self.close_reader(file_id)
+        if self.forget_func:
+            try:
+                self.forget_func(file_ids)
+            except Exception as exc:
+                logger.warning("Error occured while forgetting files", exc_info=exc)
+
+    def get_reader(self, file_path: Path) -> TailReader:
+        """Return the reader of a given file, opening it if not yet done
+
+        If a state is known for this file, reading resumes from known position.
+        """
+        stat = os.stat(file_path)
+        reader = self.readers.get((stat.st_dev, stat.st_ino))
+        if reader:
+            reader.file_path = file_path
+        else:
+            reader = open_reader(file_path, chunk_size=self.read_chunk_size)
+            self.readers[reader.file_id] = reader
+            state = self.file_states.get(reader.file_id)
+            if state and reader.fingerprint(state.fingerprint_size) == (
+                state.fingerprint,
+                state.fingerprint_size,
+            ):
+                reader.seek(state.position)
+            else:
+                # either a new file, or a new file reusing the inode of a deleted one
+                fingerprint, fingerprint_size = reader.fingerprint()
+                self.file_states[reader.file_id] = FileState(
+                    device=reader.file_id[0],
+                    inode=reader.file_id[1],
+                    fingerprint=fingerprint,
+                    fingerprint_size=fingerprint_size,
+                    position=0,
+                    path=str(file_path),
                 )
+        self.file_ids[str(file_path)] = reader.file_id
+        self.file_states[reader.file_id].path = str(file_path)
+        return reader
+
+    def resume_from_uncompressed(
+        self, reader: CompressedTailReader, state: FileState
+    ) -> bool:
+        """Skip data of a compressed file which has been read in its uncompressed form
+
+        Rotated log files are usually compressed once they have been read (at least
+        partially) under their uncompressed form. Such files are recognized with the
+        fingerprint of their uncompressed data, and reading resumes where it stopped.
+
+        Returns False when the compressed file does not hold enough data yet to decide.
+        """
+        if not reader.has_start():
+            return False
+        fingerprints: dict[int, tuple[str, int]] = {}
+        for other in self.file_states.values():
+            if other.file_id == reader.file_id or not other.fingerprint_size:
+                continue
+            if other.fingerprint_size not in fingerprints:
+                fingerprints[other.fingerprint_size] = reader.fingerprint(
+                    other.fingerprint_size
+                )
+            if fingerprints[other.fingerprint_size] == (
+                other.fingerprint,
+                other.fingerprint_size,
+            ):
+                logger.debug(f"Resuming {reader.file_path} from {other.path}")
+                reader.seek(other.position)
+                state.position = reader.position
+                break
+        return True
+
+    def close_reader(self, file_id: FileId):
+        """Close the reader of a given file, if any"""
+        reader = self.readers.pop(file_id, None)
+        if reader:
+            reader.close()
+
+    def release_reader(self, reader: TailReader):
+        """Close the reader of a file which is not expected to be appended anymore
+
+        This is the case of compressed files once fully read, and of files moved away
+        (e.g. rotated) once all their lines have been read. The reader is opened again
+        if the file is modified anyway, and reading resumes from the file state.
+        """
+        if reader.complete or reader.file_id in self.rotated_files:
+            self.close_reader(reader.file_id)
+
+    def close(self):
+        """Close all file handles"""
+        for file_id in list(self.readers.keys()):
+            self.close_reader(file_id)
 
-    def on_any_event(self, event: FileSystemEvent):
-        """Function called by watch dog when event occurs"""
+    def process_new_lines(self, file_path: Path):
+        """Process file to detect new lines appended"""
+        prepared = self.prepare_reader(file_path)
+        if not prepared:
+            return
+        reader, state = prepared
+        self.deliver_lines(
+            (state, line, position) for line, position in reader.read_lines()
+        )
+        self.finalize_reader(reader, state)
+        self.checkpoint_state(state)
+        self.release_reader(reader)
+
+    def catch_up(self, file_paths: list[Path]) -> int:
+        """Process lines appended to several files, in chronological order
+
+        Lines of all files are merged based on their timestamp, so that the processing
+        logic receives them in the order they have been produced, even when the backlog
+        spans many (rotated) files. Only one chunk per file is read at once, so memory
+        consumption is bounded whatever the backlog size.
+
+        Returns the number of lines processed.
+        """
+        sources: list[tuple[TailReader, FileState]] = []
+        for file_path in file_paths:
+            try:
+                if prepared := self.prepare_reader(file_path):
+                    sources.append(prepared)
+            except OSError as exc:
+                logger.warning(f"Error opening file {file_path}", exc_info=exc)
+        merged = heapq.merge(
+            *[timed_lines(reader, state) for reader, state in sources],
+            key=itemgetter(0),
+        )
+        nb_lines = self.deliver_lines(
+            (state, line, position) for _, state, line, position in merged
+        )
+        for reader, state in sources:
+            self.finalize_reader(reader, state)
+            self.checkpoint_state(state)
+            self.release_reader(reader)
+        return nb_lines
+
+    def prepare_reader(self, file_path: Path) -> tuple[TailReader, FileState] | None:
+        """Return the reader of a file and its state, ready to read new lines
+
+        None is returned when the file is not ready to be read.
+        """
+        reader = self.get_reader(file_path)
+        state = self.file_states[reader.file_id]
+        if (
+            isinstance(reader, CompressedTailReader)
+            and state.position == 0
+            and not self.resume_from_uncompressed(reader, state)
+        ):
+            return None
+        return reader, state
+
+    def finalize_reader(self, reader: TailReader, state: FileState):
+        """Update file state once all new lines have been read"""
+        # Reader position might have been reset if file has been truncated
+        state.position = reader.position
+
+        # Fingerprint is based on less bytes than expected when file was small
+        if state.fingerprint_size < FINGERPRINT_SIZE:
+            state.fingerprint, state.fingerprint_size = reader.fingerprint()
+
+        if reader.complete:
+            state.complete_size = os.fstat(reader.handle.fileno()).st_size
+
+    def deliver_lines(self, lines: Iterable[tuple[FileState, str, int]]) -> int:
+        """Pass lines to the handler, and return the number of lines passed
+
+        Lines are given with the state of their file and the position just after them.
+        With a batch handler, consecutive lines of a same file are grouped in batches.
+        """
+        batch: NewLinesEvent | None = None
+        batch_state: FileState | None = None
+        batch_started_at = 0.0
+        nb_lines = 0
+
+        for state, line, position in lines:
+            nb_lines += 1
+            if self.line_process_func:
+                self.process_one_line(state, line, position)
+                continue
+            if batch and batch_state and batch_state is not state:
+                self.process_batch(batch_state, batch)
+                batch = None
+            if not batch:
+                batch = NewLinesEvent(file_path=Path(state.path), lines=[], offsets=[])
+                batch_state = state
+                batch_started_at = time.monotonic()
+            batch.lines.append(line)
+            batch.offsets.append(position)
+            if (
+                len(batch.lines) >= self.batch_max_lines
+                or time.monotonic() - batch_started_at >= self.batch_max_wait
+            ):
+                self.process_batch(state, batch)
+                batch = None
+
+        if batch and batch_state:
+            self.process_batch(batch_state, batch)
+
+        return nb_lines
+
+    def process_one_line(self, state: FileState, line: str, position: int):
+        """Pass one line to the handler and then advance file position"""
+        if not self.line_process_func:  # pragma: no cover
+            raise ValueError("Line handler is not set")
+        try:
+            self.line_process_func(
+                NewLineEvent(file_path=Path(state.path), line_content=line)
+            )
+        except Exception as exc:
+            logger.warning(
+                f"Error occured while processing line in {state.path} at"
+                f" {state.position}",
+                exc_info=exc,
+            )
+        state.position = position
+
+    def process_batch(self, state: FileState, batch: NewLinesEvent):
+        """Pass a batch of lines to the handler and then advance file position"""
+        if not self.batch_process_func:  # pragma: no cover
+            raise ValueError("Batch handler is not set")
+        batch.file_state = replace(
+            state, position=batch.offsets[-1] if batch.offsets else state.position
+        )
+        self.delivered_states[state.file_id] = batch.file_state
         try:
-            self.process_event(event)
-        except Exception as exc:  # pragma: no cover
+            self.batch_process_func(batch)
+        except Exception as exc:
             logger.warning(
-                f"Error occured while processing event {event.event_type} on"
-                f" {event.src_path}",
+                f"Error occured while processing {len(batch.lines)} lines in"
+                f" {state.path} at {state.position}",
                 exc_info=exc,
             )
+        state.position = batch.file_state.position
+
+    def checkpoint_state(self, state: FileState):
+        """Pass a batch without lines if file state changed since last batch
+
+        This happens e.g. when a file has been truncated, when reading of a compressed
+        file resumes from its uncompressed version, or when it has been fully read. It
+        allows the batch handler to checkpoint file states in all cases.
+        """
+        if not self.batch_process_func:
+            return
+        delivered = self.delivered_states.get(state.file_id)
+        if delivered and (delivered.position, delivered.complete_size) == (
+            state.position,
+            state.complete_size,
+        ):
+            return
+        self.process_batch(
+            state, NewLinesEvent(file_path=Path(state.path), lines=[], offsets=[])
+        )
+
+    def on_any_event(self, event: FileSystemEvent):
+        """Function called by watch dog when event occurs"""
+        self.process_events([event])
+
+    def process_events(self, events: list[FileSystemEvent]):
+        """Process a list of events, and then save state once"""
+        for event in events:
+            try:
+                self.process_event(event)
+            except Exception as exc:  # pragma: no cover
+                logger.warning(
+                    f"Error occured while processing event {event.event_type} on"
+                    f" {event.src_path}",
+                    exc_info=exc,
+                )
+        self.save_state()
 
     def process_event(self, event: FileSystemEvent):
         """Real processing of watch dog events"""
@@ -110,39 +559,105 @@ class LogWatcherHandler(FileSystemEventHandler):
             file_path = Path(event.src_path)
 
             # Ignore files which are not in our scope of interest
-            if not file_path.match(BackendConf.reverse_proxy_logs_pattern):
+            if not is_log_file(file_path):
                 return
 
-            if event.src_path not in self.file_positions_map:
-                self.file_positions_map[event.src_path] = 0
             try:
                 self.process_new_lines(file_path)
             except FileNotFoundError:
                 pass
 
         elif self._is_moved_event(event):
-            if event.src_path in self.file_positions_map:
-                self.file_positions_map[event.dest_path] = self.file_positions_map[
-                    event.src_path
-                ]
-                del self.file_positions_map[event.src_path]
-            try:
-                self.process_new_lines(Path(event.dest_path))
-            except FileNotFoundError:
-                pass
+            # file state is keyed by file identifier, which is not modified by a move
+            # operation, so there is nothing to update except the path
+            file_id = self.file_ids.pop(event.src_path, None)
+            if file_id:
+                self.rotated_files.add(file_id)
+            dest_path = Path(event.dest_path)
+            if file_id or is_log_file(dest_path):
+                try:
+                    self.process_new_lines(dest_path)
+                except FileNotFoundError:
+                    pass
 
         elif event.event_type == EVENT_TYPE_DELETED:
-            # Cleanup to limit memory footprint + allow file name to be reused
-            if event.src_path in self.file_positions_map:
-                del self.file_positions_map[event.src_path]
+            # Cleanup to limit memory footprint + close file handle
+            file_id = self.file_ids.pop(event.src_path, None)
+            if file_id and file_id not in self.file_ids.values():
+                self.forget_files([file_id])
 
         else:  # pragma: no cover
             # we should never get there except if the list of suported events is
             # modified and we do not act appropriately
             raise AttributeError(f"Unexpected event type {event.event_type}")
 
-        with open(self.state_file_path, "w") as fh:
-            json.dump({"file_pointers": self.file_positions_map}, fh)
+
+def timed_lines(
+    reader: TailReader, state: FileState
+) -> Generator[tuple[float, FileState, str, int], None, None]:
+    """Return new lines of a file along with their timestamp
+
+    Lines without timestamp are considered to have the timestamp of previous line, so
+    that they stay at the same place in the stream of lines.
+    """
+    ts = float("-inf")
+    try:
+        for line, position in reader.read_lines():
+            if match := TS_RE.search(line):
+                ts = float(match.group(1))
+            yield ts, state, line, position
+    except Exception as exc:
+        # do not stop other files processing
+        logger.warning(f"Error occured while reading {state.path}", exc_info=exc)
+
+
+def is_log_file(file_path: Path) -> bool:
+    """Check if a file is a log file, possibly compressed, which has to be read"""
+    return uncompressed_path(file_path).match(BackendConf.reverse_proxy_logs_pattern)
+
+
+def coalesce_events(events: list[FileSystemEvent]) -> list[FileSystemEvent]:
+    """Remove file modification events which are redundant
+
+    A creation / modification event on a file is redundant when a former one on the
+    same file is still pending (i.e. with no move or delete event on this file in
+    between), since the pending read will anyway read all data appended to the file.
+    """
+    coalesced: list[FileSystemEvent] = []
+    pending_reads: set[str] = set()
+    for event in events:
+        if event.event_type in [EVENT_TYPE_CREATED, EVENT_TYPE_MODIFIED]:
+            if event.src_path in pending_reads:
+                continue
+            pending_reads.add(event.src_path)
+        else:
+            pending_reads.discard(event.src_path)
+            if isinstance(event, FileSystemMovedEvent):
+                pending_reads.discard(event.dest_path)
+        coalesced.append(event)
+    return coalesced
+
+
+class LogWatcherEventBridge(FileSystemEventHandler):
+    """Hand over watchdog events to the asyncio event loop
+
+    This is called in the watchdog observer thread, events are simply pushed to the
+    queue consumed by the log watcher coroutine.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue[FileSystemEvent | None],
+    ):
+        self.loop = loop
+        self.queue = queue
+        self.events_count = 0  # number of events received from watchdog
+
+    def on_any_event(self, event: FileSystemEvent):
+        """Function called by watch dog when event occurs"""
+        self.events_count += 1
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
 
 
 class LogWatcher:
@@ -151,10 +666,41 @@ class LogWatcher:
     The handler function is called only once the line is completed (i.e. ending with a
     carriage return character).
 
-    Moved, deleted and truncated files are supported.
+    When a `batch_handler` is passed instead of a `handler`, lines are delivered in
+    batches of up to `batch_max_lines` lines ; a batch is also delivered as soon as
+    `batch_max_wait` seconds have elapsed since its first line has been read, and
+    in all cases once all new lines of a file have been read.
+
+    Rotated files compressed with gzip (.gz) or zstandard (.zst, only when the
+    zstandard package is installed) are decompressed on the fly. A compressed file
+    whose content has already been read (at least partially) in its uncompressed form
+    is recognized, and reading resumes where it stopped.
+
+    Moved, deleted and truncated files are supported. Files are identified by their
+    device and inode numbers (plus a fingerprint of their first bytes), so reading
+    resumes where it left off even if a file has been moved (e.g. rotated) while
+    events were missed or while the watcher was not running.
+
+    Modification events are coalesced: events are taken at most once every
+    `coalesce_window` seconds, and events which are redundant because a read of the
+    same file is already pending are dropped. File system work hence scales with data
+    volume, not with the number of writes.
 
     Nested files are watched as well if `recursive` is True.
 
+    Files state (i.e. positions up to which they have been read) is saved to disk in
+    `data_folder`, unless `persist_state` is False. In that case, the batch handler is
+    responsible to checkpoint the file state passed with every batch once lines have
+    been processed, and files state must be restored before running the watcher. The
+    `forget_handler` is notified of files which have been deleted.
+
+    When file system events are not reliable, the watcher falls back to polling files
+    status. This happens when watchdog has no native backend (e.g. inotify) on this
+    platform, when the observer fails to start or dies, or when log files have grown
+    during `silence_check_interval` seconds without any event being received. Polling
+    occurs every `polling_min_interval` seconds while data keeps arriving, and the
+    interval doubles (up to `polling_max_interval` seconds) while files are idle.
+
     Some limitations:
     - files must not be truncated and recreated bigger than before within few
     milliseconds
@@ -166,79 +712,302 @@ class LogWatcher:
         self,
         watched_folder: str,
         data_folder: str,
-        handler: Callable[[NewLineEvent], None],
+        handler: Callable[[NewLineEvent], None] | None = None,
         *,
+        batch_handler: Callable[[NewLinesEvent], None] | None = None,
+        batch_max_lines: int = BackendConf.logwatcher_batch_max_lines,
+        batch_max_wait: float = BackendConf.logwatcher_batch_max_wait_seconds,
+        coalesce_window: float = BackendConf.logwatcher_coalesce_window_seconds,
+        polling_min_interval: float = BackendConf.logwatcher_polling_min_seconds,
+        polling_max_interval: float = BackendConf.logwatcher_polling_max_seconds,
+        silence_check_interval: float = BackendConf.logwatcher_silence_check_seconds,
         recursive: bool = True,
+        persist_state: bool = True,
+        forget_handler: Callable[[list[FileId]], None] | None = None,
     ) -> None:
         self.watched_folder = Path(watched_folder)
-        self.event_handler = LogWatcherHandler(data_folder=data_folder, handler=handler)
+        self.event_handler = LogWatcherHandler(
+            data_folder=data_folder,
+            handler=handler,
+            batch_handler=batch_handler,
+            batch_max_lines=batch_max_lines,
+            batch_max_wait=batch_max_wait,
+            persist_state=persist_state,
+            forget_handler=forget_handler,
+        )
         self.recursive = recursive
         self.observer = Observer()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.loop_thread_id: int | None = None
+        self.events: asyncio.Queue[FileSystemEvent | None] | None = None
+        self.stopping = False
+        self.completed = threading.Event()
+        self.coalesce_window = coalesce_window
+        self.last_events_taken = 0.0
+        self.events_received = 0  # number of events received from watchdog
+        self.events_coalesced = 0  # number of events dropped since redundant
+        self.bridge: LogWatcherEventBridge | None = None
+        self.mode = WatchMode.EVENTS
+        self.fallback_reason: str | None = None
+        self.polling_min_interval = polling_min_interval
+        self.polling_max_interval = polling_max_interval
+        self.polling_interval = polling_min_interval
+        self.silence_check_interval = silence_check_interval
+
+    async def run_async(self):
+        """Watch directory
+
+        Watchdog events are handed over to this coroutine which simply awaits them
+        (or the observer termination), so nothing runs while no event occurs. Events
+        are processed one after the other, in a worker thread so that the event loop
+        is never blocked by file reading and line processing.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.events = asyncio.Queue[FileSystemEvent | None]()
+        try:
+            await asyncio.to_thread(self.process_existing_files)
 
-    async def run_async(self):  # pragma: no cover
-        """Watch directory"""
-        self.process_existing_files()
+            if self.stopping:
+                return
 
-        self.observer.schedule(  # pyright: ignore[reportUnknownMemberType]
-            self.event_handler, self.watched_folder, recursive=self.recursive
-        )
+            if not self.fallback_reason:
+                self._start_observer()
 
-        self.observer.start()
+            if not self.fallback_reason:
+                logger.info("Log watcher has started succesfully")
+                await self._watch_events()
 
-        logger.info("Log watcher has started succesfully")
+            if self.fallback_reason and not self.stopping:
+                logger.warning(
+                    "Log watcher is switching to polling mode:"
+                    f" {self.fallback_reason}"
+                )
+                self.mode = WatchMode.POLLING
+                if self.observer.is_alive():
+                    self.observer.stop()
+                await self._poll_files()
 
-        while self.observer.is_alive():
-            self.observer.join(OBSERVER_PAUSE_SECONDS)
-            # perform a very small sleep, just to let the coroutine pause
-            await sleep(OBSERVER_PAUSE_SECONDS)
+            logger.info("Log watcher run is terminating")
+        finally:
+            self.event_handler.close()
+            self.completed.set()
 
-        logger.info("Log watcher run is terminating")
+        logger.info("Log watcher run has completed")
 
-        self.observer.join()
+    def _start_observer(self):
+        """Start watchdog observer, or set the reason why it is not usable"""
+        if not self.loop or not self.events:  # pragma: no cover
+            raise ValueError("Log watcher has not been started")
 
-        logger.info("Log watcher run has completed")
+        if isinstance(self.observer, PollingObserver):
+            self.fallback_reason = "no native file system events backend available"
+            return
 
-    def run_sync(self):
-        """Watch directory"""
-        self.process_existing_files()
+        self.bridge = LogWatcherEventBridge(loop=self.loop, queue=self.events)
+        try:
+            self.observer.schedule(  # pyright: ignore[reportUnknownMemberType]
+                self.bridge,
+                self.watched_folder,
+                recursive=self.recursive,
+            )
+            self.observer.start()
+        except OSError as exc:
+            self.fallback_reason = f"file system events observer failed to start: {exc}"
+            return
 
-        self.observer.schedule(  # pyright: ignore[reportUnknownMemberType]
-            self.event_handler, self.watched_folder, recursive=self.recursive
-        )
+        # wake up the coroutine once observer has terminated, whatever the reason
+        threading.Thread(target=self._wait_for_observer, daemon=True).start()
 
-        self.observer.start()
+    async def _watch_events(self):
+        """Process file system events until watcher stops or events are not reliable"""
+        silence_check = asyncio.create_task(self._check_silence())
+        try:
+            while events := await self._get_events():
+                await asyncio.to_thread(self.event_handler.process_events, events)
+        finally:
+            silence_check.cancel()
+        if not self.stopping and not self.fallback_reason:
+            self.fallback_reason = "file system events observer stopped unexpectedly"
+
+    async def _check_silence(self):
+        """Detect when log files grow while no file system event is received"""
+        if not self.bridge or not self.events:  # pragma: no cover
+            raise ValueError("Log watcher has not been started")
+        sizes = await asyncio.to_thread(self.log_file_sizes)
+        while True:
+            events_count = self.bridge.events_count
+            await asyncio.sleep(self.silence_check_interval)
+            new_sizes = await asyncio.to_thread(self.log_file_sizes)
+            grown = [
+                file_id
+                for file_id, size in new_sizes.items()
+                if size > sizes.get(file_id, 0)
+            ]
+            sizes = new_sizes
+            if not grown or self.bridge.events_count != events_count:
+                continue
+            # leave some time for events of latest modifications to be received
+            await asyncio.sleep(SILENCE_GRACE_SECONDS)
+            if self.bridge.events_count == events_count:
+                self.fallback_reason = (
+                    f"{len(grown)} log file(s) grew during"
+                    f" {self.silence_check_interval} seconds without any file system"
+                    " event"
+                )
+                self.events.put_nowait(None)
+                return
 
-        logger.info("Log watcher has started succesfully")
+    def log_file_sizes(self) -> dict[FileId, int]:
+        """Return size of all log files in watched folder"""
+        sizes: dict[FileId, int] = {}
+        files = (
+            self.watched_folder.rglob("*")
+            if self.recursive
+            else self.watched_folder.glob("*")
+        )
+        for file in files:
+            try:
+                if not file.is_file() or not is_log_file(file):
+                    continue
+                stat = file.stat()
+            except OSError:
+                continue  # file has disappeared in the meantime
+            sizes[(stat.st_dev, stat.st_ino)] = stat.st_size
+        return sizes
+
+    async def _poll_files(self):
+        """Poll files status until watcher stops, with an adaptive interval"""
+        if not self.events:  # pragma: no cover
+            raise ValueError("Log watcher has not been started")
+        while not self.stopping:
+            try:
+                # the queue is used only to be woken up when watcher has to stop
+                await asyncio.wait_for(self.events.get(), timeout=self.polling_interval)
+            except TimeoutError:
+                pass
+            if self.stopping:
+                break
+            if await asyncio.to_thread(self.process_existing_files):
+                self.polling_interval = self.polling_min_interval
+            else:
+                self.polling_interval = min(
+                    self.polling_interval * 2, self.polling_max_interval
+                )
 
-        while self.observer.is_alive():
-            self.observer.join(OBSERVER_PAUSE_SECONDS)
+    def stats(self) -> Metrics:
+        """Current log watcher metrics"""
+        return {
+            "mode": self.mode.value,
+            "fallback_reason": self.fallback_reason or "",
+            "events_received": self.events_received,
+            "events_coalesced": self.events_coalesced,
+            "polling_interval_seconds": (
+                self.polling_interval if self.mode == WatchMode.POLLING else 0
+            ),
+        }
+
+    async def _get_events(self) -> list[FileSystemEvent]:
+        """Wait for next events and coalesce them
+
+        Once an event is received, we wait until `coalesce_window` seconds have
+        elapsed since previous events were taken (no wait after an idle period) and
+        then take all events received so far (including the ones received while the
+        previous events were being processed). An empty list is returned once watcher
+        has to stop.
+        """
+        if not self.events:  # pragma: no cover
+            raise ValueError("Log watcher has not been started")
+        events: list[FileSystemEvent] = []
+        event = await self.events.get()
+        if event is None:
+            return events
+        wait = self.last_events_taken + self.coalesce_window - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        events.append(event)
+        while not self.events.empty():
+            event = self.events.get_nowait()
+            if event is None:
+                # process events received so far, and then stop
+                self.events.put_nowait(None)
+                break
+            events.append(event)
+        self.last_events_taken = time.monotonic()
+        coalesced = coalesce_events(events)
+        self.events_received += len(events)
+        self.events_coalesced += len(events) - len(coalesced)
+        return coalesced
 
-        logger.info("Log watcher run is terminating")
+    def run_sync(self):
+        """Watch directory"""
+        asyncio.run(self.run_async())
 
+    def _wait_for_observer(self):
+        """Wait for observer termination and then stop the coroutine"""
         self.observer.join()
+        self._stop_coroutine()
 
-        logger.info("Log watcher run has completed")
+    def _stop_coroutine(self):
+        """Push the special value stopping the coroutine once pending events are done"""
+        if not self.loop or not self.events:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.events.put_nowait, None)
+        except RuntimeError:
+            pass  # event loop is already closed, nothing to stop anymore
 
     def stop(self):
-        """Stop watcher"""
+        """Stop watcher
+
+        Pending events are still processed. When called from another thread than the
+        one running the watcher, this waits (a bit) for the watcher to complete.
+        """
+        self.stopping = True
         if self.observer.is_alive():
             logger.info("Log watcher is stopping")
             self.observer.stop()
             self.observer.join(OBSERVER_STOP_MAX_SECONDS)  # do not wait forever
         else:
             logger.info("Log watcher is already dead")
-
-    def process_existing_files(self):
-        """Process files that are already there at watcher startup"""
-        for file in self.watched_folder.rglob("*"):
+        self._stop_coroutine()
+        if self.loop and self.loop_thread_id != threading.get_ident():
+            self.completed.wait(OBSERVER_STOP_MAX_SECONDS)  # do not wait forever
+
+    def process_existing_files(self) -> int:
+        """Process files that are already there at watcher startup
+
+        Lines appended while we were not running are processed in chronological
+        order, whatever the number of files they are spread into. This is also used
+        to poll files when file system events are not reliable.
+
+        Returns the number of lines processed.
+        """
+        existing_file_ids: set[FileId] = set()
+        file_paths: list[Path] = []
+        files = (
+            self.watched_folder.rglob("*")
+            if self.recursive
+            else self.watched_folder.glob("*")
+        )
+        for file in files:
             try:
                 if not file.is_file():
                     continue
-                # Let's consider that all existing files have been modified, so that we
+                stat = file.stat()
+                existing_file_ids.add((stat.st_dev, stat.st_ino))
+                # Skip files which are not in our scope of interest, or which have
+                # already been fully read (most probably rotated files which will never
+                # be modified anymore)
+                if not is_log_file(file) or self.event_handler.is_fully_consumed(stat):
+                    continue
+                # Let's consider that all other files have been modified, so that we
                 # process any line that might have appeared since our last execution
-                event = FileSystemEvent(str(file))
-                event.is_directory = False
-                event.event_type = EVENT_TYPE_MODIFIED
-                self.event_handler.on_any_event(event)
+                file_paths.append(file)
             except Exception as exc:  # pragma: no cover
                 logger.warn(f"Error processing file {file}", exc_info=exc)
+        nb_lines = self.event_handler.catch_up(file_paths)
+        # Forget about files which have disappeared while we were not running
+        self.event_handler.forget_missing_files(existing_file_ids)
+        self.event_handler.save_state()
+        return nb_lines
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from offspot_metrics_backend.business.telemetry import Metrics
+
+
+class LruCache[K: Hashable, V]:
+    """A bounded cache, evicting least recently used entries first
+
+    Hits and misses are counted, so that cache efficiency can be monitored. A cache
+    with a `max_size` of 0 never stores anything.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.entries: OrderedDict[K, V] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> V | None:
+        """Return the value of a key, None if it is not in cache"""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        """Store the value of a key, evicting least recently used entry if needed"""
+        if not self.max_size:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self.entries.clear()
+
+    @property
+    def hit_ratio(self) -> float:
+        """Ratio of lookups which were hits, 0 when there was no lookup yet"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def stats(self) -> Metrics:
+        """Current cache metrics"""
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
@@ -181,19 +181,31 @@ class Period:
 class Now:
     def __init__(self) -> None:
         self.datetime = datetime.datetime.now()  # noqa: DTZ005
+        self.timestamp = int(self.datetime.timestamp())
         self.period = Period(self.datetime)
-        self.tick = Tick(self.datetime)
+        self.tick = Tick(self.timestamp)
 
 
-@dataclass
+@dataclass(slots=True)
 class Tick:
     """A processing tick
 
-    A processing tick occurs every minutes"""
+    A processing tick occurs every minutes. It is identified by the timestamp (number
+    of seconds since Unix epoch) of the start of the minute, since ticks are computed
+    for every log line and integer arithmetic is way cheaper than datetime objects.
+    Time zones offsets being whole minutes, this is also the start of the local minute.
+    """
 
-    dt: datetime.datetime
+    ts: int
 
     def __post_init__(self):
-        self.dt = datetime.datetime.combine(
-            self.dt.date(), datetime.time(hour=self.dt.hour, minute=self.dt.minute)
-        )
+        self.ts -= self.ts % 60
+
+    @property
+    def dt(self) -> datetime.datetime:
+        """Return the tick start as a (naive, local) datetime"""
+        return datetime.datetime.fromtimestamp(self.ts)
+
+    def get_next(self) -> "Tick":
+        """Return the next tick"""
+        return Tick(self.ts + 60)
@@ -1,5 +1,6 @@
-import datetime
 import threading
+from dataclasses import dataclass, replace
+from time import monotonic, perf_counter
 
 from sqlalchemy.orm import Session
 
@@ -8,17 +9,36 @@ from offspot_metrics_backend.business.indicators import ALL_INDICATORS
 from offspot_metrics_backend.business.indicators.processor import (
     Processor as IndicatorProcessor,
 )
+from offspot_metrics_backend.business.indicators.processor import TickSnapshot
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
 from offspot_metrics_backend.business.inputs.clock_tick import ClockTick
 from offspot_metrics_backend.business.inputs.input import Input
 from offspot_metrics_backend.business.kpis import ALL_KPIS
 from offspot_metrics_backend.business.kpis.processor import Processor as KpiProcessor
+from offspot_metrics_backend.business.log_watcher import FileState
 from offspot_metrics_backend.business.period import Now, Period, Tick
+from offspot_metrics_backend.business.tail_reader import FileId
+from offspot_metrics_backend.business.telemetry import Metrics
+from offspot_metrics_backend.business.tick_worker import TickWorker
 from offspot_metrics_backend.constants import logger
 from offspot_metrics_backend.db import dbsession
+from offspot_metrics_backend.db.persister import Persister
 
 INACTIVITY_THRESHOLD_SECONDS = (
     10  # in seconds, inactivity threshold that will force processing
 )
+MAX_REPLAYED_TICKS = (
+    5  # missed ticks always replayed, beyond which only really elapsed ones are
+)
+
+
+@dataclass
+class TickJob:
+    """Everything frozen at a tick, to be persisted"""
+
+    tick_period: Period
+    file_states: list[FileState]
+    snapshot: TickSnapshot | None
 
 
 class Processor:
@@ -29,12 +49,38 @@ class Processor:
     It makes no sense to commit only few inconsistent data. It makes no sense to make
     some inconsistent data visible to a another reader (e.g. API) which could come at
     the same time. Pending modifications are  in any case visible to the running code
-    which is inside the same DB session."""
+    which is inside the same DB session.
+
+    Inputs are processed in memory only, since DB is updated only when a tick is
+    processed: a DB session is opened only at that time.
+
+    Position up to which every log file has been processed is checkpointed in DB at
+    every tick, in the same transaction as indicator states, so that exactly the lines
+    whose effect has not been persisted are processed again after a restart.
+
+    At every tick, indicators are frozen under the lock, and then persisted with KPIs,
+    either synchronously or on a dedicated tick worker when started. In the latter
+    case, ingestion goes on in fresh recorders while the tick is persisted."""
 
     def __init__(self) -> None:
         self.lock = threading.Lock()
-        self.last_action: datetime.datetime | None = None
+        self.last_action: int | None = None  # seconds since Unix epoch
         self.last_tick_processed: Tick | None = None
+        self.last_tick_monotonic = 0.0  # seconds, on a monotonic clock
+        self.log_checkpoints: dict[FileId, FileState] = {}
+        # fingerprint of log files forgotten while some of their lines might still be
+        # queued, these lines are processed but the files are not checkpointed again
+        self.forgotten_files: dict[FileId, str | None] = {}
+        self.tick_worker: TickWorker[TickJob] | None = None
+        self.ticks = 0
+        self.last_tick_stall = 0.0  # seconds
+        self.max_tick_stall = 0.0  # seconds
+        self.total_tick_stall = 0.0  # seconds
+        self.skipped_ticks = 0
+        self.clock_backward_jumps = 0
+        # latest period reached before the clock went back, periods up to it might
+        # have been closed already and are hence re-opened
+        self.reopened_until: Period | None = None
 
     @dbsession
     def startup(self, session: Session):
@@ -52,48 +98,186 @@ class Processor:
             # Restore data from DB to memory
             self.indicator_processor.restore_from_db(session=session)
             self.kpi_processor.restore_from_db(session=session)
+            self.log_checkpoints = {
+                file_state.file_id: file_state
+                for file_state in Persister.get_log_file_states(session=session)
+            }
+
+    @property
+    def log_file_states(self) -> list[FileState]:
+        """Return a copy of the reading state of log files, as checkpointed"""
+        with self.lock:
+            return [replace(state) for state in self.log_checkpoints.values()]
+
+    def restore_log_file_states(self, file_states: list[FileState]):
+        """Restore reading state of log files, e.g. saved by former versions"""
+        with self.lock:
+            self.log_checkpoints = {
+                file_state.file_id: replace(file_state) for file_state in file_states
+            }
+            self.forgotten_files = {}
 
     @dbsession
-    def process_inputs(self, result: ProcessingResult, session: Session):
+    def persist_log_file_states(self, session: Session):
+        """Checkpoint reading state of log files in DB right away"""
+        with self.lock:
+            file_states = [replace(state) for state in self.log_checkpoints.values()]
+        Persister.persist_log_file_states(file_states=file_states, session=session)
+
+    def forget_log_files(self, file_ids: list[FileId]):
+        """Stop checkpointing reading state of some log files (e.g. deleted ones)"""
+        with self.lock:
+            for file_id in file_ids:
+                state = self.log_checkpoints.pop(file_id, None)
+                self.forgotten_files[file_id] = state.fingerprint if state else None
+
+    def _start_checkpoint(self, file_state: FileState | None) -> FileState | None:
+        """Return the checkpoint of a log file to update while processing a batch
+
+        Log files forgotten since the batch has been read are not checkpointed again,
+        unless their identifier has been reused by another file (different
+        fingerprint). Assumes lock is already acquired."""
+
+        if not file_state:
+            return None
+        file_id = file_state.file_id
+        if file_id in self.forgotten_files:
+            fingerprint = self.forgotten_files[file_id]
+            if fingerprint is None:
+                # file forgotten before being checkpointed, its lines are still queued
+                self.forgotten_files[file_id] = file_state.fingerprint
+                return None
+            if fingerprint == file_state.fingerprint:
+                return None
+            del self.forgotten_files[file_id]
+        # position before this batch is the last one checkpointed for the file
+        previous = self.log_checkpoints.get(file_id)
+        checkpoint = replace(file_state, position=previous.position if previous else 0)
+        self.log_checkpoints[file_id] = checkpoint
+        return checkpoint
+
+    def process_inputs(self, result: ProcessingResult):
         """Process all inputs received from a log event
 
         This function also triggers a tick processing every time we changed
         from tick, i.e. every minutes, more or less.
+
+        Inputs are processed in memory only, a DB session is opened only when a tick
+        has to be processed.
         """
 
         with self.lock:
-            # processing results are not valid
-            if not result.ts:
-                return
+            self._process_inputs(result=result, now=Now().timestamp)
 
-            now = Now().datetime
+    def process_inputs_batch(
+        self,
+        results: list[ProcessingResult],
+        file_state: FileState | None = None,
+        offsets: list[int] | None = None,
+    ):
+        """Process all inputs received from a batch of log events
 
-            # Update the last action moment
-            self.last_action = now
+        All results are processed under a single lock acquisition.
 
-            # Compute current tick
-            current_tick = Tick(result.ts)
+        When the `file_state` of the log file is passed, with the `offsets` of every
+        log line (i.e. the position in the file just after the line), the position
+        up to which lines have been processed is checkpointed as well.
+        """
 
-            # if we are just starting the app, let's set last_tick_processed to current
-            # one as an approximation
-            if not self.last_tick_processed:
-                self.last_tick_processed = current_tick
+        if file_state and len(results) != len(offsets or []):
+            raise ValueError("One offset per result is expected")
 
-            # if we changed tick, process one tick
-            if current_tick != self.last_tick_processed:
+        with self.lock:
+            now = Now().timestamp
+            checkpoint = self._start_checkpoint(file_state)
+            for index, result in enumerate(results):
+                self._process_inputs(result=result, now=now)
+                if checkpoint and offsets:
+                    checkpoint.position = offsets[index]
+            if checkpoint and file_state:
+                checkpoint.position = file_state.position
+
+    def process_batch(
+        self,
+        batch: InputsBatch,
+        file_state: FileState | None = None,
+        offsets: list[int] | None = None,
+    ):
+        """Process all inputs of a columnar batch of log lines
+
+        Results are identical to `process_inputs_batch`, but inputs are passed to
+        indicators in bulk, one range of inputs per tick, instead of one by one.
+        """
+
+        if file_state and batch.nb_lines != len(offsets or []):
+            raise ValueError("One offset per line is expected")
+
+        with self.lock:
+            now = Now().timestamp
+            checkpoint = self._start_checkpoint(file_state)
+            pending_line = 0
+            for line, ts in enumerate(batch.lines_ts):
+                # line is not valid
+                if not ts:
+                    continue
+                self.last_action = now
+                current_tick = Tick(ts)
+                if not self.last_tick_processed:
+                    self._set_last_tick(current_tick)
+                # lines older than last tick (e.g. from another log file) belong to
+                # the current tick, nothing is replayed
+                if current_tick.ts <= self.last_tick_processed.ts:
+                    continue
+                # tick changed, process inputs of lines before it and then the tick
+                self.indicator_processor.process_batch(
+                    batch, *batch.inputs_range(pending_line, line)
+                )
+                pending_line = line
+                if checkpoint and offsets and line:
+                    checkpoint.position = offsets[line - 1]
                 logger.debug(f"Natural tick at {current_tick.dt}")
-                self._process_tick(now=current_tick.dt, session=session)
+                self._process_natural_tick(now=current_tick.ts)
+            self.indicator_processor.process_batch(
+                batch, *batch.inputs_range(pending_line, batch.nb_lines)
+            )
+            if checkpoint and file_state:
+                checkpoint.position = file_state.position
 
-            # then in all cases, process inputs
-            for input_ in result.inputs:
-                logger.debug(f"Processing input: {input_}")
-                try:
-                    self.process_input(input_=input_)
-                except Exception as exc:
-                    logger.warning("Error processing input", exc_info=exc)
+    def _process_inputs(self, result: ProcessingResult, now: int):
+        """Process all inputs of one log event, assuming lock is already acquired
 
-    @dbsession
-    def check_for_inactivity(self, session: Session):
+        `now` is the current timestamp, in seconds since Unix epoch."""
+
+        # processing results are not valid
+        if not result.ts:
+            return
+
+        # Update the last action moment
+        self.last_action = now
+
+        # Compute current tick
+        current_tick = Tick(result.ts)
+
+        # if we are just starting the app, let's set last_tick_processed to current
+        # one as an approximation
+        if not self.last_tick_processed:
+            self._set_last_tick(current_tick)
+
+        # if we moved to a later tick, process one tick ; inputs of lines older than
+        # last tick (e.g. from another log file) belong to the current tick
+        if current_tick.ts > self.last_tick_processed.ts:
+            logger.debug(f"Natural tick at {current_tick.dt}")
+            self._process_natural_tick(now=current_tick.ts)
+
+        # then in all cases, process inputs
+        for input_ in result.inputs:
+            logger.debug(f"Processing input: {input_}")
+            try:
+                self.process_input(input_=input_)
+            except Exception as exc:
+                logger.warning("Error processing input", exc_info=exc)
+
+    def check_for_inactivity(self):
         """Check if the system did not received any logs for too long
 
         If the system did not received any log for too long, we start a new tick
@@ -101,54 +285,222 @@ class Processor:
         """
 
         with self.lock:
-            now = Now().datetime
+            now = Now().timestamp
 
             # If we just started the app and not received any log, this could happen
             if not self.last_action:
                 self.last_action = now
             if not self.last_tick_processed:
-                self.last_tick_processed = Tick(now)
+                self._set_last_tick(Tick(now))
+
+            # If clock went back (e.g. set by NTP), nothing is replayed: current period
+            # is closed and ticks go on from current time, re-opening an earlier period
+            now_tick = Tick(now)
+            if now_tick.ts < self.last_tick_processed.ts:
+                logger.warning(
+                    f"Clock went back from {self.last_tick_processed.dt} to"
+                    f" {now_tick.dt}, ticks resume from there"
+                )
+                self.clock_backward_jumps += 1
+                current_period = self.indicator_processor.current_period
+                if current_period and (
+                    not self.reopened_until
+                    or current_period.timestamp > self.reopened_until.timestamp
+                ):
+                    self.reopened_until = current_period
+                self._process_natural_tick(now=now_tick.ts)
+                self.last_action = now
+                return
 
             # If last action was less then 10 seconds ago, continue to wait
-            if (now - self.last_action).total_seconds() < INACTIVITY_THRESHOLD_SECONDS:
+            if now - self.last_action < INACTIVITY_THRESHOLD_SECONDS:
                 return
 
-            # If last tick processed is too far in the past, let's force it to advance
-            while Tick(now) != self.last_tick_processed:
-                next_tick_dt = self.last_tick_processed.dt + datetime.timedelta(
-                    minutes=1
-                )
-                logger.debug(f"Forcing a tick for inactivity at {next_tick_dt}")
-                self._process_tick(now=next_tick_dt, session=session)
+            # If last tick processed is in the past, let's force it to advance ; missed
+            # ticks are replayed only here, ticks driven by log lines never are
+            if now_tick != self.last_tick_processed:
+                logger.debug(f"Forcing ticks for inactivity up to {now_tick.dt}")
+                self._advance_to(now_tick)
                 self.last_action = now
 
-    def _process_tick(self, now: datetime.datetime, session: Session):
+    def start_tick_worker(self) -> None:
+        """Persist ticks on a dedicated worker from now on
+
+        Ingestion is then stalled at every tick only while indicators are frozen,
+        instead of until indicators and KPIs are persisted."""
+        self.tick_worker = TickWorker(handler=self._persist_tick_in_new_session)
+        self.tick_worker.start()
+
+    def stop_tick_worker(self, timeout: float | None = None) -> None:
+        """Persist all ticks already processed and stop the tick worker"""
+        if self.tick_worker:
+            self.tick_worker.stop(timeout=timeout)
+            self.tick_worker = None
+
+    def tick_stats(self) -> Metrics:
+        """Current metrics of tick processing, stall times being in milliseconds"""
+        stats: Metrics = {
+            "ticks": self.ticks,
+            "last_stall_ms": round(self.last_tick_stall * 1000, 3),
+            "max_stall_ms": round(self.max_tick_stall * 1000, 3),
+            "total_stall_ms": round(self.total_tick_stall * 1000, 3),
+            "skipped_ticks": self.skipped_ticks,
+            "clock_backward_jumps": self.clock_backward_jumps,
+        }
+        if self.tick_worker:
+            stats.update(
+                {
+                    f"worker_{name}": value
+                    for name, value in self.tick_worker.stats().items()
+                }
+            )
+        return stats
+
+    def _set_last_tick(self, tick: Tick):
+        """Set last tick processed, and the moment it was, on a monotonic clock"""
+        self.last_tick_processed = tick
+        self.last_tick_monotonic = monotonic()
+
+    def _advance_to(self, tick: Tick):
+        """Process ticks up to a later tick, assuming lock is already acquired
+
+        Missed ticks are replayed when there are at most MAX_REPLAYED_TICKS of them, or
+        as long as they really elapsed on a monotonic clock (e.g. processing stalled),
+        so that no uptime is lost. Replayed ticks only pass a clock tick to
+        indicators, except the last one and those closing a period, which are
+        processed completely. Ticks which did not really elapse (clock set by NTP,
+        device suspended) are skipped: the open period is closed only once, and empty
+        periods are not processed at all."""
+        if not self.last_tick_processed:
+            raise ValueError("Last tick processed is not known")
+        missed_ticks = (tick.ts - self.last_tick_processed.ts) // 60
+        replayed_ticks = missed_ticks
+        if missed_ticks > MAX_REPLAYED_TICKS:
+            elapsed_ticks = int((monotonic() - self.last_tick_monotonic) // 60)
+            replayed_ticks = min(missed_ticks, elapsed_ticks)
+        if replayed_ticks < missed_ticks:
+            logger.info(
+                f"No tick since {self.last_tick_processed.dt}, jumping ahead to"
+                f" {tick.dt} after {replayed_ticks} ticks"
+            )
+            self.skipped_ticks += missed_ticks - replayed_ticks - 1
+
+        previous_tick = self.last_tick_processed
+        for _ in range(replayed_ticks):
+            next_tick = previous_tick.get_next()
+            if next_tick == tick or Period.from_timestamp(
+                next_tick.ts
+            ) != Period.from_timestamp(previous_tick.ts):
+                self._process_natural_tick(now=next_tick.ts)
+            else:
+                self._process_clock_tick(next_tick)
+            previous_tick = next_tick
+        if previous_tick != tick:
+            self._process_natural_tick(now=tick.ts)
+        self._set_last_tick(tick)
+
+    def _restore_reopened_period(self):
+        """Restore indicators of a period re-opened since the clock went back
+
+        Must be called with lock acquired, once the current period changed. Ticks
+        already processed are persisted first, so that records of the re-opened period
+        are up-to-date."""
+        current_period = self.indicator_processor.current_period
+        if not current_period or not self.reopened_until:
+            return
+        if current_period.timestamp > self.reopened_until.timestamp:
+            # clock caught up, no period is re-opened anymore
+            self.reopened_until = None
+            return
+        if self.tick_worker:
+            self.tick_worker.join()
+        self._restore_reopened_period_in_new_session()
+
+    @dbsession
+    def _restore_reopened_period_in_new_session(self, session: Session):
+        """Restore indicators of a re-opened period, in its own DB session"""
+        self.indicator_processor.restore_reopened_period(session=session)
+
+    def _process_natural_tick(self, now: int):
+        """Process a tick, assuming lock is already acquired
+
+        The tick is persisted by the tick worker when it is started, or synchronously
+        in its own DB session otherwise. Ingestion stall time is measured in both
+        cases."""
+        start = perf_counter()
+        previous_period = self.indicator_processor.current_period
+        if self.tick_worker:
+            self.tick_worker.submit(self._snapshot_tick(now=now))
+        else:
+            self._process_tick_in_new_session(now=now)
+        if self.indicator_processor.current_period != previous_period:
+            self._restore_reopened_period()
+        stall = perf_counter() - start
+        self.ticks += 1
+        self.last_tick_stall = stall
+        self.max_tick_stall = max(self.max_tick_stall, stall)
+        self.total_tick_stall += stall
+        logger.debug(f"Tick stalled ingestion for {stall * 1000:.3f}ms")
+
+    @dbsession
+    def _process_tick_in_new_session(self, now: int, session: Session):
+        """Process a tick synchronously, in its own DB session"""
+        self._process_tick(now=now, session=session)
+
+    def _process_tick(self, now: int, session: Session):
+        """Process a tick, `now` being its timestamp in seconds since Unix epoch"""
+        self._persist_tick(job=self._snapshot_tick(now=now), session=session)
+
+    def _snapshot_tick(self, now: int) -> TickJob:
+        """Process a tick in memory, returning what has to be persisted
+
+        Must be called with lock acquired, `now` being the tick timestamp in seconds
+        since Unix epoch."""
         logger.debug("Tick processing started")
-        self.last_tick_processed = Tick(now)
+        self._process_clock_tick(Tick(now))
 
-        # Generate a ClockTick input
+        tick_period = Period.from_timestamp(now)
+        return TickJob(
+            tick_period=tick_period,
+            file_states=[replace(state) for state in self.log_checkpoints.values()],
+            snapshot=self.indicator_processor.snapshot_tick(tick_period=tick_period),
+        )
+
+    def _process_clock_tick(self, tick: Tick):
+        """Pass a clock tick to indicators, assuming lock is already acquired"""
+        self._set_last_tick(tick)
         try:
             logger.debug("Generating a clock tick")
-            self.process_input(ClockTick(ts=now))
+            self.process_input(ClockTick(ts=tick.ts))
         except Exception as exc:
             logger.warning("Exception occured in clock tick", exc_info=exc)
 
-        # Perform what needs to be done with indicators
-        tick_period = Period(now)
+    @dbsession
+    def _persist_tick_in_new_session(self, job: TickJob, session: Session):
+        """Persist a tick in its own DB session, typically on the tick worker"""
+        self._persist_tick(job=job, session=session)
+
+    def _persist_tick(self, job: TickJob, session: Session):
+        """Persist what has been frozen at a tick, and update KPIs accordingly
 
-        self.indicator_processor.process_tick(
-            tick_period=tick_period,
-            session=session,
-        )
+        Only the KPI processor state is updated, which is done only here, hence
+        without any lock."""
+
+        # Checkpoint log files position, in same transaction than indicator states
+        Persister.persist_log_file_states(file_states=job.file_states, session=session)
+
+        # Persist indicators
+        if job.snapshot:
+            IndicatorProcessor.persist_tick(snapshot=job.snapshot, session=session)
 
         kpi_updated = self.kpi_processor.process_tick(
-            tick_period=tick_period,
+            tick_period=job.tick_period,
             session=session,
         )
 
         if kpi_updated:
             self.indicator_processor.post_process_tick(
-                tick_period=tick_period,
+                tick_period=job.tick_period,
                 session=session,
             )
 
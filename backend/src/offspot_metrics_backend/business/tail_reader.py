@@ -0,0 +1,353 @@
+import abc
+import hashlib
+import os
+import zlib
+from collections.abc import Generator
+from pathlib import Path
+from typing import Protocol
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    # zstandard is an optional dependency, .zst files are ignored without it
+    zstandard = None
+
+from offspot_metrics_backend.constants import logger
+
+ENCODING = "utf-8"
+
+# Size of the chunks read from disk at once
+READ_CHUNK_SIZE = 64 * 1024
+
+# Size above which an incomplete line is considered garbage and discarded ; this is
+# way bigger than any Caddy log line but still protects memory from a broken file
+MAX_LINE_SIZE = 1024 * 1024
+
+# Number of bytes at file start used to compute file fingerprint
+FINGERPRINT_SIZE = 1024
+
+# Compressed bytes passed at once to zstandard, which cannot bound the size of its
+# output ; a zstd block of at least 4 bytes decompresses to at most 128 KiB, so this
+# bounds data decompressed at once to a few MiB even for a malicious file
+ZSTD_MAX_INPUT_SIZE = 256
+
+# A file is identified by its device and inode numbers
+type FileId = tuple[int, int]
+
+
+class TailReader:
+    """Read lines appended to a file, keeping the file open between reads
+
+    Content is read in chunks of `chunk_size` bytes, so that memory consumption is
+    bounded whatever the amount of data to read. An incomplete last line is kept in a
+    carry-over buffer until it is completed by a subsequent read.
+
+    `position` is tracked in bytes and is the position just after the last complete
+    line returned.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        position: int = 0,
+        chunk_size: int = READ_CHUNK_SIZE,
+        max_line_size: int = MAX_LINE_SIZE,
+    ) -> None:
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.max_line_size = max_line_size
+        self.handle = open(file_path, "rb")
+        stat = os.fstat(self.handle.fileno())
+        self.file_id: FileId = (stat.st_dev, stat.st_ino)
+        self.position = 0
+        self.carry = b""
+        self.discarding = False
+        self.seek(position)
+
+    def close(self) -> None:
+        """Close the underlying file handle"""
+        self.handle.close()
+
+    def seek(self, position: int) -> None:
+        """Move to a given position, which must be at the start of a line"""
+        self.position = position
+        self.handle.seek(position)
+        self.carry = b""
+        self.discarding = False
+
+    def fingerprint(self, size: int = FINGERPRINT_SIZE) -> tuple[str, int]:
+        """Return the fingerprint of the file start, with the number of bytes used
+
+        Less than `size` bytes are used when file is smaller.
+        """
+        data = self._read_start(size)
+        return hashlib.blake2b(data, digest_size=16).hexdigest(), len(data)
+
+    def _read_start(self, size: int) -> bytes:
+        """Return up to `size` bytes at file start, without moving current position"""
+        return os.pread(self.handle.fileno(), size, 0)
+
+    @property
+    def complete(self) -> bool:
+        """Whether file is known to be complete, i.e. no data will be appended"""
+        return False
+
+    def _read_chunk(self) -> bytes:
+        """Return next chunk of data, or empty bytes at end of file"""
+        return self.handle.read(self.chunk_size)
+
+    def _reset_if_truncated(self) -> None:
+        """Restart from file start if it looks like file has been truncated"""
+        if os.fstat(self.handle.fileno()).st_size < self.position + len(self.carry):
+            self.seek(0)
+
+    def read_lines(self) -> Generator[tuple[str, int], None, None]:
+        """Return all complete lines appended since last read
+
+        Lines are returned stripped, along with the position just after the line.
+        """
+        self._reset_if_truncated()
+        while chunk := self._read_chunk():
+            data = self.carry + chunk
+            start = 0
+            while (end := data.find(b"\n", start)) != -1:
+                line = data[start:end]
+                self.position += end + 1 - start
+                start = end + 1
+                if self.discarding:
+                    # this is the end of a line which was too long, ignore it
+                    self.discarding = False
+                    continue
+                yield line.decode(ENCODING, errors="replace").strip(), self.position
+            self.carry = data[start:]
+            if len(self.carry) > self.max_line_size:
+                logger.warning(
+                    f"Discarding line longer than {self.max_line_size} bytes in"
+                    f" {self.file_path} at {self.position}"
+                )
+                self.position += len(self.carry)
+                self.carry = b""
+                self.discarding = True
+
+
+class Decompressor(Protocol):
+    """Interface of streaming decompression objects (zlib, zstandard)"""
+
+    unconsumed_tail: bytes
+
+    @property
+    def eof(self) -> bool:
+        """Whether end of stream has been reached"""
+        ...  # pragma: no cover
+
+    @property
+    def unused_data(self) -> bytes:
+        """Compressed data found after end of stream"""
+        ...  # pragma: no cover
+
+    def decompress(self, data: bytes, max_length: int, /) -> bytes:
+        """Decompress data, returning at most `max_length` bytes
+
+        Compressed data which has not been decompressed yet is kept in
+        `unconsumed_tail`, to be passed again on next call.
+        """
+        ...  # pragma: no cover
+
+
+class CompressedTailReader(TailReader):
+    """Read lines of a compressed file, decompressing it on the fly
+
+    `position` is tracked in uncompressed bytes. Data is decompressed chunk by chunk
+    (`chunk_size` compressed and uncompressed bytes at most at once), so memory
+    consumption is bounded whatever the file size and compression ratio, and nothing is
+    written to disk. Seeking means decompressing (and
+    ignoring) data up to the given position.
+
+    A file which is still being compressed (i.e. written) is supported, reading
+    continues once more data has been appended.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        position: int = 0,
+        chunk_size: int = READ_CHUNK_SIZE,
+        max_line_size: int = MAX_LINE_SIZE,
+    ) -> None:
+        self.decompressor = self._new_decompressor()
+        self.pending = b""  # compressed data not yet decompressed
+        self.buffered = b""  # decompressed data not yet returned
+        self.output_limited = False  # whether last decompression filled a chunk
+        super().__init__(
+            file_path=file_path,
+            position=position,
+            chunk_size=chunk_size,
+            max_line_size=max_line_size,
+        )
+
+    @abc.abstractmethod
+    def _new_decompressor(self) -> Decompressor:
+        """Return a new decompression object"""
+        ...  # pragma: no cover
+
+    def seek(self, position: int) -> None:
+        """Move to a given position, which must be at the start of a line"""
+        self.handle.seek(0)
+        self.decompressor = self._new_decompressor()
+        self.pending = b""
+        self.buffered = b""
+        self.output_limited = False
+        self.carry = b""
+        self.discarding = False
+        to_skip = position
+        while to_skip and (chunk := self._read_chunk()):
+            if len(chunk) > to_skip:
+                self.buffered = chunk[to_skip:]
+            to_skip -= min(len(chunk), to_skip)
+        self.position = position - to_skip
+
+    def _read_start(self, size: int) -> bytes:
+        """Return up to `size` uncompressed bytes at file start"""
+        return self._decompress_start(size)[0]
+
+    def has_start(self, size: int = FINGERPRINT_SIZE) -> bool:
+        """Whether first `size` uncompressed bytes are available
+
+        This is also the case when the whole file has been compressed and is smaller.
+        """
+        data, stream_ended = self._decompress_start(size)
+        return len(data) >= size or stream_ended
+
+    def _decompress_start(self, size: int) -> tuple[bytes, bool]:
+        """Decompress up to `size` bytes at file start
+
+        Returns uncompressed data along with whether end of stream has been reached.
+        """
+        decompressor = self._new_decompressor()
+        data = b""
+        offset = 0
+        compressed = b""
+        while len(data) < size and not decompressor.eof:
+            if not compressed:
+                compressed = os.pread(self.handle.fileno(), size, offset)
+                if not compressed:
+                    break
+                offset += len(compressed)
+            data += decompressor.decompress(compressed, size - len(data))
+            compressed = decompressor.unconsumed_tail
+        return data, decompressor.eof
+
+    @property
+    def complete(self) -> bool:
+        """Whether file is known to be complete, i.e. no data will be appended"""
+        return (
+            self.decompressor.eof
+            and not self.decompressor.unused_data
+            and self.handle.tell() == os.fstat(self.handle.fileno()).st_size
+        )
+
+    def _reset_if_truncated(self) -> None:
+        """Restart from file start if it looks like file has been truncated"""
+        if os.fstat(self.handle.fileno()).st_size < self.handle.tell():
+            self.seek(0)
+
+    def _read_chunk(self) -> bytes:
+        """Return next chunk of decompressed data, or empty bytes at end of file"""
+        if self.buffered:
+            chunk, self.buffered = self.buffered, b""
+            return chunk
+        # decompressor may still have data to output even without more input
+        while (
+            data := self.pending or self.handle.read(self.chunk_size)
+        ) or self.output_limited:
+            if self.decompressor.eof:
+                # another stream follows, e.g. concatenated gzip files
+                self.decompressor = self._new_decompressor()
+            chunk = self.decompressor.decompress(data, self.chunk_size)
+            self.output_limited = len(chunk) == self.chunk_size
+            self.pending = (
+                self.decompressor.unused_data
+                if self.decompressor.eof
+                else self.decompressor.unconsumed_tail
+            )
+            if chunk:
+                return chunk
+        return b""
+
+
+class GzipTailReader(CompressedTailReader):
+    """Read lines of a gzip compressed file"""
+
+    def _new_decompressor(self) -> Decompressor:
+        """Return a new decompression object"""
+        return zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+
+class ZstdDecompressor:
+    """zstandard decompression object bounding the size of its output, like zlib
+
+    Compressed data is passed to zstandard by slices of `ZSTD_MAX_INPUT_SIZE` bytes
+    until `max_length` bytes have been decompressed ; decompressed data in excess is
+    returned on next call.
+    """
+
+    def __init__(self) -> None:
+        if not zstandard:  # pragma: no cover
+            raise ValueError("zstandard is not installed")
+        self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+        self.output = bytearray()  # decompressed data not yet returned
+        self.unconsumed_tail = b""
+
+    @property
+    def eof(self) -> bool:
+        """Whether end of stream has been reached and all data has been returned"""
+        return self.decompressor.eof and not self.output
+
+    @property
+    def unused_data(self) -> bytes:
+        """Compressed data found after end of stream"""
+        return self.decompressor.unused_data + self.unconsumed_tail
+
+    def decompress(self, data: bytes, max_length: int, /) -> bytes:
+        """Decompress data, returning at most `max_length` bytes"""
+        offset = 0
+        while (
+            len(self.output) < max_length
+            and offset < len(data)
+            and not self.decompressor.eof
+        ):
+            self.output += self.decompressor.decompress(
+                data[offset : offset + ZSTD_MAX_INPUT_SIZE]
+            )
+            offset += ZSTD_MAX_INPUT_SIZE
+        self.unconsumed_tail = data[offset:]
+        chunk = bytes(self.output[:max_length])
+        del self.output[:max_length]
+        return chunk
+
+
+class ZstdTailReader(CompressedTailReader):
+    """Read lines of a zstandard compressed file"""
+
+    def _new_decompressor(self) -> Decompressor:
+        """Return a new decompression object"""
+        return ZstdDecompressor()
+
+
+# Readers of compressed files, by file extension
+COMPRESSED_READERS: dict[str, type[CompressedTailReader]] = {".gz": GzipTailReader}
+if zstandard:
+    COMPRESSED_READERS[".zst"] = ZstdTailReader
+
+
+def uncompressed_path(file_path: Path) -> Path:
+    """Return the file path without its compression extension, if any"""
+    if file_path.suffix in COMPRESSED_READERS:
+        return file_path.with_suffix("")
+    return file_path
+
+
+def open_reader(file_path: Path, chunk_size: int = READ_CHUNK_SIZE) -> TailReader:
+    """Open the proper reader for a given file, based on its extension"""
+    reader_class = COMPRESSED_READERS.get(file_path.suffix, TailReader)
+    return reader_class(file_path, chunk_size=chunk_size)
@@ -0,0 +1,36 @@
+from collections.abc import Callable
+
+from offspot_metrics_backend.constants import logger
+
+# Current values of metrics, by metric name
+type Metrics = dict[str, float | str]
+
+type TelemetryProvider = Callable[[], Metrics]
+
+
+class Telemetry:
+    """A registry of internal metrics about the processing pipeline
+
+    Each component registers a provider under a given name. A provider returns the
+    current values of the metrics it is responsible for.
+    """
+
+    def __init__(self) -> None:
+        self.providers: dict[str, TelemetryProvider] = {}
+
+    def register(self, name: str, provider: TelemetryProvider) -> None:
+        """Register a metrics provider, replacing any provider with same name"""
+        self.providers[name] = provider
+
+    def values(self) -> dict[str, Metrics]:
+        """Return current metrics values of all providers"""
+        values: dict[str, Metrics] = {}
+        for name, provider in self.providers.items():
+            try:
+                values[name] = provider()
+            except Exception as exc:
+                logger.warning(f"Error getting {name} telemetry", exc_info=exc)
+        return values
+
+
+telemetry = Telemetry()
@@ -0,0 +1,66 @@
+import queue
+import threading
+import time
+from collections.abc import Callable
+
+from offspot_metrics_backend.business.telemetry import Metrics
+from offspot_metrics_backend.constants import logger
+
+
+class TickWorker[T]:
+    """Handles jobs submitted at every tick on a dedicated thread
+
+    Jobs are handled one at a time, in the order in which they have been submitted, so
+    that ticks are persisted in order. A job which fails is logged and skipped.
+    """
+
+    def __init__(self, handler: Callable[[T], None]) -> None:
+        self.handler = handler
+        self.jobs: queue.Queue[T | None] = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="tick-worker", daemon=True)
+        self.handled = 0
+        self.failed = 0
+        self.last_duration = 0.0  # seconds
+        self.max_duration = 0.0  # seconds
+
+    def start(self) -> None:
+        """Start handling jobs"""
+        self.thread.start()
+
+    def submit(self, job: T) -> None:
+        """Queue a job, to be handled after all jobs already submitted"""
+        self.jobs.put(job)
+
+    def run(self) -> None:
+        """Handle jobs until the worker is stopped"""
+        while (job := self.jobs.get()) is not None:
+            start = time.perf_counter()
+            try:
+                self.handler(job)
+            except Exception as exc:
+                self.failed += 1
+                logger.warning("Error processing tick", exc_info=exc)
+            self.last_duration = time.perf_counter() - start
+            self.max_duration = max(self.max_duration, self.last_duration)
+            self.handled += 1
+            self.jobs.task_done()
+        self.jobs.task_done()
+
+    def join(self) -> None:
+        """Wait for all jobs submitted so far to be handled"""
+        self.jobs.join()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Handle all jobs already submitted and then stop"""
+        self.jobs.put(None)
+        self.thread.join(timeout=timeout)
+
+    def stats(self) -> Metrics:
+        """Current worker metrics"""
+        return {
+            "pending": self.jobs.qsize(),
+            "handled": self.handled,
+            "failed": self.failed,
+            "last_duration_ms": round(self.last_duration * 1000, 3),
+            "max_duration_ms": round(self.max_duration * 1000, 3),
+        }
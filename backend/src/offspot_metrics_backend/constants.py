@@ -46,4 +46,46 @@ class BackendConf:
         "LOGWATCHER_DATA_FOLDER", f"{src_dir}/logwatcher-data"
     )
 
+    # Maximum number of lines passed at once by the log watcher to the processing
+    # logic, and maximum time (in seconds) a line might wait for its batch to be full
+    logwatcher_batch_max_lines = int(os.getenv("LOGWATCHER_BATCH_MAX_LINES", "500"))
+    logwatcher_batch_max_wait_seconds = float(
+        os.getenv("LOGWATCHER_BATCH_MAX_WAIT_SECONDS", "1")
+    )
+
+    # Minimum time (in seconds) between two processing of file events, events
+    # received in between are coalesced
+    logwatcher_coalesce_window_seconds = float(
+        os.getenv("LOGWATCHER_COALESCE_WINDOW_SECONDS", "0.05")
+    )
+
+    # Minimum and maximum time (in seconds) between two polling of log files status,
+    # when file system events are not reliable and log watcher falls back to polling
+    logwatcher_polling_min_seconds = float(
+        os.getenv("LOGWATCHER_POLLING_MIN_SECONDS", "0.5")
+    )
+    logwatcher_polling_max_seconds = float(
+        os.getenv("LOGWATCHER_POLLING_MAX_SECONDS", "10")
+    )
+
+    # Time (in seconds) during which log files growing without any file system event
+    # received makes the log watcher fall back to polling
+    logwatcher_silence_check_seconds = float(
+        os.getenv("LOGWATCHER_SILENCE_CHECK_SECONDS", "60")
+    )
+
+    # Maximum number of log lines waiting in memory to be processed, above which new
+    # lines are spilled to disk (in the log watcher data folder)
+    ingest_queue_max_lines = int(os.getenv("INGEST_QUEUE_MAX_LINES", "10000"))
+
+    # Number of worker processes converting log lines into inputs, 0 to convert them
+    # in the main process
+    converter_workers = int(os.getenv("CONVERTER_WORKERS", "0"))
+
+    # Maximum number of entries of the cache of inputs generated for a given request
+    # (host, method, URI, status), 0 to disable the cache
+    classification_cache_max_size = int(
+        os.getenv("CLASSIFICATION_CACHE_MAX_SIZE", "4096")
+    )
+
     ui_location = pathlib.Path(os.getenv("UI_LOCATION", "/src/ui"))
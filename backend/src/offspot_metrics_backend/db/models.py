@@ -223,3 +223,20 @@ class KpiRecord(Base):
         UniqueConstraint("kpi_id", "agg_value"),
         Index("kpi_id", "agg_kind"),
     )
+
+
+class LogFileState(Base):
+    """Reading state of a log file
+
+    The position is the one up to which lines have been processed and their effect
+    persisted in DB (see business FileState for details on other fields)
+    """
+
+    __tablename__ = "log_file_state"
+    device: Mapped[int] = mapped_column(primary_key=True)
+    inode: Mapped[int] = mapped_column(primary_key=True)
+    fingerprint: Mapped[str]
+    fingerprint_size: Mapped[int]
+    position: Mapped[int]
+    path: Mapped[str]
+    complete_size: Mapped[int | None]
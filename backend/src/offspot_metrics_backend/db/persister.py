@@ -1,16 +1,24 @@
+from collections.abc import Sequence
+
 import sqlalchemy as sa
 from dateutil.relativedelta import relativedelta
 from sqlalchemy.orm import Session
 
 from offspot_metrics_backend.business.agg_kind import AggKind
-from offspot_metrics_backend.business.indicators.indicator import Indicator
+from offspot_metrics_backend.business.indicators.holder import Record
+from offspot_metrics_backend.business.indicators.indicator import (
+    Indicator,
+    IndicatorSnapshot,
+)
 from offspot_metrics_backend.business.kpis.value import Value
+from offspot_metrics_backend.business.log_watcher import FileState
 from offspot_metrics_backend.business.period import Period
 from offspot_metrics_backend.db.models import IndicatorDimension as DimensionDb
 from offspot_metrics_backend.db.models import IndicatorPeriod as PeriodDb
 from offspot_metrics_backend.db.models import IndicatorRecord as RecordDb
 from offspot_metrics_backend.db.models import IndicatorState as StateDb
 from offspot_metrics_backend.db.models import KpiRecord, KpiValue
+from offspot_metrics_backend.db.models import LogFileState as LogFileStateDb
 
 
 class Persister:
@@ -32,7 +40,7 @@ class Persister:
 
     @classmethod
     def persist_indicator_dimensions(
-        cls, indicators: list[Indicator], session: Session
+        cls, indicators: Sequence[Indicator | IndicatorSnapshot], session: Session
     ) -> None:
         """Store all dimensions of all indicators in DB if not already present"""
         for indicator in indicators:
@@ -54,9 +62,16 @@ class Persister:
 
     @classmethod
     def persist_indicator_records(
-        cls, period: PeriodDb, indicators: list[Indicator], session: Session
+        cls,
+        period: PeriodDb,
+        indicators: Sequence[Indicator | IndicatorSnapshot],
+        session: Session,
     ) -> None:
-        """Store all indicator records in DB"""
+        """Store all indicator records in DB
+
+        A period might be closed twice when the clock went back, records already
+        stored are then replaced by values of restored recorders, or by the greatest
+        values (see `Indicator.restore_reopened_records`)."""
         for indicator in indicators:
             for record in indicator.get_records():
                 db_dimension = session.execute(
@@ -65,6 +80,19 @@ class Persister:
                     .where(DimensionDb.value1 == record.dimensions.value1)
                     .where(DimensionDb.value2 == record.dimensions.value2)
                 ).scalar_one()
+                db_record = session.execute(
+                    sa.select(RecordDb)
+                    .where(RecordDb.indicator_id == indicator.unique_id)
+                    .where(RecordDb.period_id == period.timestamp)
+                    .where(RecordDb.dimension_id == db_dimension.id)
+                ).scalar_one_or_none()
+                if db_record:
+                    db_record.value = (
+                        record.value
+                        if indicator.restore_reopened_records
+                        else max(db_record.value, record.value)
+                    )
+                    continue
                 db_record = RecordDb(indicator.unique_id, record.value)
                 db_record.dimension = db_dimension
                 db_record.period = period
@@ -72,7 +100,10 @@ class Persister:
 
     @classmethod
     def persist_indicator_states(
-        cls, period: PeriodDb, indicators: list[Indicator], session: Session
+        cls,
+        period: PeriodDb,
+        indicators: Sequence[Indicator | IndicatorSnapshot],
+        session: Session,
     ) -> None:
         """Store all indicators temporary state in DB"""
         for indicator in indicators:
@@ -88,6 +119,41 @@ class Persister:
                 db_state.period = period
                 session.add(db_state)
 
+    @classmethod
+    def persist_log_file_states(
+        cls, file_states: list[FileState], session: Session
+    ) -> None:
+        """Store reading state of all log files in DB, replacing former ones"""
+        session.execute(sa.delete(LogFileStateDb))
+        for file_state in file_states:
+            session.add(
+                LogFileStateDb(
+                    device=file_state.device,
+                    inode=file_state.inode,
+                    fingerprint=file_state.fingerprint,
+                    fingerprint_size=file_state.fingerprint_size,
+                    position=file_state.position,
+                    path=file_state.path,
+                    complete_size=file_state.complete_size,
+                )
+            )
+
+    @classmethod
+    def get_log_file_states(cls, session: Session) -> list[FileState]:
+        """Return reading state of all log files stored in DB"""
+        return [
+            FileState(
+                device=db_state.device,
+                inode=db_state.inode,
+                fingerprint=db_state.fingerprint,
+                fingerprint_size=db_state.fingerprint_size,
+                position=db_state.position,
+                path=db_state.path,
+                complete_size=db_state.complete_size,
+            )
+            for db_state in session.execute(sa.select(LogFileStateDb)).scalars()
+        ]
+
     @classmethod
     def get_last_period(cls, session: Session) -> Period | None:
         """Return the last period stored in DB"""
@@ -112,6 +178,30 @@ class Persister:
             ).scalars()
         )
 
+    @classmethod
+    def get_indicator_records(
+        cls, period: Period, indicator_id: int, session: Session
+    ) -> list[Record]:
+        """Return all records of an indicator for a given period"""
+        return [
+            Record(value=db_record.value, dimensions=db_record.dimension.to_values())
+            for db_record in session.execute(
+                sa.select(RecordDb)
+                .where(RecordDb.indicator_id == indicator_id)
+                .where(RecordDb.period_id == period.timestamp)
+            ).scalars()
+        ]
+
+    @classmethod
+    def get_indicator_states_period(cls, session: Session) -> Period | None:
+        """Return the period of indicator states stored in DB, if any"""
+        db_period = session.execute(
+            sa.select(PeriodDb).join(StateDb).limit(1)
+        ).scalar_one_or_none()
+        if not db_period:
+            return None
+        return db_period.to_period()
+
     @classmethod
     def has_indicator_records_for_period(cls, period: Period, session: Session) -> bool:
         """Checks if we have indicator records for a given period"""
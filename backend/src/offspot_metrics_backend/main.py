@@ -1,6 +1,6 @@
 import functools
 import sys
-from asyncio import Task, create_task, sleep
+from asyncio import Task, create_task, sleep, to_thread, wait
 from contextlib import asynccontextmanager
 from http import HTTPStatus
 from pathlib import Path
@@ -14,15 +14,26 @@ from starlette.requests import Request
 
 from offspot_metrics_backend import __about__
 from offspot_metrics_backend.business.caddy_log_converter import CaddyLogConverter
-from offspot_metrics_backend.business.log_watcher import LogWatcher, NewLineEvent
+from offspot_metrics_backend.business.converter_pool import ConverterPool
+from offspot_metrics_backend.business.ingest_queue import IngestQueue
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
+from offspot_metrics_backend.business.log_watcher import (
+    OBSERVER_STOP_MAX_SECONDS,
+    LogWatcher,
+    NewLineEvent,
+    NewLinesEvent,
+)
 from offspot_metrics_backend.business.processor import (
     INACTIVITY_THRESHOLD_SECONDS,
     Processor,
 )
 from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+from offspot_metrics_backend.business.tail_reader import FileId
+from offspot_metrics_backend.business.telemetry import telemetry
 from offspot_metrics_backend.constants import BackendConf, logger
 from offspot_metrics_backend.db.initializer import Initializer
 from offspot_metrics_backend.routes import aggregations, kpis
+from offspot_metrics_backend.routes import telemetry as telemetry_routes
 
 PREFIX = "/v1"
 
@@ -30,13 +41,27 @@ PREFIX = "/v1"
 class Main:
     def __init__(self) -> None:
         self.log_watcher = None
+        self.ingest_queue = None
         if BackendConf.processing_enabled:
             self.log_watcher = LogWatcher(
                 watched_folder=BackendConf.reverse_proxy_logs_location,
-                handler=self.handle_log_event,
+                batch_handler=self.enqueue_log_events,
                 data_folder=BackendConf.logwatcher_data_folder,
+                persist_state=False,  # checkpointed in DB by the processor
+                forget_handler=self.forget_log_files,
+            )
+            self.ingest_queue = IngestQueue(
+                spill_file=Path(BackendConf.logwatcher_data_folder).joinpath(
+                    "ingest_queue_spill.jsonl"
+                ),
+                max_lines=BackendConf.ingest_queue_max_lines,
             )
+            telemetry.register("log_watcher", self.log_watcher.stats)
+            telemetry.register("ingest_queue", self.ingest_queue.stats)
         self.background_tasks = set[Task[Any]]()
+        self.converter_pool: ConverterPool | None = None
+        self.log_watcher_task: Task[Any] | None = None
+        self.ingest_task: Task[Any] | None = None
 
     @asynccontextmanager
     async def lifespan(self, _: FastAPI):
@@ -49,9 +74,32 @@ class Main:
             self.config = ReverseProxyConfig()
             self.config.parse_configuration()
             self.converter = CaddyLogConverter(self.config)
+            telemetry.register("log_converter", self.converter.stats)
+            telemetry.register("classification_cache", self.converter.cache.stats)
+            if BackendConf.converter_workers:
+                logger.info(
+                    f"Converting log lines with {BackendConf.converter_workers} workers"
+                )
+                self.converter_pool = ConverterPool(
+                    converter=self.converter,
+                    config=self.config,
+                    workers=BackendConf.converter_workers,
+                    handler=self.process_log_batch,
+                )
             self.processor.startup()
+            self.processor.start_tick_worker()
+            telemetry.register("tick_processor", self.processor.tick_stats)
+            self.restore_log_file_states()
+
+            ingest_task = create_task(self.start_ingest())
+            self.ingest_task = ingest_task
+            self.background_tasks.add(ingest_task)
+            ingest_task.add_done_callback(
+                functools.partial(self.task_stopped, "Ingest")
+            )
 
             log_watcher_task = create_task(self.start_watcher())
+            self.log_watcher_task = log_watcher_task
             self.background_tasks.add(log_watcher_task)
             log_watcher_task.add_done_callback(
                 functools.partial(self.task_stopped, "Log Watcher")
@@ -69,6 +117,20 @@ class Main:
         # Shutdown
         if self.log_watcher:
             self.log_watcher.stop()
+        if self.log_watcher_task:
+            # let the watcher process pending events and close files
+            await wait({self.log_watcher_task}, timeout=OBSERVER_STOP_MAX_SECONDS)
+        if self.ingest_queue:
+            # lines not yet processed are read again from log files on next startup
+            self.ingest_queue.close()
+        if self.ingest_task:
+            await wait({self.ingest_task}, timeout=OBSERVER_STOP_MAX_SECONDS)
+        if self.converter_pool:
+            # waits for the batch being handled, if ingestion did not stop in time
+            await to_thread(self.converter_pool.close)
+        if BackendConf.processing_enabled:
+            # persist ticks already processed
+            await to_thread(self.processor.stop_tick_worker)
 
     def task_stopped(self, task_name: str, task: Task[Any]) -> None:
         if task.cancelled():
@@ -85,6 +147,15 @@ class Main:
             raise ValueError("Log watcher has not been initialized")
         await self.log_watcher.run_async()
 
+    async def start_ingest(self):
+        """Pass log lines queued by the log watcher to the processing logic"""
+        if not self.ingest_queue:
+            raise ValueError("Ingest queue has not been initialized")
+        if self.converter_pool:
+            await to_thread(self.converter_pool.consume, self.ingest_queue)
+        else:
+            await to_thread(self.ingest_queue.consume, self.handle_log_events)
+
     async def check_for_inactivity(self):
         """Check for inactivity every INACTIVITY_THRESHOLD_SECONDS seconds"""
         while True:
@@ -109,6 +180,51 @@ class Main:
         except Exception as exc:
             logger.warning("Error log event", exc_info=exc)
 
+    def restore_log_file_states(self):
+        """Restore log files reading state checkpointed in DB
+
+        On first startup after an upgrade, the state saved to disk by former versions
+        is migrated to DB once, the state file being renamed afterwards.
+        """
+        if not self.log_watcher:
+            raise ValueError("Log watcher has not been initialized")
+        event_handler = self.log_watcher.event_handler
+        file_states = self.processor.log_file_states
+        if not file_states and event_handler.state_file_path.exists():
+            file_states = event_handler.read_state_file()
+            self.processor.restore_log_file_states(file_states)
+            self.processor.persist_log_file_states()
+            event_handler.archive_state_file()
+        event_handler.restore_states(file_states)
+
+    def forget_log_files(self, file_ids: list[FileId]):
+        """Stop checkpointing reading state of log files which have been deleted"""
+        self.processor.forget_log_files(file_ids)
+
+    def enqueue_log_events(self, event: NewLinesEvent):
+        """Queue a batch of log lines, to be processed by the ingest task"""
+        if not self.ingest_queue:
+            raise ValueError("Ingest queue has not been initialized")
+        self.ingest_queue.put(event)
+
+    def handle_log_events(self, event: NewLinesEvent):
+        """Handle a batch of log lines
+
+        We first transform all log lines into a columnar batch of inputs, and then
+        feed it at once to the processing logic.
+        """
+        logger.debug(f"Log watcher sent {len(event.lines)} lines")
+        self.process_log_batch(event, self.converter.process_many(event.lines))
+
+    def process_log_batch(self, event: NewLinesEvent, batch: InputsBatch):
+        """Feed a batch of log lines, converted into inputs, to the processing logic"""
+        try:
+            self.processor.process_batch(
+                batch=batch, file_state=event.file_state, offsets=event.offsets
+            )
+        except Exception as exc:
+            logger.warning("Error log events", exc_info=exc)
+
     def create_app(self) -> FastAPI:
         self.app = FastAPI(
             title=__about__.__api_title__,
@@ -157,6 +273,7 @@ class Main:
 
         api.include_router(router=aggregations.router)
         api.include_router(router=kpis.router)
+        api.include_router(router=telemetry_routes.router)
 
         self.app.mount(f"/api/{__about__.__api_version__}", api)
 
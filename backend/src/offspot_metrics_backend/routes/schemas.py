@@ -42,3 +42,9 @@ class AggregationsByKind(CamelModel):
     class KpiValues(CamelModel):
         kpi_id: int
         values: list["AggregationsByKind.KpiValueByAggregation"]
+
+
+class TelemetryValues(CamelModel):
+    """Internal metrics about the processing pipeline, grouped by component"""
+
+    values: dict[str, dict[str, float | str]]
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+
+from offspot_metrics_backend.business.telemetry import telemetry
+from offspot_metrics_backend.routes.schemas import TelemetryValues
+
+router = APIRouter(
+    prefix="/telemetry",
+    tags=["all"],
+)
+
+
+@router.get(
+    "",
+    status_code=200,
+    responses={
+        200: {
+            "description": "Returns internal metrics about the processing pipeline",
+        },
+    },
+)
+def telemetry_values() -> TelemetryValues:
+    return TelemetryValues(values=telemetry.values())
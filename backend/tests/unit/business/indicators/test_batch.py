@@ -0,0 +1,131 @@
+import pytest
+
+from offspot_metrics_backend.business.indicators import ALL_INDICATORS
+from offspot_metrics_backend.business.indicators.holder import Record
+from offspot_metrics_backend.business.indicators.processor import Processor
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
+from offspot_metrics_backend.business.inputs.clock_tick import ClockTick
+from offspot_metrics_backend.business.inputs.input import Input
+from offspot_metrics_backend.business.inputs.package import (
+    PACKAGE_TITLES,
+    PackageHomeVisit,
+    PackageRequest,
+)
+from offspot_metrics_backend.business.inputs.shared_files import (
+    SharedFilesOperation,
+    SharedFilesOperationKind,
+)
+
+START = 1688457600  # 2023-07-04 08:00:00 UTC
+
+
+def request(minute: int, title: str) -> PackageRequest:
+    return PackageRequest(ts=START + minute * 60, package_title=title)
+
+
+# (timestamp, inputs) of every line, None timestamp for invalid lines
+LINES: list[tuple[int | None, list[Input]]] = [
+    (START, [PackageHomeVisit(package_title="Wikipedia"), request(0, "Wikipedia")]),
+    (START + 5, [request(0, "Wikipedia")]),
+    (None, []),
+    (START + 60, [request(1, "Nomad")]),
+    (
+        START + 70,
+        [SharedFilesOperation(kind=SharedFilesOperationKind.FILE_CREATED, count=3)],
+    ),
+    (START + 80, []),
+    (
+        START + 90,
+        [SharedFilesOperation(kind=SharedFilesOperationKind.FILE_CREATED, count=2)],
+    ),
+    (
+        START + 95,
+        [SharedFilesOperation(kind=SharedFilesOperationKind.FILE_DELETED, count=0)],
+    ),
+    (START + 600, [PackageHomeVisit(package_title="Nomad"), request(10, "Nomad")]),
+    # too far from first activity, these usages are rejected
+    (START + 4000, [request(66, "Wikipedia"), request(66, "Nomad")]),
+    (START + 700, [request(11, "Wikipedia"), PackageHomeVisit(package_title="Nomad")]),
+]
+
+
+@pytest.fixture()
+def batch() -> InputsBatch:
+    batch = InputsBatch()
+    for ts, inputs in LINES:
+        batch.add_line(ts=ts, inputs=inputs)
+    return batch
+
+
+def records(processor: Processor) -> list[list[Record]]:
+    return [list(indicator.get_records()) for indicator in processor.indicators]
+
+
+def new_processor() -> Processor:
+    processor = Processor()
+    processor.indicators = [type(indicator)() for indicator in ALL_INDICATORS]
+    return processor
+
+
+def test_batch_inputs(batch: InputsBatch) -> None:
+    assert batch.nb_lines == len(LINES)
+    assert list(batch.lines_ts[:3]) == [START, START + 5, 0]
+    assert [PACKAGE_TITLES.get_value(id_) for id_ in batch.package_ids[:3]] == [
+        "Wikipedia",
+        "Wikipedia",
+        "Nomad",
+    ]
+    # identical inputs of same minute are coalesced
+    assert list(batch.lines) == [0, 0, 3, 4, 7, 8, 8, 9, 9, 10, 10]
+    assert list(batch.counts) == [1, 2, 1, 5, 0, 1, 1, 1, 1, 1, 1]
+    assert list(batch.get_inputs(0, 4)) == [
+        PackageHomeVisit(package_title="Wikipedia"),
+        request(0, "Wikipedia"),
+        request(0, "Wikipedia"),
+        request(1, "Nomad"),
+        SharedFilesOperation(kind=SharedFilesOperationKind.FILE_CREATED, count=5),
+    ]
+    # inputs of lines 3 to 7 (excluded)
+    assert batch.inputs_range(3, 7) == (2, 4)
+    assert batch.inputs_range(5, 6) == (4, 4)
+
+
+def test_batch_coalescing_stops_at_minute_change() -> None:
+    batch = InputsBatch()
+    for ts in (START, START + 30, START + 60, START + 10, START + 15):
+        batch.add_line(ts=ts, inputs=[request(0, "Wikipedia")])
+    assert list(batch.counts) == [2, 1, 2]
+
+
+def test_batch_unsupported_input(batch: InputsBatch) -> None:
+    with pytest.raises(ValueError):
+        batch.add_line(ts=START, inputs=[ClockTick(ts=START)])
+
+
+@pytest.mark.parametrize(
+    "lines_ranges",
+    [
+        pytest.param([(0, len(LINES))], id="whole_batch"),
+        pytest.param([(0, 3), (3, 9), (9, len(LINES))], id="split_batch"),
+    ],
+)
+def test_batch_same_as_inputs(
+    batch: InputsBatch, lines_ranges: list[tuple[int, int]]
+) -> None:
+    by_input = new_processor()
+    for _, inputs in LINES:
+        for input_ in inputs:
+            by_input.process_input(input_)
+
+    by_batch = new_processor()
+    for start_line, stop_line in lines_ranges:
+        by_batch.process_batch(batch, *batch.inputs_range(start_line, stop_line))
+
+    assert records(by_batch) == records(by_input)
+    assert [
+        {dims: recorder.state for dims, recorder in indicator.recorders.items()}
+        for indicator in by_batch.indicators
+    ] == [
+        {dims: recorder.state for dims, recorder in indicator.recorders.items()}
+        for indicator in by_input.indicators
+    ]
@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+
+import pytest
+
+from offspot_metrics_backend.business.indicators import (
+    ALL_INDICATORS,
+    TotalUsageByPackage,
+    TotalUsageOverall,
+    Uptime,
+)
+from offspot_metrics_backend.business.indicators.dimensions import DimensionsValues
+from offspot_metrics_backend.business.indicators.holder import Record
+from offspot_metrics_backend.business.indicators.indicator import Indicator
+from offspot_metrics_backend.business.indicators.processor import Processor
+from offspot_metrics_backend.business.indicators.recorder import (
+    IntCounterRecorder,
+    Recorder,
+)
+from offspot_metrics_backend.business.inputs.clock_tick import ClockTick
+from offspot_metrics_backend.business.inputs.input import Input
+from offspot_metrics_backend.business.inputs.package import PackageRequest
+
+
+@dataclass
+class SampleInput(Input):
+    """Sample input, with a content"""
+
+    content: str
+
+
+class TypedIndicator(Indicator):
+    """An indicator counting test inputs, declaring the type of its inputs"""
+
+    unique_id = -1005
+    input_types = (SampleInput,)
+
+    def get_new_recorder(self) -> Recorder:
+        return IntCounterRecorder()
+
+    def get_dimensions_values(self, input_: Input) -> DimensionsValues:  # noqa: ARG002
+        return DimensionsValues(None, None, None)
+
+
+class FilteringIndicator(TypedIndicator):
+    """An indicator counting test inputs of a given content only"""
+
+    unique_id = -1006
+
+    def can_process_input(self, input_: Input) -> bool:
+        return isinstance(input_, SampleInput) and input_.content == "content1"
+
+
+def test_dispatch_all_indicators() -> None:
+    processor = Processor()
+    processor.indicators = [type(indicator)() for indicator in ALL_INDICATORS]
+
+    assert [
+        type(indicator) for indicator, _ in processor.get_input_handlers(PackageRequest)
+    ] == [TotalUsageOverall, TotalUsageByPackage]
+    assert [
+        type(indicator) for indicator, _ in processor.get_input_handlers(ClockTick)
+    ] == [Uptime]
+    assert processor.get_input_handlers(SampleInput) == []
+    assert all(
+        handler == indicator.record_input
+        for indicator, handler in processor.get_input_handlers(PackageRequest)
+    )
+
+
+def test_dispatch_undeclared_types(
+    total_indicator: Indicator, input1: Input, another_input: Input
+) -> None:
+    processor = Processor()
+    processor.indicators = [total_indicator]
+
+    # indicators not declaring input types are passed all inputs, and filter them
+    assert processor.get_input_handlers(type(another_input)) == [
+        (total_indicator, total_indicator.process_input)
+    ]
+    processor.process_input(another_input)
+    processor.process_input(input1)
+    assert list(total_indicator.get_records()) == [
+        Record(value=1, dimensions=DimensionsValues(None, None, None)),
+    ]
+
+
+def test_dispatch_filtering_indicator() -> None:
+    typed = TypedIndicator()
+    filtering = FilteringIndicator()
+    processor = Processor()
+    processor.indicators = [typed, filtering]
+
+    assert processor.get_input_handlers(SampleInput) == [
+        (typed, typed.record_input),
+        (filtering, filtering.process_input),
+    ]
+    processor.process_input(SampleInput(content="content1"))
+    processor.process_input(SampleInput(content="content2"))
+    processor.process_input(ClockTick(ts=0))
+    assert [record.value for record in typed.get_records()] == [2]
+    assert [record.value for record in filtering.get_records()] == [1]
+
+
+def test_dispatch_table_reset() -> None:
+    typed = TypedIndicator()
+    processor = Processor()
+    processor.indicators = []
+    assert processor.get_input_handlers(SampleInput) == []
+
+    processor.indicators = [typed]
+    assert processor.get_input_handlers(SampleInput) == [(typed, typed.record_input)]
+
+    # indicators cannot be modified in place, leaving the dispatch table stale
+    with pytest.raises(AttributeError):
+        processor.indicators.append(
+            typed
+        )  # pyright: ignore[reportAttributeAccessIssue]
@@ -22,7 +22,7 @@ from offspot_metrics_backend.db.models import (
 
 
 def test_no_input(processor: Processor, total_indicator: Indicator) -> None:
-    processor.indicators.append(total_indicator)
+    processor.indicators = [total_indicator]
     assert len(list(total_indicator.get_records())) == 0
 
 
@@ -168,6 +168,66 @@ def test_process_tick(
     assert count_from_stmt(dbsession, select(IndicatorPeriod)) == 0
 
 
+@pytest.mark.parametrize("restore_reopened_records, expected", [(True, 2), (False, 1)])
+def test_process_tick_period_closed_twice(
+    processor: Processor,
+    input1: Input,
+    total_indicator: Indicator,
+    init_datetime: datetime,
+    dbsession: Session,
+    *,
+    restore_reopened_records: bool,
+    expected: int,
+) -> None:
+    total_indicator.restore_reopened_records = restore_reopened_records
+    processor.indicators = [total_indicator]
+    processor.process_tick(Period(init_datetime), dbsession)
+    processor.process_input(input1)
+    processor.process_tick(Period(init_datetime + timedelta(hours=1)), dbsession)
+    processor.process_input(input1)
+    # clock went back, period is closed again
+    processor.process_tick(Period(init_datetime), dbsession)
+    processor.restore_reopened_period(dbsession)
+    processor.process_input(input1)
+    processor.process_tick(Period(init_datetime + timedelta(hours=1)), dbsession)
+
+    # counters are restored and replace stored values, others keep greatest values
+    period = IndicatorPeriod.get_or_none(Period(init_datetime), dbsession)
+    assert period
+    assert (
+        dbsession.execute(
+            select(IndicatorRecord.value).where(
+                IndicatorRecord.period_id == period.timestamp
+            )
+        ).scalar_one()
+        == expected
+    )
+    assert count_from_stmt(dbsession, select(IndicatorRecord)) == 2
+
+
+def test_restore_from_db_reopened_period(
+    processor: Processor,
+    input1: Input,
+    total_indicator: Indicator,
+    init_datetime: datetime,
+    dbsession: Session,
+) -> None:
+    processor.indicators = [total_indicator]
+    processor.process_tick(Period(init_datetime), dbsession)
+    processor.process_input(input1)
+    processor.process_tick(Period(init_datetime + timedelta(hours=1)), dbsession)
+    processor.process_input(input1)
+    # clock went back, period is re-opened and its states persisted
+    processor.process_tick(Period(init_datetime), dbsession)
+    processor.restore_reopened_period(dbsession)
+    processor.process_input(input1)
+    processor.process_tick(Period(init_datetime), dbsession)
+
+    processor.restore_from_db(dbsession)
+    assert processor.current_period == Period(init_datetime)
+    assert [record.value for record in total_indicator.get_records()] == [2]
+
+
 def test_restore_from_db_current_period(
     processor: Processor,
     dbsession: Session,
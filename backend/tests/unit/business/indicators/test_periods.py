@@ -109,3 +109,56 @@ def test_get_next(current_period: str, next_period: str) -> None:
     assert Period(datetime.fromisoformat(current_period)).get_next() == Period(
         datetime.fromisoformat(next_period)
     )
+
+
+def test_snapshot_tick(
+    input1: Input,
+    total_indicator: Indicator,
+) -> None:
+    processor = Processor()
+    processor.indicators = [total_indicator]
+    period = Period(datetime.fromisoformat("2023-06-08 10:18:12"))
+    assert processor.snapshot_tick(period) is None
+
+    processor.process_input(input1)
+    snapshot = processor.snapshot_tick(period)
+    assert snapshot
+    assert snapshot.period == period
+    assert not snapshot.period_closed
+    frozen_records = list(snapshot.indicators[0].get_records())
+    assert frozen_records == list(total_indicator.get_records())
+
+    # snapshot is not modified by inputs processed afterwards
+    processor.process_input(input1)
+    assert list(snapshot.indicators[0].get_records()) == frozen_records
+    assert list(total_indicator.get_records()) != frozen_records
+
+    # indicators are reset when period is closed
+    next_period = Period(datetime.fromisoformat("2023-06-08 11:00:31"))
+    snapshot = processor.snapshot_tick(next_period)
+    assert snapshot
+    assert snapshot.period == period
+    assert snapshot.period_closed
+    assert [record.value for record in snapshot.indicators[0].get_records()] == [2]
+    assert list(total_indicator.get_records()) == []
+    assert processor.current_period == next_period
+
+
+def test_snapshot_tick_clock_back(
+    input1: Input,
+    total_indicator: Indicator,
+) -> None:
+    processor = Processor()
+    processor.indicators = [total_indicator]
+    period = Period(datetime.fromisoformat("2023-06-08 10:18:12"))
+    processor.process_input(input1)
+    assert processor.snapshot_tick(period)
+
+    # period is closed when the clock goes back, inputs go on in a fresh period
+    earlier_period = Period(datetime.fromisoformat("2023-06-08 08:05:00"))
+    snapshot = processor.snapshot_tick(earlier_period)
+    assert snapshot
+    assert snapshot.period == period
+    assert snapshot.period_closed
+    assert processor.current_period == earlier_period
+    assert list(total_indicator.get_records()) == []
@@ -30,8 +30,7 @@ def start_time() -> datetime.datetime:
 def timed_input(start_time: datetime.datetime) -> Callable[[Delay], TimedInput]:
     def func(delay: Delay) -> TimedInput:
         return TimedInput(
-            ts=start_time
-            + datetime.timedelta(minutes=delay.minutes, seconds=delay.seconds)
+            ts=int(start_time.timestamp()) + delay.minutes * 60 + delay.seconds
         )
 
     return func
@@ -317,6 +317,27 @@ def test_process_tick(
     )
 
 
+def test_process_tick_clock_back(
+    processor: Processor,
+    dummy_kpi: Kpi,
+    init_datetime: datetime,
+    dbsession: Session,
+) -> None:
+    processor.kpis = [dummy_kpi]
+    dbsession.execute(delete(KpiRecord))
+    next_period = Period(init_datetime + timedelta(hours=1))
+    assert processor.process_tick(tick_period=next_period, session=dbsession)
+    assert count_from_stmt(dbsession, select(KpiRecord)) == 3
+
+    # closed period is computed again when the clock goes back
+    earlier_period = Period(init_datetime - timedelta(days=1))
+    assert processor.process_tick(tick_period=earlier_period, session=dbsession)
+    assert not processor.process_tick(tick_period=earlier_period, session=dbsession)
+    assert processor.current_period == earlier_period
+    # yearly value is computed as well, since day changed
+    assert count_from_stmt(dbsession, select(KpiRecord)) == 4
+
+
 def test_restore_kpis_from_almost_empty_db(
     init_datetime_week_dummyvalue: DummyKpiValue,
     init_datetime_month_dummyvalue: DummyKpiValue,
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from offspot_metrics_backend.business.caddy_log_converter import CaddyLogConverter
+from offspot_metrics_backend.business.converter_pool import ConverterPool
+from offspot_metrics_backend.business.ingest_queue import IngestQueue
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
+from offspot_metrics_backend.business.log_watcher import NewLinesEvent
+from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
+
+LOG_LINE = (
+    '{"level":"info","ts":1688459792.8632474,"logger":"http.log.access.log0","msg":'
+    '"handled request","request":{"method":"GET","host":"kiwix.renaud.test","uri":'
+    '"/content/wikipedia_en_all/"},"status":200,"resp_headers":{}}'
+)
+
+
+def new_event(*lines: str) -> NewLinesEvent:
+    return NewLinesEvent(
+        file_path=Path("caddy_access_logs.json"),
+        lines=list(lines),
+        offsets=[index * 3 for index in range(1, len(lines) + 1)],
+    )
+
+
+def test_converter_pool(
+    reverse_proxy_config: Callable[[str], ReverseProxyConfig], tmp_path: Path
+):
+    config = reverse_proxy_config("conf_ok.yaml")
+    events = [
+        new_event(LOG_LINE, "not JSON"),
+        new_event(LOG_LINE.replace("kiwix", "nomad").replace("/content/wiki", "/")),
+        new_event(),
+    ]
+    converted: list[tuple[NewLinesEvent, InputsBatch]] = []
+    converter = CaddyLogConverter(config)
+    pool = ConverterPool(
+        converter=converter,
+        config=config,
+        workers=1,
+        handler=lambda event, batch: converted.append((event, batch)),
+    )
+    queue = IngestQueue(spill_file=tmp_path.joinpath("spill.jsonl"), max_lines=10)
+    consumer = threading.Thread(target=pool.consume, args=(queue,))
+    consumer.start()
+    try:
+        for event in events:
+            queue.put(event)
+        deadline = time.monotonic() + 60
+        while len(converted) < len(events) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        queue.close()
+        consumer.join()
+        pool.close()
+
+    # batches are handled in order, with same inputs as when converted in process
+    expected = CaddyLogConverter(config)
+    assert [event for event, _ in converted] == events
+    for event, batch in converted:
+        expected_batch = expected.process_many(event.lines)
+        assert list(batch.lines_ts) == list(expected_batch.lines_ts)
+        assert list(batch.get_inputs(0, len(batch.kinds))) == list(
+            expected_batch.get_inputs(0, len(expected_batch.kinds))
+        )
+    assert converter.stats() == expected.stats()
+
+
+def test_converter_pool_complete_nothing_pending(
+    reverse_proxy_config: Callable[[str], ReverseProxyConfig]
+):
+    config = reverse_proxy_config("conf_ok.yaml")
+    converted: list[NewLinesEvent] = []
+    pool = ConverterPool(
+        converter=CaddyLogConverter(config),
+        config=config,
+        workers=1,
+        handler=lambda event, _: converted.append(event),
+    )
+    pool.complete_oldest()
+    pool.close()
+    pool.submit(new_event(LOG_LINE))
+    pool.complete_oldest()
+    pool.flush()
+    assert converted == []
+
+
+def test_converter_pool_close_waits_for_consume(
+    reverse_proxy_config: Callable[[str], ReverseProxyConfig], tmp_path: Path
+):
+    config = reverse_proxy_config("conf_ok.yaml")
+    handling = threading.Event()
+    release = threading.Event()
+    converted: list[NewLinesEvent] = []
+
+    def handler(event: NewLinesEvent, _: InputsBatch):
+        handling.set()
+        release.wait(timeout=60)
+        converted.append(event)
+
+    pool = ConverterPool(
+        converter=CaddyLogConverter(config), config=config, workers=1, handler=handler
+    )
+    queue = IngestQueue(spill_file=tmp_path.joinpath("spill.jsonl"), max_lines=10)
+    consumer = threading.Thread(target=pool.consume, args=(queue,))
+    consumer.start()
+    queue.put(new_event(LOG_LINE))
+    queue.put(new_event(LOG_LINE))
+    assert handling.wait(timeout=60)
+    queue.close()
+
+    # ingestion did not stop in time, pool is closed while a batch is handled
+    closer = threading.Thread(target=pool.close)
+    closer.start()
+    closer.join(timeout=0.2)
+    assert closer.is_alive()
+
+    release.set()
+    closer.join(timeout=60)
+    consumer.join(timeout=60)
+    assert not closer.is_alive()
+    assert not consumer.is_alive()
+    # batch being handled is completed, next one is dropped
+    assert len(converted) == 1
+    assert not pool.pending
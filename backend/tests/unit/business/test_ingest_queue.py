@@ -0,0 +1,128 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from offspot_metrics_backend.business.ingest_queue import IngestQueue
+from offspot_metrics_backend.business.log_watcher import FileState, NewLinesEvent
+
+
+@pytest.fixture
+def spill_file(tmp_path: Path) -> Path:
+    return tmp_path.joinpath("ingest_queue_spill.jsonl")
+
+
+def new_event(*lines: str) -> NewLinesEvent:
+    offsets = [index * 3 for index in range(1, len(lines) + 1)]
+    return NewLinesEvent(
+        file_path=Path("caddy_access_logs.json"),
+        lines=list(lines),
+        offsets=offsets,
+        file_state=FileState(
+            device=1,
+            inode=2,
+            fingerprint="abc",
+            fingerprint_size=3,
+            position=offsets[-1] if offsets else 0,
+            path="caddy_access_logs.json",
+        ),
+    )
+
+
+def test_ingest_queue_in_memory(spill_file: Path):
+    queue = IngestQueue(spill_file=spill_file, max_lines=5)
+    queue.put(new_event("L1", "L2"))
+    queue.put(new_event("L3"))
+
+    assert queue.stats() == {
+        "depth_lines": 3,
+        "memory_lines": 3,
+        "spilled_lines": 0,
+        "spill_size_bytes": 0,
+    }
+    assert queue.get() == new_event("L1", "L2")
+    assert queue.get() == new_event("L3")
+    assert queue.depth == 0
+    queue.close()
+
+
+def test_ingest_queue_get_timeout(spill_file: Path):
+    queue = IngestQueue(spill_file=spill_file, max_lines=5)
+    assert queue.get(timeout=0) is None
+    queue.put(new_event("L1"))
+    assert queue.get(timeout=0) == new_event("L1")
+    queue.close()
+
+
+def test_ingest_queue_spill(spill_file: Path):
+    queue = IngestQueue(spill_file=spill_file, max_lines=3)
+    queue.put(new_event("L1", "L2"))
+    queue.put(new_event("L3", "L4"))  # above high-water mark
+    queue.put(new_event("L5"))  # would fit in memory, but order must be kept
+
+    stats = queue.stats()
+    assert stats["depth_lines"] == 5
+    assert stats["memory_lines"] == 2
+    assert stats["spilled_lines"] == 3
+    assert stats["spill_size_bytes"] > 0
+
+    assert queue.get() == new_event("L1", "L2")
+    assert queue.get() == new_event("L3", "L4")
+    queue.put(new_event("L6"))
+    assert queue.get() == new_event("L5")
+    assert queue.get() == new_event("L6")
+
+    # spill file is reset once drained
+    assert queue.stats() == {
+        "depth_lines": 0,
+        "memory_lines": 0,
+        "spilled_lines": 0,
+        "spill_size_bytes": 0,
+    }
+    queue.close()
+
+
+def test_ingest_queue_big_batch(spill_file: Path):
+    queue = IngestQueue(spill_file=spill_file, max_lines=1)
+    queue.put(new_event("L1", "L2", "L3"))
+
+    assert queue.memory_lines == 3
+    assert queue.get() == new_event("L1", "L2", "L3")
+    queue.close()
+
+
+def test_ingest_queue_restart(spill_file: Path):
+    queue = IngestQueue(spill_file=spill_file, max_lines=2)
+    queue.put(new_event("L1"))
+    queue.put(new_event("L2", "L3"))
+    queue.put(new_event("L4"))
+    assert queue.get() == new_event("L1")
+    queue.close()
+    queue.put(new_event("L5"))  # received after close
+
+    assert queue.get() is None
+
+    # lines not processed are read again from log files, spill file is reset
+    queue = IngestQueue(spill_file=spill_file, max_lines=2)
+    assert queue.depth == 0
+    assert queue.spill_size == 0
+    queue.close()
+
+
+def test_ingest_queue_consume(spill_file: Path):
+    queue = IngestQueue(spill_file=spill_file, max_lines=2)
+    received: list[str] = []
+
+    def handler(event: NewLinesEvent):
+        received.extend(event.lines)
+        if received[-1] == "L9":
+            queue.close()
+
+    consumer = threading.Thread(target=queue.consume, args=(handler,))
+    consumer.start()
+    for index in range(10):
+        queue.put(new_event(f"L{index}"))
+    consumer.join(timeout=5)
+
+    assert not consumer.is_alive()
+    assert received == [f"L{index}" for index in range(10)]
@@ -0,0 +1,45 @@
+from offspot_metrics_backend.business.indicators.dimensions import (
+    DIMENSIONS_IDS,
+    DimensionsValues,
+    get_package_dimensions_id,
+)
+from offspot_metrics_backend.business.input_generator import CommonInputGenerator
+from offspot_metrics_backend.business.inputs.package import (
+    PACKAGE_TITLES,
+    PackageRequest,
+)
+from offspot_metrics_backend.business.interner import Interner
+from offspot_metrics_backend.business.log_data import LogData
+
+
+def test_interner():
+    interner: Interner[str] = Interner()
+    assert interner.get_id("foo") == 0
+    assert interner.get_id("bar") == 1
+    assert interner.get_id("foo") == 0
+    assert interner.get_value(1) == "bar"
+
+
+def test_package_ids():
+    generator = CommonInputGenerator(host="kiwix.renaud.test", package_title="Foo")
+    [input_] = generator.process(
+        LogData(
+            content_type=None,
+            status=200,
+            uri="/",
+            method="GET",
+            ts=1688459792,
+            x_tfm_files_added=None,
+            x_tfm_files_deleted=None,
+        )
+    )
+    # id is interned when generator is created, and computed when not passed
+    assert isinstance(input_, PackageRequest)
+    assert input_ == PackageRequest(ts=1688459792, package_title="Foo")
+    assert input_.package_id == PACKAGE_TITLES.get_id("Foo")
+    assert PackageRequest(ts=1688459792, package_title="Foo").package_id == (
+        input_.package_id
+    )
+    assert DIMENSIONS_IDS.get_value(
+        get_package_dimensions_id(input_.package_id)
+    ) == DimensionsValues("Foo", None, None)
@@ -1,4 +1,3 @@
-import datetime
 import pathlib
 from collections.abc import Callable
 
@@ -7,7 +6,11 @@ import pytest
 from offspot_metrics_backend.business.caddy_log_converter import (
     CaddyLog,
     CaddyLogConverter,
+    ProcessingResult,
+    decode_log_fast,
+    decode_log_model,
 )
+from offspot_metrics_backend.business.input_generator import ZimInputGenerator
 from offspot_metrics_backend.business.inputs.input import Input
 from offspot_metrics_backend.business.inputs.package import (
     PackageHomeVisit,
@@ -17,6 +20,7 @@ from offspot_metrics_backend.business.inputs.shared_files import (
     SharedFilesOperation,
     SharedFilesOperationKind,
 )
+from offspot_metrics_backend.business.log_data import LogData
 from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyConfig
 
 
@@ -30,7 +34,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             [
                 PackageHomeVisit(package_title="Nomad exercices du CP à la 3è"),
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Nomad exercices du CP à la 3è",
                 ),
             ],
@@ -44,7 +48,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Wikipedia",
                 ),
             ],
@@ -57,7 +61,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             [
                 PackageHomeVisit(package_title="Wikipedia"),
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Wikipedia",
                 ),
             ],
@@ -74,7 +78,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
                     kind=SharedFilesOperationKind.FILE_CREATED, count=1
                 ),
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 1",
                 ),
             ],
@@ -89,7 +93,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
                     kind=SharedFilesOperationKind.FILE_DELETED, count=1
                 ),
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 2",
                 ),
             ],
@@ -101,7 +105,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 2",
                 )
             ],
@@ -113,7 +117,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 1",
                 )
             ],
@@ -125,7 +129,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 2",
                 )
             ],
@@ -137,7 +141,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 1",
                 )
             ],
@@ -149,7 +153,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 2",
                 )
             ],
@@ -161,7 +165,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 1",
                 )
             ],
@@ -173,7 +177,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files 2",
                 )
             ],
@@ -205,7 +209,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
                     kind=SharedFilesOperationKind.FILE_CREATED, count=12
                 ),
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files - fm1",
                 ),
             ],
@@ -221,7 +225,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
                     kind=SharedFilesOperationKind.FILE_DELETED, count=22
                 ),
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Shared files - fm2",
                 ),
             ],
@@ -233,7 +237,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459793.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459793.8632474),
+                    ts=1688459793,
                     package_title="Shared files - fm2",
                 )
             ],
@@ -245,7 +249,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""ts":1688459794.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459794.8632474),
+                    ts=1688459794,
                     package_title="Shared files - fm1",
                 )
             ],
@@ -256,7 +260,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r"""200, "resp_headers": {},"ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Nomad exercices du CP à la 3è",
                 )
             ],
@@ -268,7 +272,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""GET"},"status":200, "resp_headers": {},"ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Wikipedia",
                 )
             ],
@@ -280,7 +284,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""status":200,"ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Wikipedia",
                 )
             ],
@@ -292,7 +296,7 @@ from offspot_metrics_backend.business.reverse_proxy_config import ReverseProxyCo
             r""""status":200,"ts":1688459792.8632474}""",
             [
                 PackageRequest(
-                    ts=datetime.datetime.fromtimestamp(1688459792.8632474),
+                    ts=1688459792,
                     package_title="Wikifundi",
                 )
             ],
@@ -372,3 +376,207 @@ def test_load_log_no_content_type():
     assert log.request.method == "GET"
     assert log.resp_headers
     assert log.resp_headers.content_type is None
+
+
+FULL_LOG_LINE = (
+    '{"level":"info","ts":1688459792.8632474,"logger":"http.log.access.log0","msg":'
+    '"handled request","request":{"remote_ip":"172.18.0.1","remote_port":"40236",'
+    '"proto":"HTTP/1.1","method":"GET","host":"edupi.renaud.test","uri":"/api/docume'
+    'nts","headers":{"Referer":["http://kiwix.renaud.test/"]}},"user_id":"","durati'
+    'on":0.00134691,"size":124,"status":201,"resp_headers":{"Content-Type":["text/h'
+    'tml; charset=utf-8"],"X-Tfm-Files-Added":["2"],"Server":["Caddy"]}}'
+)
+
+
+@pytest.mark.parametrize(
+    "log_line, fast_decoded",
+    [
+        (FULL_LOG_LINE, True),
+        (FULL_LOG_LINE.replace('"status":201', '"status":"201"'), False),
+        (FULL_LOG_LINE.replace('["2"]', "[2]"), False),
+        (FULL_LOG_LINE.replace('"info"', '"error"'), False),
+        (FULL_LOG_LINE.replace('"level":"info"', '"level": "info"'), False),
+        (FULL_LOG_LINE[:-1], False),
+    ],
+)
+def test_decode_log_fast(log_line: str, *, fast_decoded: bool):
+    decoded = decode_log_fast(log_line)
+    if fast_decoded:
+        # fast path must give exactly the same result as the pydantic model
+        assert decoded == decode_log_model(log_line)
+    else:
+        assert decoded is None
+
+
+UNKNOWN_HOST_LINE = FULL_LOG_LINE.replace("edupi.renaud.test", "unknown.renaud.test")
+
+
+@pytest.mark.parametrize(
+    "log_line",
+    [
+        UNKNOWN_HOST_LINE,
+        UNKNOWN_HOST_LINE.replace('"level":"info"', '"level":"error"'),
+        UNKNOWN_HOST_LINE.replace('"level":"info"', '"level": "info"'),
+        UNKNOWN_HOST_LINE.replace('"status":201', '"status":"201"'),
+        UNKNOWN_HOST_LINE.replace("handled request", "NOP"),
+        UNKNOWN_HOST_LINE[:-1],
+        UNKNOWN_HOST_LINE.replace('"handled request",', ""),
+        UNKNOWN_HOST_LINE.replace('"request":{', '"req":{'),
+        '{"level":"info","ts":1688459792,"msg":"handled request"}',
+        "not JSON",
+        '"ts":1688459792',
+    ],
+)
+def test_process_same_as_decode(
+    log_line: str, reverse_proxy_config: Callable[[str], ReverseProxyConfig]
+):
+    converter = CaddyLogConverter(reverse_proxy_config("processing_conf.yaml"))
+    decoded = decode_log_model(log_line)
+    if isinstance(decoded, ProcessingResult):
+        expected = decoded
+    else:
+        assert decoded[0] not in converter.generators_by_host
+        expected = ProcessingResult(inputs=[], ts=decoded[1].ts, warning=None)
+    # lines skipping the fast path give exactly the result of a full decode
+    assert converter.process(log_line) == expected
+
+
+@pytest.mark.parametrize(
+    "host, uri",
+    [
+        ("kiwix.renaud.test", "/content/wikipedia_en_all/"),
+        ("kiwix.renaud.test", "/content/super.zim_2023-05/this_is_a_super_page"),
+        ("nomad.renaud.test", "/"),
+        ("mathews.renaud.test", "/something"),
+        ("edupi1.renaud.test", "/api/documents/"),
+        ("edupi2.renaud.test", "/"),
+        ("wikifundi.renaud.test", "/"),
+        ("filemanager1.renaud.test", "/api/upload"),
+        ("filemanager2.renaud.test", "/"),
+        ("unknown.renaud.test", "/"),
+    ],
+)
+def test_process_generators_by_host(
+    host: str, uri: str, reverse_proxy_config: Callable[[str], ReverseProxyConfig]
+):
+    converter = CaddyLogConverter(reverse_proxy_config("conf_ok.yaml"))
+    log_line = (
+        FULL_LOG_LINE.replace("edupi.renaud.test", host)
+        .replace("/api/documents", uri)
+        .replace(
+            '"X-Tfm-Files-Added":["2"]',
+            '"X-Tfm-Files-Added":["2"],"X-Tfm-Files-Deleted":["1"]',
+        )
+    )
+    decoded = decode_log_fast(log_line)
+    assert decoded
+
+    # results must be the same as when passing the line to every generator
+    expected_inputs = [
+        input_
+        for generator in converter.generators
+        if generator.host == decoded[0]
+        for input_ in generator.process(decoded[1])
+    ]
+    assert converter.process(log_line).inputs == expected_inputs
+
+
+def test_process_cached(reverse_proxy_config: Callable[[str], ReverseProxyConfig]):
+    config = reverse_proxy_config("conf_ok.yaml")
+    converter = CaddyLogConverter(config)
+    log_line = FULL_LOG_LINE.replace("edupi.renaud.test", "kiwix.renaud.test").replace(
+        "/api/documents", "/content/wikipedia_en_all"
+    )
+    uncached = CaddyLogConverter(config, cache_max_size=0)
+
+    # same request at same second, later second, and same request again
+    for ts in ("1688459792.8632474", "1688459792.9", "1688459800.1", "1688459800.2"):
+        line = log_line.replace("1688459792.8632474", ts)
+        result = converter.process(line)
+        assert result == uncached.process(line)
+        assert [
+            input_.ts for input_ in result.inputs if isinstance(input_, PackageRequest)
+        ] == [int(float(ts))]
+    assert converter.cache.stats() == {
+        "size": 1,
+        "max_size": 4096,
+        "hits": 3,
+        "misses": 1,
+        "hit_ratio": 0.75,
+    }
+    assert uncached.cache.stats()["size"] == 0
+
+    # cache is invalidated when configuration changes
+    converter.configure(config)
+    assert converter.cache.stats()["size"] == 0
+
+
+def test_process_stats(reverse_proxy_config: Callable[[str], ReverseProxyConfig]):
+    converter = CaddyLogConverter(reverse_proxy_config("conf_ok.yaml"))
+    kiwix_line = FULL_LOG_LINE.replace("edupi.renaud.test", "kiwix.renaud.test")
+    for line in [
+        FULL_LOG_LINE.replace("edupi.renaud.test", "edupi1.renaud.test"),
+        kiwix_line.replace("/api/documents", "/content/wikipedia_en_all"),
+        kiwix_line.replace("/api/documents", "/content/wikipedia_en_all"),
+        kiwix_line,  # no input generated
+        FULL_LOG_LINE.replace("edupi.renaud.test", "unknown.renaud.test"),
+        kiwix_line.replace('"level":"info"', '"level":"error"'),
+        FULL_LOG_LINE.replace("handled request", "other"),
+        '{"msg":"handled request"',
+    ]:
+        converter.process(line)
+
+    stats = converter.stats()
+    assert {
+        key: value for key, value in stats.items() if key.startswith("dropped_")
+    } == {
+        "dropped_invalid_json": 1,
+        "dropped_wrong_level": 1,
+        "dropped_wrong_msg": 1,
+        "dropped_unknown_host": 1,
+        "dropped_no_inputs": 1,
+        "dropped_conversion_failed": 0,
+    }
+    assert stats["lines"] == 8
+    assert stats["hits_EdupiInputGenerator:edupi1.renaud.test"] == 1
+    assert stats["hits_ZimInputGenerator:kiwix.renaud.test"] == 2
+    assert stats["hits_CommonInputGenerator:wikifundi.renaud.test"] == 0
+
+
+@pytest.mark.parametrize(
+    "uri, expected_titles, expected_home",
+    [
+        ("/content/zim_1/", ["Zim 1"], True),
+        ("/content/zim_2", ["Zim 2", "Zim 2 again"], True),
+        ("/content/zim_2/A/page", ["Zim 2", "Zim 2 again"], False),
+        ("/content/zim_3/A/page", [], False),
+        ("/viewer", [], False),
+    ],
+)
+def test_zim_input_generator(
+    uri: str, expected_titles: list[str], *, expected_home: bool
+):
+    ts = 1688459792
+    generator = ZimInputGenerator(
+        host="kiwix.renaud.test",
+        zims={"zim_1": ["Zim 1"], "zim_2": ["Zim 2", "Zim 2 again"]},
+    )
+
+    inputs = generator.process(
+        LogData(
+            content_type=None,
+            status=200,
+            uri=uri,
+            method="GET",
+            ts=ts,
+            x_tfm_files_added=None,
+            x_tfm_files_deleted=None,
+        )
+    )
+
+    expected_inputs: list[Input] = []
+    for title in expected_titles:
+        if expected_home:
+            expected_inputs.append(PackageHomeVisit(package_title=title))
+        expected_inputs.append(PackageRequest(ts=ts, package_title=title))
+    assert inputs == expected_inputs
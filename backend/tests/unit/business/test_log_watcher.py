@@ -1,20 +1,34 @@
+import gzip
 import json
 import shutil
 import time
 from collections.abc import Callable
+from dataclasses import asdict
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from threading import Thread
 from typing import Any
 
 import pytest
-from watchdog.events import FileDeletedEvent, FileMovedEvent
+from watchdog.events import (
+    DirModifiedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+    FileSystemEvent,
+)
+from watchdog.observers.polling import PollingObserver
 
+from offspot_metrics_backend.business import log_watcher
 from offspot_metrics_backend.business.log_watcher import (
     LogWatcher,
     LogWatcherHandler,
     NewLineEvent,
+    NewLinesEvent,
+    coalesce_events,
 )
+from offspot_metrics_backend.business.tail_reader import FileId
 
 # Pause to perform in the middle of the tests to let watchdog process previous events
 PAUSE_IN_MS = 0.1
@@ -25,6 +39,7 @@ class LogWatcherTester:
 
     def __init__(self, tmp_path: Path) -> None:
         self.new_lines: list[str] = []
+        self.batches: list[NewLinesEvent] = []
         self.watched_path = tmp_path.joinpath("watched")
         self.watched_path.mkdir()
         self.data_path = tmp_path.joinpath("data")
@@ -37,18 +52,41 @@ class LogWatcherTester:
             raise ValueError("Something bad happens")
         self.new_lines.append(event.line_content)
 
+    def new_lines_handler(self, event: NewLinesEvent):
+        self.batches.append(event)
+        self.new_lines.extend(event.lines)
+
     async def run_watcher(self, watcher: LogWatcher):
         await watcher.run_async()
 
-    def run(self, func: Callable[[Path], None], *, recursive: bool = True):
+    def run(
+        self,
+        func: Callable[[Path], None],
+        *,
+        recursive: bool = True,
+        batched: bool = False,
+        **kwargs: Any,
+    ):
         self.new_lines = []
-
-        self.watcher = LogWatcher(
-            watched_folder=str(self.watched_path),
-            data_folder=str(self.data_path),
-            handler=self.new_line_handler,
-            recursive=recursive,
-        )
+        self.batches = []
+
+        if batched:
+            self.watcher = LogWatcher(
+                watched_folder=str(self.watched_path),
+                data_folder=str(self.data_path),
+                batch_handler=self.new_lines_handler,
+                batch_max_lines=2,
+                recursive=recursive,
+                **kwargs,
+            )
+        else:
+            self.watcher = LogWatcher(
+                watched_folder=str(self.watched_path),
+                data_folder=str(self.data_path),
+                handler=self.new_line_handler,
+                recursive=recursive,
+                **kwargs,
+            )
 
         thread = Thread(target=self.watcher.run_sync)
         thread.start()
@@ -79,10 +117,25 @@ def noop() -> Callable[[NewLineEvent], None]:
 def persisted_data() -> dict[str, Any]:
     """A sample dataset that could have been persisted to disk"""
     return {
-        "file_pointers": {
-            "caddy_access_logs.json": 123,
-            "caddy_access_logs-2024-01-09T13-43-07.371.json": 456,
-        }
+        "files": [
+            {
+                "device": 12,
+                "inode": 34,
+                "fingerprint": "abcd",
+                "fingerprint_size": 1024,
+                "position": 123,
+                "path": "caddy_access_logs.json",
+            },
+            {
+                "device": 12,
+                "inode": 56,
+                "fingerprint": "efgh",
+                "fingerprint_size": 1024,
+                "position": 456,
+                "path": "caddy_access_logs-2024-01-09T13-43-07.371.json.gz",
+                "complete_size": 321,
+            },
+        ]
     }
 
 
@@ -466,7 +519,72 @@ def test_log_watcher_existing_data_file(
     with open(tmp_path.joinpath("log_watcher_state.json"), "w") as fh:
         json.dump(persisted_data, fh)
     lwh = LogWatcherHandler(data_folder=str(tmp_path), handler=noop)
-    assert lwh.file_positions_map == persisted_data["file_pointers"]
+    # complete_size is missing in states saved by former versions
+    assert [asdict(state) for state in lwh.file_states.values()] == [
+        {**persisted_data["files"][0], "complete_size": None},
+        persisted_data["files"][1],
+    ]
+    assert list(lwh.file_states.keys()) == [(12, 34), (12, 56)]
+
+
+def test_log_watcher_legacy_data_file(
+    tmp_path: Path, noop: Callable[[NewLineEvent], None]
+):
+    log_file = tmp_path.joinpath("caddy_access_logs.json")
+    with open(log_file, mode="w") as fh:
+        fh.write('{"ts":1688459792.1}\n{"ts":1688459793.2}\n')
+    state_file = tmp_path.joinpath("log_watcher_state.json")
+    with open(state_file, "w") as fh:
+        json.dump(
+            {
+                "file_pointers": {
+                    str(log_file): 20,
+                    str(tmp_path.joinpath("caddy_access_logs-gone.json")): 456,
+                }
+            },
+            fh,
+        )
+    lwh = LogWatcherHandler(data_folder=str(tmp_path), handler=noop)
+    stat = log_file.stat()
+    assert list(lwh.file_states.keys()) == [(stat.st_dev, stat.st_ino)]
+    state = lwh.file_states[(stat.st_dev, stat.st_ino)]
+    assert state.position == 20
+    assert state.fingerprint_size == 40
+    assert state.path == str(log_file)
+
+    lwh.archive_state_file()
+    assert not state_file.exists()
+    assert tmp_path.joinpath("log_watcher_state.json.migrated").exists()
+
+
+@pytest.mark.parametrize(
+    "content, position, expected",
+    [
+        ('{"ts":1688459792.1}\n{"ts":1688459793.2}\n', 0, 0),
+        ('{"ts":1688459792.1}\n{"ts":1688459793.2}\n', 40, 40),
+        # file is smaller than saved position
+        ('{"ts":1688459792.1}\n', 40, 0),
+        # position is not at the end of a line
+        ('{"ts":1688459792.1}\n{"ts":1688459793.2}\n', 30, 0),
+        # line has been logged after state was saved, i.e. file has been recreated
+        ('{"ts":1688459792.1}\n{"ts":4102444800.0}\n', 40, 0),
+        # line timestamp cannot be checked
+        ("L1\nL2\n", 3, 0),
+    ],
+)
+def test_log_watcher_legacy_position(
+    tmp_path: Path,
+    noop: Callable[[NewLineEvent], None],
+    content: str,
+    position: int,
+    expected: int,
+):
+    log_file = tmp_path.joinpath("caddy_access_logs.json")
+    log_file.write_text(content)
+    with open(tmp_path.joinpath("log_watcher_state.json"), "w") as fh:
+        json.dump({"file_pointers": {str(log_file): position}}, fh)
+    lwh = LogWatcherHandler(data_folder=str(tmp_path), handler=noop)
+    assert [state.position for state in lwh.file_states.values()] == [expected]
 
 
 def test_log_watcher_deleted_file(log_watcher_tester: LogWatcherTester):
@@ -493,6 +611,32 @@ def test_log_watcher_deleted_file(log_watcher_tester: LogWatcherTester):
     assert sorted(log_watcher_tester.new_lines) == ["L1.1", "L2.1"]
 
 
+def test_log_watcher_state_not_persisted(log_watcher_tester: LogWatcherTester):
+    forgotten: list[FileId] = []
+
+    def modify_files(watched_path: Path):
+        created_file = watched_path.joinpath("caddy_access_logs.json")
+        with open(created_file, mode="w") as fh:
+            fh.write("L1.1\nL1.2\n")
+
+        time.sleep(PAUSE_IN_MS)
+
+        created_file.unlink()
+
+    log_watcher_tester.run(
+        modify_files,
+        batched=True,
+        persist_state=False,
+        forget_handler=forgotten.extend,
+    )
+
+    assert log_watcher_tester.new_lines == ["L1.1", "L1.2"]
+    file_state = log_watcher_tester.batches[-1].file_state
+    assert file_state and file_state.position == 10
+    assert forgotten == [file_state.file_id]
+    assert list(log_watcher_tester.data_path.iterdir()) == []
+
+
 def test_log_watcher_file_disappeared(log_watcher_tester: LogWatcherTester):
     def modify_files(watched_path: Path):
         created_file = watched_path.joinpath("caddy_access_logs.json")
@@ -536,3 +680,444 @@ def test_log_watcher_stop_twice(log_watcher_tester: LogWatcherTester):
     log_watcher_tester.watcher.stop()
 
     assert sorted(log_watcher_tester.new_lines) == ["L1.1"]
+
+
+def test_log_watcher_batched(log_watcher_tester: LogWatcherTester):
+    with open(
+        log_watcher_tester.watched_path.joinpath("caddy_access_logs.json"), mode="w"
+    ) as fh:
+        fh.write("L1\nL2\nL3\nL4")
+
+    def modify_files(watched_path: Path):
+        with open(watched_path.joinpath("caddy_access_logs.json"), mode="a") as fh:
+            fh.write("\nL5\n")
+
+    log_watcher_tester.run(modify_files, batched=True)
+
+    assert log_watcher_tester.new_lines == ["L1", "L2", "L3", "L4", "L5"]
+    assert [batch.lines for batch in log_watcher_tester.batches] == [
+        ["L1", "L2"],
+        ["L3"],
+        ["L4", "L5"],
+    ]
+    assert [batch.offsets for batch in log_watcher_tester.batches] == [
+        [3, 6],
+        [9],
+        [12, 15],
+    ]
+
+
+def test_log_watcher_batched_with_failures(tmp_path: Path):
+    log_file = tmp_path.joinpath("caddy_access_logs.json")
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL2\nL3\n")
+
+    batches: list[NewLinesEvent] = []
+
+    def failing_handler(event: NewLinesEvent):
+        batches.append(event)
+        raise ValueError("Something bad happens")
+
+    lwh = LogWatcherHandler(
+        data_folder=str(tmp_path), batch_handler=failing_handler, batch_max_lines=2
+    )
+    lwh.process_new_lines(log_file)
+
+    assert [batch.lines for batch in batches] == [["L1", "L2"], ["L3"]]
+    assert lwh.file_states[lwh.file_ids[str(log_file)]].position == 9
+
+
+def test_log_watcher_batched_max_wait(tmp_path: Path):
+    log_file = tmp_path.joinpath("caddy_access_logs.json")
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL2\nL3\n")
+
+    batches: list[NewLinesEvent] = []
+
+    lwh = LogWatcherHandler(
+        data_folder=str(tmp_path),
+        batch_handler=batches.append,
+        batch_max_lines=100,
+        batch_max_wait=0,
+    )
+    lwh.process_new_lines(log_file)
+
+    assert [batch.lines for batch in batches] == [["L1"], ["L2"], ["L3"]]
+
+
+def test_log_watcher_handlers_misconfigured(
+    tmp_path: Path, noop: Callable[[NewLineEvent], None]
+):
+    with pytest.raises(ValueError):
+        LogWatcherHandler(data_folder=str(tmp_path))
+    with pytest.raises(ValueError):
+        LogWatcherHandler(
+            data_folder=str(tmp_path), handler=noop, batch_handler=lambda _: None
+        )
+
+
+def test_log_watcher_restart_resumes_moved_file(log_watcher_tester: LogWatcherTester):
+    def modify_files(watched_path: Path):
+        with open(watched_path.joinpath("caddy_access_logs.json"), mode="w") as fh:
+            fh.write("L1\nL2\n")
+
+    log_watcher_tester.run(modify_files)
+    assert sorted(log_watcher_tester.new_lines) == ["L1", "L2"]
+
+    # simulate a rotation + new data while the watcher is not running
+    watched_path = log_watcher_tester.watched_path
+    watched_path.joinpath("caddy_access_logs.json").rename(
+        watched_path.joinpath("caddy_access_logs-2024-01-06T13-43-07.371.json")
+    )
+    with open(
+        watched_path.joinpath("caddy_access_logs-2024-01-06T13-43-07.371.json"),
+        mode="a",
+    ) as fh:
+        fh.write("L3\n")
+    with open(watched_path.joinpath("caddy_access_logs.json"), mode="w") as fh:
+        fh.write("M1\n")
+
+    def noop(_: Path):
+        pass
+
+    log_watcher_tester.run(noop)
+    assert sorted(log_watcher_tester.new_lines) == ["L3", "M1"]
+
+
+def test_log_watcher_restart_skips_consumed_files(
+    log_watcher_tester: LogWatcherTester,
+):
+    with open(
+        log_watcher_tester.watched_path.joinpath(
+            "caddy_access_logs-2024-01-06T13-43-07.371.json"
+        ),
+        mode="w",
+    ) as fh:
+        fh.write("L1\nL2\n")
+
+    def noop(_: Path):
+        pass
+
+    log_watcher_tester.run(noop)
+    assert sorted(log_watcher_tester.new_lines) == ["L1", "L2"]
+
+    # a new watcher does not even open the fully consumed file
+    watcher = LogWatcher(
+        watched_folder=str(log_watcher_tester.watched_path),
+        data_folder=str(log_watcher_tester.data_path),
+        handler=log_watcher_tester.new_line_handler,
+    )
+    watcher.process_existing_files()
+    assert watcher.event_handler.readers == {}
+    assert len(watcher.event_handler.file_states) == 1
+
+
+def test_log_watcher_recreated_file_missed_events(tmp_path: Path):
+    log_file = tmp_path.joinpath("caddy_access_logs.json")
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL2\n")
+
+    lines: list[str] = []
+
+    def handler(event: NewLineEvent):
+        lines.append(event.line_content)
+
+    lwh = LogWatcherHandler(data_folder=str(tmp_path), handler=handler)
+    lwh.process_new_lines(log_file)
+    lwh.close()
+
+    # file is recreated under the same name but no event is received
+    log_file.rename(tmp_path.joinpath("caddy_access_logs-old.json"))
+    with open(log_file, mode="w") as fh:
+        fh.write("M1\nM2\nM3\n")
+
+    lwh.process_new_lines(log_file)
+
+    assert lines == ["L1", "L2", "M1", "M2", "M3"]
+
+
+def test_log_watcher_inode_reused(tmp_path: Path):
+    log_file = tmp_path.joinpath("caddy_access_logs.json")
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL2\n")
+
+    lines: list[str] = []
+
+    def handler(event: NewLineEvent):
+        lines.append(event.line_content)
+
+    lwh = LogWatcherHandler(data_folder=str(tmp_path), handler=handler)
+    lwh.process_new_lines(log_file)
+    lwh.close()
+
+    # simulate a new file whose inode is identical (same file id) but whose content
+    # is different
+    with open(log_file, mode="r+") as fh:
+        fh.write("M1\nM2\nM3\n")
+
+    lwh.process_new_lines(log_file)
+
+    assert lines == ["L1", "L2", "M1", "M2", "M3"]
+
+
+def test_log_watcher_readers_released(tmp_path: Path):
+    log_file = tmp_path.joinpath("caddy_access_logs.json")
+    rotated_file = tmp_path.joinpath("caddy_access_logs-2024-01-06T13-43-07.371.json")
+    compressed_file = rotated_file.with_suffix(".json.gz")
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL2\n")
+
+    lines: list[str] = []
+
+    def handler(event: NewLineEvent):
+        lines.append(event.line_content)
+
+    lwh = LogWatcherHandler(data_folder=str(tmp_path), handler=handler)
+    lwh.process_events([FileCreatedEvent(str(log_file))])
+    file_id = lwh.file_ids[str(log_file)]
+    assert list(lwh.readers) == [file_id]
+
+    # rotated file is closed once drained, and opened again if modified anyway
+    with open(log_file, mode="a") as fh:
+        fh.write("L3\n")
+    log_file.rename(rotated_file)
+    lwh.process_events([FileMovedEvent(str(log_file), str(rotated_file))])
+    assert lwh.readers == {}
+    with open(rotated_file, mode="a") as fh:
+        fh.write("L4\n")
+    lwh.process_events([FileModifiedEvent(str(rotated_file))])
+    assert lwh.readers == {}
+
+    # compressed file is closed once fully read
+    compressed_file.write_bytes(gzip.compress(b"L1\nL2\nL3\nL4\n"))
+    lwh.process_events([FileCreatedEvent(str(compressed_file))])
+    assert lwh.readers == {}
+
+    rotated_file.unlink()
+    lwh.process_events([FileDeletedEvent(str(rotated_file))])
+    assert lwh.rotated_files == set()
+    assert lines == ["L1", "L2", "L3", "L4"]
+
+
+@pytest.mark.parametrize(
+    "events, expected",
+    [
+        pytest.param([], [], id="empty"),
+        pytest.param(
+            [FileModifiedEvent("a"), FileModifiedEvent("a"), FileModifiedEvent("a")],
+            [FileModifiedEvent("a")],
+            id="same_file",
+        ),
+        pytest.param(
+            [FileCreatedEvent("a"), FileModifiedEvent("a"), FileModifiedEvent("b")],
+            [FileCreatedEvent("a"), FileModifiedEvent("b")],
+            id="created_and_other_file",
+        ),
+        pytest.param(
+            [
+                FileModifiedEvent("a"),
+                FileMovedEvent("a", "b"),
+                FileModifiedEvent("a"),
+                FileModifiedEvent("b"),
+            ],
+            [
+                FileModifiedEvent("a"),
+                FileMovedEvent("a", "b"),
+                FileModifiedEvent("a"),
+                FileModifiedEvent("b"),
+            ],
+            id="moved",
+        ),
+        pytest.param(
+            [
+                FileModifiedEvent("a"),
+                FileDeletedEvent("a"),
+                FileModifiedEvent("a"),
+                FileModifiedEvent("a"),
+            ],
+            [
+                FileModifiedEvent("a"),
+                FileDeletedEvent("a"),
+                FileModifiedEvent("a"),
+            ],
+            id="deleted",
+        ),
+        pytest.param(
+            [DirModifiedEvent("c"), DirModifiedEvent("c")],
+            [DirModifiedEvent("c")],
+            id="directory",
+        ),
+    ],
+)
+def test_coalesce_events(
+    events: list[FileSystemEvent], expected: list[FileSystemEvent]
+):
+    assert coalesce_events(events) == expected
+
+
+def test_log_watcher_coalesced_events(log_watcher_tester: LogWatcherTester):
+    def modify_files(watched_path: Path):
+        # alternate modifications on two files, since watchdog already skips
+        # consecutive identical events
+        fh1 = open(watched_path.joinpath("caddy_access_logs.json"), mode="w")
+        fh2 = open(watched_path.joinpath("caddy_access_logs-2.json"), mode="w")
+        for index in range(20):
+            fh1.write(f"L{index}\n")
+            fh1.flush()
+            fh2.write(f"M{index}\n")
+            fh2.flush()
+        fh1.close()
+        fh2.close()
+
+    log_watcher_tester.run(modify_files)
+
+    assert sorted(log_watcher_tester.new_lines) == sorted(
+        [f"L{index}" for index in range(20)] + [f"M{index}" for index in range(20)]
+    )
+    assert log_watcher_tester.watcher
+    assert log_watcher_tester.watcher.events_coalesced > 0
+    assert (
+        log_watcher_tester.watcher.events_received
+        > log_watcher_tester.watcher.events_coalesced
+    )
+
+
+def test_log_watcher_compressed_rotated_file(log_watcher_tester: LogWatcherTester):
+    watched_path = log_watcher_tester.watched_path
+    with open(watched_path.joinpath("caddy_access_logs.json"), mode="w") as fh:
+        fh.write("L1\nL2\n")
+
+    def noop(_: Path):
+        pass
+
+    log_watcher_tester.run(noop)
+    assert sorted(log_watcher_tester.new_lines) == ["L1", "L2"]
+
+    # simulate a rotation + compression + new data while watcher is not running
+    watched_path.joinpath(
+        "caddy_access_logs-2024-01-06T13-43-07.371.json.gz"
+    ).write_bytes(gzip.compress(b"L1\nL2\nL3\n"))
+    watched_path.joinpath("caddy_access_logs.json").unlink()
+    # a compressed backlog never read before
+    watched_path.joinpath(
+        "caddy_access_logs-2024-01-05T13-43-07.371.json.gz"
+    ).write_bytes(gzip.compress(b"K1\nK2\n"))
+
+    def rotate(watched_path: Path):
+        with open(watched_path.joinpath("caddy_access_logs.json"), mode="w") as fh:
+            fh.write("M1\nM2\n")
+        watched_path.joinpath("caddy_access_logs.json").rename(
+            watched_path.joinpath("caddy_access_logs-2024-01-07T13-43-07.371.json")
+        )
+        watched_path.joinpath(
+            "caddy_access_logs-2024-01-07T13-43-07.371.json.gz"
+        ).write_bytes(gzip.compress(b"M1\nM2\n"))
+        watched_path.joinpath("caddy_access_logs-2024-01-07T13-43-07.371.json").unlink()
+
+    log_watcher_tester.run(rotate)
+    assert sorted(log_watcher_tester.new_lines) == ["K1", "K2", "L3", "M1", "M2"]
+
+    # compressed files which have been fully read are skipped on restart
+    watcher = LogWatcher(
+        watched_folder=str(log_watcher_tester.watched_path),
+        data_folder=str(log_watcher_tester.data_path),
+        handler=log_watcher_tester.new_line_handler,
+    )
+    watcher.process_existing_files()
+    assert watcher.event_handler.readers == {}
+    assert len(watcher.event_handler.file_states) == 3
+
+
+def caddy_line(ts: float, name: str) -> str:
+    return json.dumps({"level": "info", "ts": ts, "msg": name}) + "\n"
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_log_watcher_catch_up_in_time_order(
+    log_watcher_tester: LogWatcherTester, *, batched: bool
+):
+    watched_path = log_watcher_tester.watched_path
+    with open(
+        watched_path.joinpath("caddy_access_logs-2024-01-06T13-43-07.371.json"),
+        mode="w",
+    ) as fh:
+        fh.write(caddy_line(1, "A1") + caddy_line(3, "A3") + caddy_line(5, "A5"))
+    watched_path.joinpath(
+        "caddy_access_logs-2024-01-06T14-43-07.371.json.gz"
+    ).write_bytes(gzip.compress((caddy_line(2, "B2") + caddy_line(6, "B6")).encode()))
+    with open(watched_path.joinpath("caddy_access_logs.json"), mode="w") as fh:
+        # a line without timestamp stays after the previous line of its file
+        fh.write(caddy_line(4, "C4") + "C-no-ts\n" + caddy_line(4.5, "C4.5"))
+
+    def noop(_: Path):
+        pass
+
+    log_watcher_tester.run(noop, batched=batched)
+    names = [
+        json.loads(line)["msg"] if line.startswith("{") else line
+        for line in log_watcher_tester.new_lines
+    ]
+    assert names == ["A1", "B2", "A3", "C4", "C-no-ts", "C4.5", "A5", "B6"]
+    if batched:
+        # consecutive lines of a same file are still delivered together ; compressed
+        # file being fully read is then checkpointed with an empty batch
+        assert [len(batch.lines) for batch in log_watcher_tester.batches] == [
+            1,
+            1,
+            1,
+            2,
+            1,
+            1,
+            1,
+            0,
+        ]
+        assert log_watcher_tester.batches[-1].file_state
+        assert log_watcher_tester.batches[-1].file_state.complete_size
+
+
+def test_log_watcher_no_native_backend(
+    log_watcher_tester: LogWatcherTester, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(log_watcher, "Observer", PollingObserver)
+
+    def modify_files(watched_path: Path):
+        with open(watched_path.joinpath("caddy_access_logs.json"), mode="w") as fh:
+            fh.write("L1\nL2\n")
+        time.sleep(0.5)  # leave time to poll and then back off
+
+    log_watcher_tester.run(
+        modify_files, polling_min_interval=0.02, polling_max_interval=0.08
+    )
+
+    assert log_watcher_tester.new_lines == ["L1", "L2"]
+    assert log_watcher_tester.watcher
+    stats = log_watcher_tester.watcher.stats()
+    assert stats["mode"] == "polling"
+    assert stats["fallback_reason"] == "no native file system events backend available"
+    assert stats["polling_interval_seconds"] == 0.08
+
+
+def test_log_watcher_silent_events(
+    log_watcher_tester: LogWatcherTester, monkeypatch: pytest.MonkeyPatch
+):
+    # simulate a file system where events are never received
+    monkeypatch.setattr(
+        log_watcher.LogWatcherEventBridge, "on_any_event", lambda *_: None
+    )
+    monkeypatch.setattr(log_watcher, "SILENCE_GRACE_SECONDS", 0)
+
+    def modify_files(watched_path: Path):
+        with open(watched_path.joinpath("caddy_access_logs.json"), mode="w") as fh:
+            fh.write("L1\nL2\n")
+        time.sleep(0.5)  # leave time to detect silence and then poll
+
+    log_watcher_tester.run(
+        modify_files, silence_check_interval=0.1, polling_min_interval=0.02
+    )
+
+    assert log_watcher_tester.new_lines == ["L1", "L2"]
+    assert log_watcher_tester.watcher
+    assert log_watcher_tester.watcher.mode == "polling"
+    assert log_watcher_tester.watcher.fallback_reason == (
+        "1 log file(s) grew during 0.1 seconds without any file system event"
+    )
@@ -0,0 +1,27 @@
+from offspot_metrics_backend.business.lru_cache import LruCache
+
+
+def test_lru_cache_eviction():
+    cache: LruCache[str, int] = LruCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.hit_ratio == 0.75
+
+
+def test_lru_cache_disabled():
+    cache: LruCache[str, int] = LruCache(max_size=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "size": 0,
+        "max_size": 0,
+        "hits": 0,
+        "misses": 1,
+        "hit_ratio": 0,
+    }
@@ -7,5 +7,12 @@ def test_period_now():
     expected_datetime = datetime.datetime.now()  # noqa: DTZ005
     now = Now()
     assert Period(expected_datetime) == now.period
-    assert Tick(expected_datetime) == now.tick
+    assert Tick(int(expected_datetime.timestamp())) == now.tick
     assert int((expected_datetime - now.datetime).total_seconds()) == 0
+
+
+def test_tick():
+    tick = Tick(1688459792)
+    assert tick.ts == 1688459760
+    assert tick.dt == datetime.datetime.fromtimestamp(1688459760)
+    assert tick.get_next() == Tick(1688459820)
@@ -0,0 +1,496 @@
+import datetime
+from collections.abc import Generator
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from offspot_metrics_backend import db
+from offspot_metrics_backend.business import processor as processor_module
+from offspot_metrics_backend.business.caddy_log_converter import ProcessingResult
+from offspot_metrics_backend.business.indicators.package import (
+    PackageHomeVisit as PackageHomeVisitIndicator,
+)
+from offspot_metrics_backend.business.indicators.total_usage import TotalUsageOverall
+from offspot_metrics_backend.business.indicators.uptime import Uptime
+from offspot_metrics_backend.business.inputs.batch import InputsBatch
+from offspot_metrics_backend.business.inputs.package import (
+    PackageHomeVisit,
+    PackageRequest,
+)
+from offspot_metrics_backend.business.log_watcher import FileState
+from offspot_metrics_backend.business.period import Period, Tick
+from offspot_metrics_backend.business.processor import Processor, TickJob
+from offspot_metrics_backend.db.models import IndicatorRecord
+from offspot_metrics_backend.db.persister import Persister
+
+
+@pytest.fixture()
+def processor() -> Generator[Processor, None, None]:
+    processor = Processor()
+    processor.startup()
+    yield processor
+
+
+@pytest.fixture()
+def file_state() -> FileState:
+    return FileState(
+        device=1,
+        inode=2,
+        fingerprint="abc",
+        fingerprint_size=3,
+        position=6,
+        path="caddy_access_logs.json",
+    )
+
+
+def result_at(minute: int) -> ProcessingResult:
+    return ProcessingResult(
+        inputs=[],
+        ts=int(datetime.datetime(2023, 6, 8, 10, minute).timestamp()),
+        warning=None,
+    )
+
+
+def test_processor_checkpoint_at_tick(
+    processor: Processor, file_state: FileState, monkeypatch: pytest.MonkeyPatch
+):
+    checkpoints: list[list[FileState]] = []
+    monkeypatch.setattr(
+        processor,
+        "_process_tick",
+        lambda **_: checkpoints.append(
+            [replace(state) for state in processor.log_checkpoints.values()]
+        ),
+    )
+
+    processor.process_inputs_batch(
+        results=[result_at(0), result_at(0)], file_state=file_state, offsets=[3, 6]
+    )
+    assert checkpoints == []
+    assert processor.log_file_states == [file_state]
+
+    # tick is processed before the third line, which is hence not checkpointed
+    processor.process_inputs_batch(
+        results=[result_at(0), result_at(1)],
+        file_state=replace(file_state, position=12),
+        offsets=[9, 12],
+    )
+    assert checkpoints == [[replace(file_state, position=9)]]
+    assert processor.log_file_states == [replace(file_state, position=12)]
+
+    # batch without lines only updates the state
+    completed_state = replace(file_state, position=12, complete_size=42)
+    processor.process_inputs_batch(results=[], file_state=completed_state, offsets=[])
+    assert processor.log_file_states == [completed_state]
+
+    processor.forget_log_files([file_state.file_id])
+    assert processor.log_file_states == []
+
+
+def batch_at(*minutes: int) -> InputsBatch:
+    batch = InputsBatch()
+    for minute in minutes:
+        result = result_at(minute)
+        batch.add_line(ts=result.ts, inputs=result.inputs)
+    return batch
+
+
+def test_processor_batch_checkpoint_at_tick(
+    processor: Processor, file_state: FileState, monkeypatch: pytest.MonkeyPatch
+):
+    checkpoints: list[list[FileState]] = []
+    monkeypatch.setattr(
+        processor,
+        "_process_tick",
+        lambda **_: checkpoints.append(
+            [replace(state) for state in processor.log_checkpoints.values()]
+        ),
+    )
+
+    processor.process_batch(batch=batch_at(0, 0), file_state=file_state, offsets=[3, 6])
+    assert checkpoints == []
+    assert processor.log_file_states == [file_state]
+
+    # tick is processed before the third line, which is hence not checkpointed
+    processor.process_batch(
+        batch=batch_at(0, 1),
+        file_state=replace(file_state, position=12),
+        offsets=[9, 12],
+    )
+    assert checkpoints == [[replace(file_state, position=9)]]
+    assert processor.log_file_states == [replace(file_state, position=12)]
+
+    with pytest.raises(ValueError):
+        processor.process_batch(batch=batch_at(2), file_state=file_state, offsets=[])
+
+
+def test_processor_forgotten_file_not_checkpointed(
+    processor: Processor, file_state: FileState
+):
+    processor.process_batch(batch=batch_at(0), file_state=file_state, offsets=[6])
+    processor.forget_log_files([file_state.file_id])
+
+    # lines read before the file has been forgotten are processed, not checkpointed
+    processor.process_batch(
+        batch=batch_at(0), file_state=replace(file_state, position=9), offsets=[9]
+    )
+    processor.process_inputs_batch(
+        results=[result_at(0)],
+        file_state=replace(file_state, position=12),
+        offsets=[12],
+    )
+    assert processor.log_file_states == []
+
+    # identifier reused by another file
+    new_state = replace(file_state, fingerprint="def", position=3)
+    processor.process_batch(batch=batch_at(0), file_state=new_state, offsets=[3])
+    assert processor.log_file_states == [new_state]
+    assert processor.forgotten_files == {}
+
+
+def test_processor_forgotten_file_never_checkpointed(
+    processor: Processor, file_state: FileState
+):
+    processor.forget_log_files([file_state.file_id])
+    processor.process_batch(batch=batch_at(0), file_state=file_state, offsets=[6])
+    processor.process_batch(
+        batch=batch_at(0), file_state=replace(file_state, position=9), offsets=[9]
+    )
+    assert processor.log_file_states == []
+    assert processor.forgotten_files == {file_state.file_id: file_state.fingerprint}
+
+
+def test_processor_no_session_without_tick(
+    processor: Processor, monkeypatch: pytest.MonkeyPatch
+):
+    def no_session():
+        raise AssertionError("No DB session expected")
+
+    monkeypatch.setattr(db, "Session", no_session)
+    processor.process_inputs(result_at(0))
+    processor.process_inputs(result_at(0))
+    processor.process_inputs_batch(results=[result_at(0)])
+    processor.process_batch(batch=batch_at(0))
+
+
+def test_processor_checkpoint_persisted(
+    processor: Processor, file_state: FileState, dbsession: Session
+):
+    processor.restore_log_file_states([file_state])
+
+    processor._process_tick(  # pyright: ignore[reportPrivateUsage]
+        now=int(datetime.datetime(2023, 6, 8, 10, 0).timestamp()), session=dbsession
+    )
+
+    assert Persister.get_log_file_states(session=dbsession) == [file_state]
+
+
+def test_processor_persist_log_file_states(processor: Processor, file_state: FileState):
+    processor.restore_log_file_states([file_state])
+    try:
+        processor.persist_log_file_states()
+        restored = Processor()
+        restored.startup()
+        assert restored.log_file_states == [file_state]
+    finally:
+        processor.restore_log_file_states([])
+        processor.persist_log_file_states()
+
+
+def test_processor_checkpoint_offsets_mismatch(
+    processor: Processor, file_state: FileState
+):
+    with pytest.raises(ValueError):
+        processor.process_inputs_batch(
+            results=[result_at(0)], file_state=file_state, offsets=[]
+        )
+
+
+def test_processor_tick_worker(
+    processor: Processor,
+    file_state: FileState,
+    monkeypatch: pytest.MonkeyPatch,
+    dbsession: Session,
+):
+    jobs: list[TickJob] = []
+    monkeypatch.setattr(
+        processor, "_persist_tick_in_new_session", lambda job: jobs.append(job)
+    )
+
+    processor.start_tick_worker()
+    processor.restore_log_file_states([file_state])
+    processor.process_inputs(result_at(0))
+    processor.process_inputs(result_at(1))
+    processor.process_inputs(result_at(2))
+    processor.stop_tick_worker()
+
+    assert [job.tick_period for job in jobs] == [
+        Period.from_timestamp(result_at(minute).ts) for minute in (1, 2)
+    ]
+    assert [job.file_states for job in jobs] == [[file_state], [file_state]]
+    stats = processor.tick_stats()
+    assert stats["ticks"] == 2
+    assert stats["total_stall_ms"] >= stats["max_stall_ms"] >= stats["last_stall_ms"]
+    assert processor.tick_worker is None
+
+    processor._persist_tick(  # pyright: ignore[reportPrivateUsage]
+        job=jobs[-1], session=dbsession
+    )
+    assert Persister.get_log_file_states(session=dbsession) == [file_state]
+
+
+class FakeNow:
+    """Current time, as returned by `Now` and `monotonic`, but set by tests"""
+
+    timestamp = int(datetime.datetime(2023, 6, 8, 10, 0).timestamp())
+    monotonic = 1000.0
+
+    def __call__(self) -> "FakeNow":
+        return self
+
+    def sleep(self, seconds: int):
+        """Let time pass"""
+        self.timestamp += seconds
+        self.monotonic += seconds
+
+
+@pytest.fixture()
+def fake_now(monkeypatch: pytest.MonkeyPatch) -> FakeNow:
+    now = FakeNow()
+    monkeypatch.setattr(processor_module, "Now", now)
+    monkeypatch.setattr(processor_module, "monotonic", lambda: now.monotonic)
+    return now
+
+
+@pytest.fixture()
+def tick_jobs(processor: Processor, monkeypatch: pytest.MonkeyPatch) -> list[TickJob]:
+    jobs: list[TickJob] = []
+    monkeypatch.setattr(
+        processor,
+        "_persist_tick",
+        lambda job, session: jobs.append(job),  # noqa: ARG005
+    )
+    return jobs
+
+
+def job_records(job: TickJob, indicator_id: int) -> list[int]:
+    """Values of the records of an indicator, as frozen in a tick job"""
+    assert job.snapshot
+    return [
+        record.value
+        for indicator in job.snapshot.indicators
+        if indicator.unique_id == indicator_id
+        for record in indicator.get_records()
+    ]
+
+
+def start_ticking(processor: Processor, fake_now: FakeNow, jobs: list[TickJob]):
+    """Process a first tick, one minute after current time"""
+    processor.check_for_inactivity()
+    fake_now.sleep(60)
+    processor.check_for_inactivity()
+    jobs.clear()
+
+
+def test_processor_inactivity_replay(
+    processor: Processor, fake_now: FakeNow, tick_jobs: list[TickJob]
+):
+    start = fake_now.timestamp
+    processor.check_for_inactivity()
+    fake_now.timestamp += 3 * 60 + 20
+    processor.check_for_inactivity()
+
+    # clock ticks are passed for every minute, but only last tick is persisted
+    assert [job.tick_period for job in tick_jobs] == [
+        Period.from_timestamp(start + 3 * 60)
+    ]
+    assert job_records(tick_jobs[0], Uptime.unique_id) == [3]
+    assert processor.last_tick_processed == Tick(start + 3 * 60)
+    assert processor.tick_stats()["skipped_ticks"] == 0
+
+
+def test_processor_inactivity_jump_ahead(
+    processor: Processor, fake_now: FakeNow, tick_jobs: list[TickJob]
+):
+    start_ticking(processor, fake_now, tick_jobs)
+    start = fake_now.timestamp
+    # clock set ahead, no time really elapsed
+    fake_now.timestamp = start + 3 * 7 * 24 * 3600
+    processor.check_for_inactivity()
+
+    assert [job.tick_period for job in tick_jobs] == [
+        Period.from_timestamp(fake_now.timestamp)
+    ]
+    # only the first tick and the one closing the period are counted
+    assert job_records(tick_jobs[0], Uptime.unique_id) == [2]
+    assert tick_jobs[0].snapshot
+    assert tick_jobs[0].snapshot.period_closed
+    assert processor.last_tick_processed == Tick(fake_now.timestamp)
+    assert processor.tick_stats()["skipped_ticks"] == 3 * 7 * 24 * 60 - 1
+
+
+def test_processor_logs_gap_not_replayed(
+    processor: Processor, fake_now: FakeNow, tick_jobs: list[TickJob]
+):
+    fake_now.timestamp = int(datetime.datetime(2023, 6, 8, 10, 54).timestamp())
+    start_ticking(processor, fake_now, tick_jobs)
+    # no log line for 8 minutes, longer than MAX_REPLAYED_TICKS
+    fake_now.sleep(8 * 60)
+    processor.process_inputs(
+        ProcessingResult(
+            inputs=[PackageRequest(ts=fake_now.timestamp, package_title="Wikipedia")],
+            ts=fake_now.timestamp,
+            warning=None,
+        )
+    )
+
+    # ticks driven by log lines are never replayed, a single tick closes the period
+    assert [job.tick_period for job in tick_jobs] == [
+        Period(datetime.datetime(2023, 6, 8, 11, 3)),
+    ]
+    assert tick_jobs[0].snapshot
+    assert tick_jobs[0].snapshot.period_closed
+    assert job_records(tick_jobs[0], Uptime.unique_id) == [2]
+    assert processor.tick_stats()["skipped_ticks"] == 0
+    # input is processed afterwards, in current period
+    assert [
+        record.value
+        for indicator in processor.indicator_processor.indicators
+        if indicator.unique_id == TotalUsageOverall.unique_id
+        for record in indicator.get_records()
+    ] == [10]
+
+
+def test_processor_clock_back(
+    processor: Processor, fake_now: FakeNow, tick_jobs: list[TickJob]
+):
+    start_ticking(processor, fake_now, tick_jobs)
+    start = fake_now.timestamp
+    processor.process_inputs(
+        ProcessingResult(
+            inputs=[PackageRequest(ts=start, package_title="Wikipedia")],
+            ts=start,
+            warning=None,
+        )
+    )
+    # clock went back by more than one hour
+    fake_now.timestamp = start - 26 * 3600
+    processor.check_for_inactivity()
+
+    # current period is closed, nothing is replayed
+    assert [job.tick_period for job in tick_jobs] == [
+        Period.from_timestamp(fake_now.timestamp)
+    ]
+    assert tick_jobs[0].snapshot
+    assert tick_jobs[0].snapshot.period == Period.from_timestamp(start)
+    assert tick_jobs[0].snapshot.period_closed
+    assert job_records(tick_jobs[0], TotalUsageOverall.unique_id) == [10]
+    assert processor.indicator_processor.current_period == Period.from_timestamp(
+        fake_now.timestamp
+    )
+    assert processor.last_tick_processed == Tick(fake_now.timestamp)
+    assert processor.tick_stats()["clock_backward_jumps"] == 1
+
+    # inputs go on in fresh recorders, and ticks resume from new time
+    fake_now.sleep(90 * 60)
+    processor.process_inputs(
+        ProcessingResult(
+            inputs=[PackageRequest(ts=fake_now.timestamp, package_title="Wikipedia")],
+            ts=fake_now.timestamp,
+            warning=None,
+        )
+    )
+    fake_now.sleep(60)
+    processor.check_for_inactivity()
+    assert tick_jobs[-1].tick_period == Period.from_timestamp(fake_now.timestamp)
+    assert job_records(tick_jobs[-1], TotalUsageOverall.unique_id) == [10]
+
+
+def db_records(session: Session, indicator_id: int, hour: int) -> list[int]:
+    """Values of the records of an indicator stored in DB, for a given hour"""
+    period = Period(datetime.datetime(2023, 6, 8, hour, 0))
+    return list(
+        session.execute(
+            select(IndicatorRecord.value)
+            .where(IndicatorRecord.indicator_id == indicator_id)
+            .where(IndicatorRecord.period_id == period.timestamp)
+        ).scalars()
+    )
+
+
+def visit_at(ts: int) -> ProcessingResult:
+    return ProcessingResult(
+        inputs=[
+            PackageRequest(ts=ts, package_title="Wikipedia"),
+            PackageHomeVisit(package_title="Wikipedia"),
+        ],
+        ts=ts,
+        warning=None,
+    )
+
+
+def test_processor_clock_back_and_forth(
+    processor: Processor,
+    fake_now: FakeNow,
+    dbsession: Session,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(
+        processor,
+        "_process_tick_in_new_session",
+        lambda now: processor._process_tick(  # pyright: ignore[reportPrivateUsage]
+            now=now, session=dbsession
+        ),
+    )
+    monkeypatch.setattr(
+        processor,
+        "_restore_reopened_period_in_new_session",
+        lambda: processor.indicator_processor.restore_reopened_period(
+            session=dbsession
+        ),
+    )
+    fake_now.timestamp = int(datetime.datetime(2023, 6, 8, 10, 50).timestamp())
+    processor.check_for_inactivity()
+    fake_now.sleep(60)
+    processor.process_inputs(visit_at(fake_now.timestamp))
+    # forward across the hour, 10:00 period is closed
+    fake_now.sleep(10 * 60)
+    processor.check_for_inactivity()
+    assert db_records(dbsession, Uptime.unique_id, 10) == [10]
+    assert db_records(dbsession, TotalUsageOverall.unique_id, 10) == [10]
+    assert db_records(dbsession, PackageHomeVisitIndicator.unique_id, 10) == [1]
+    processor.process_inputs(visit_at(fake_now.timestamp))
+
+    # clock went back, 11:00 period is closed and 10:00 period re-opened
+    fake_now.timestamp = int(datetime.datetime(2023, 6, 8, 10, 40).timestamp())
+    processor.check_for_inactivity()
+    processor.process_inputs(visit_at(fake_now.timestamp))
+    # forward across the hour again, 10:00 period is closed again
+    fake_now.sleep(21 * 60)
+    processor.check_for_inactivity()
+    processor.process_inputs(visit_at(fake_now.timestamp))
+    fake_now.sleep(60 * 60)
+    processor.check_for_inactivity()
+
+    # time measured is not counted twice, counters are
+    assert db_records(dbsession, Uptime.unique_id, 10) == [20]
+    assert db_records(dbsession, TotalUsageOverall.unique_id, 10) == [10]
+    assert db_records(dbsession, PackageHomeVisitIndicator.unique_id, 10) == [2]
+    # 11:00 period has been re-opened as well
+    assert db_records(dbsession, PackageHomeVisitIndicator.unique_id, 11) == [2]
+    assert db_records(dbsession, TotalUsageOverall.unique_id, 11) == [10]
+    assert processor.reopened_until is None
+
+
+def test_processor_older_lines_no_tick(
+    processor: Processor, monkeypatch: pytest.MonkeyPatch
+):
+    ticks: list[int] = []
+    monkeypatch.setattr(processor, "_process_tick", lambda now, **_: ticks.append(now))
+
+    processor.process_inputs(result_at(1))
+    processor.process_inputs(result_at(0))
+    processor.process_batch(batch=batch_at(0, 1))
+    assert ticks == []
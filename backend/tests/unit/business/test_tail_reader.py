@@ -0,0 +1,254 @@
+import gzip
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from offspot_metrics_backend.business.tail_reader import (
+    CompressedTailReader,
+    GzipTailReader,
+    TailReader,
+    open_reader,
+    uncompressed_path,
+)
+
+
+@pytest.fixture
+def log_file(tmp_path: Path) -> Path:
+    return tmp_path.joinpath("caddy_access_logs.json")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4, 1024])
+def test_tail_reader_chunks(log_file: Path, chunk_size: int):
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL22\nL333\nL4")
+
+    reader = TailReader(log_file, chunk_size=chunk_size)
+
+    assert list(reader.read_lines()) == [("L1", 3), ("L22", 7), ("L333", 12)]
+    assert reader.position == 12
+
+    with open(log_file, mode="a") as fh:
+        fh.write("4\nL5")
+
+    assert list(reader.read_lines()) == [("L44", 16)]
+    assert list(reader.read_lines()) == []
+
+    with open(log_file, mode="a") as fh:
+        fh.write("\n")
+
+    assert list(reader.read_lines()) == [("L5", 19)]
+    reader.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5])
+def test_tail_reader_multibyte_chars(log_file: Path, chunk_size: int):
+    with open(log_file, mode="w") as fh:
+        fh.write("L1😁1\nL1😤2\n")
+
+    reader = TailReader(log_file, chunk_size=chunk_size)
+
+    assert list(reader.read_lines()) == [("L1😁1", 8), ("L1😤2", 16)]
+    reader.close()
+
+
+def test_tail_reader_start_position(log_file: Path):
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL2\nL3\n")
+
+    reader = TailReader(log_file, position=3)
+
+    assert list(reader.read_lines()) == [("L2", 6), ("L3", 9)]
+    reader.close()
+
+
+def test_tail_reader_truncated(log_file: Path):
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL2\nL3\n")
+
+    reader = TailReader(log_file)
+    assert list(reader.read_lines()) == [("L1", 3), ("L2", 6), ("L3", 9)]
+
+    with open(log_file, mode="w") as fh:
+        fh.write("M1\n")
+
+    assert list(reader.read_lines()) == [("M1", 3)]
+    reader.close()
+
+
+def test_tail_reader_moved_file(log_file: Path):
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\n")
+
+    reader = TailReader(log_file)
+    assert list(reader.read_lines()) == [("L1", 3)]
+
+    moved_file = log_file.with_name("caddy_access_logs-2024-01-06T13-43-07.371.json")
+    log_file.rename(moved_file)
+    with open(moved_file, mode="a") as fh:
+        fh.write("L2\n")
+
+    assert list(reader.read_lines()) == [("L2", 6)]
+    reader.close()
+
+
+def test_tail_reader_line_too_long(log_file: Path):
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\n" + "X" * 20)
+
+    reader = TailReader(log_file, chunk_size=4, max_line_size=10)
+    assert list(reader.read_lines()) == [("L1", 3)]
+
+    with open(log_file, mode="a") as fh:
+        fh.write("XXX\nL2\n")
+
+    assert list(reader.read_lines()) == [("L2", 30)]
+    reader.close()
+
+
+def gzip_lines(*lines: str) -> bytes:
+    return gzip.compress("".join(f"{line}\n" for line in lines).encode())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_gzip_tail_reader(tmp_path: Path, chunk_size: int):
+    log_file = tmp_path.joinpath("caddy_access_logs.json.gz")
+    # concatenated gzip streams are valid gzip files
+    log_file.write_bytes(gzip_lines("L1", "L2😁") + gzip_lines("L3"))
+
+    reader = open_reader(log_file, chunk_size=chunk_size)
+
+    assert isinstance(reader, GzipTailReader)
+    assert list(reader.read_lines()) == [("L1", 3), ("L2😁", 10), ("L3", 13)]
+    assert reader.complete
+    reader.close()
+
+
+def test_gzip_tail_reader_seek(tmp_path: Path):
+    log_file = tmp_path.joinpath("caddy_access_logs.json.gz")
+    log_file.write_bytes(gzip_lines(*[f"L{index}" for index in range(1000)]))
+
+    reader = GzipTailReader(log_file, position=3, chunk_size=16)
+
+    lines = list(reader.read_lines())
+    assert lines[0] == ("L1", 6)
+    assert lines[-1][0] == "L999"
+    reader.close()
+
+
+def test_gzip_tail_reader_file_being_written(tmp_path: Path):
+    log_file = tmp_path.joinpath("caddy_access_logs.json.gz")
+    data = gzip_lines(*[f"L{index}" for index in range(1000)])
+    log_file.write_bytes(data[:100])
+
+    reader = GzipTailReader(log_file, chunk_size=16)
+    assert not reader.has_start(100000)
+    lines = list(reader.read_lines())
+    assert not reader.complete
+
+    with open(log_file, mode="ab") as fh:
+        fh.write(data[100:])
+
+    assert reader.has_start(100000)
+    lines += list(reader.read_lines())
+    assert [line for line, _ in lines] == [f"L{index}" for index in range(1000)]
+    assert reader.complete
+    reader.close()
+
+
+def test_gzip_tail_reader_fingerprint(tmp_path: Path, log_file: Path):
+    with open(log_file, mode="w") as fh:
+        fh.write("L1\nL2\n")
+    compressed_file = tmp_path.joinpath("caddy_access_logs.json.gz")
+    compressed_file.write_bytes(gzip_lines("L1", "L2", "L3"))
+
+    reader = TailReader(log_file)
+    compressed_reader = GzipTailReader(compressed_file)
+
+    assert compressed_reader.fingerprint(reader.fingerprint()[1]) == (
+        reader.fingerprint()
+    )
+    reader.close()
+    compressed_reader.close()
+
+
+def test_zstd_tail_reader(tmp_path: Path):
+    zstandard = pytest.importorskip("zstandard")
+    log_file = tmp_path.joinpath("caddy_access_logs.json.zst")
+    log_file.write_bytes(zstandard.ZstdCompressor().compress(b"L1\nL2\n"))
+
+    reader = open_reader(log_file)
+
+    assert list(reader.read_lines()) == [("L1", 3), ("L2", 6)]
+    assert reader.complete
+    reader.close()
+
+
+def zstd_compress(data: bytes) -> bytes:
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def test_zstd_tail_reader_file_being_written(tmp_path: Path):
+    log_file = tmp_path.joinpath("caddy_access_logs.json.zst")
+    lines = [f"L{index}" for index in range(1000)]
+    # concatenated frames, second one being written
+    data = zstd_compress("".join(f"{line}\n" for line in lines[:500]).encode())
+    data += zstd_compress("".join(f"{line}\n" for line in lines[500:]).encode())
+    log_file.write_bytes(data[:-100])
+
+    reader = open_reader(log_file, chunk_size=16)
+    read = list(reader.read_lines())
+    assert not reader.complete
+
+    with open(log_file, mode="ab") as fh:
+        fh.write(data[-100:])
+
+    read += list(reader.read_lines())
+    assert [line for line, _ in read] == lines
+    assert reader.complete
+    reader.close()
+
+
+@pytest.mark.parametrize(
+    "suffix, compress", [(".gz", gzip.compress), (".zst", zstd_compress)]
+)
+def test_compressed_tail_reader_bounded_output(
+    tmp_path: Path,
+    suffix: str,
+    compress: Callable[[bytes], bytes],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    log_file = tmp_path.joinpath(f"caddy_access_logs.json{suffix}")
+    # highly compressible data must not be decompressed at once
+    log_file.write_bytes(compress(b"L1\n" + b"a" * 8 * 1024 * 1024 + b"\nL2\n"))
+
+    reader = open_reader(log_file, chunk_size=1024)
+    assert isinstance(reader, CompressedTailReader)
+    read_chunk = reader._read_chunk  # pyright: ignore[reportPrivateUsage]
+    chunk_sizes: list[int] = []
+
+    def bounded_read_chunk() -> bytes:
+        chunk = read_chunk()
+        chunk_sizes.append(len(chunk))
+        return chunk
+
+    monkeypatch.setattr(reader, "_read_chunk", bounded_read_chunk)
+
+    assert reader.fingerprint(1024)[1] == 1024
+    assert [line for line, _ in reader.read_lines()] == ["L1", "L2"]
+    assert max(chunk_sizes) <= 1024
+    assert reader.complete
+    reader.close()
+
+
+@pytest.mark.parametrize(
+    "file_name, expected",
+    [
+        ("caddy_access_logs.json", "caddy_access_logs.json"),
+        ("caddy_access_logs.json.gz", "caddy_access_logs.json"),
+        ("caddy_access_logs.json.bz2", "caddy_access_logs.json.bz2"),
+    ],
+)
+def test_uncompressed_path(file_name: str, expected: str):
+    assert uncompressed_path(Path(file_name)) == Path(expected)
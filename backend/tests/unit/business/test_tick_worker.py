@@ -0,0 +1,53 @@
+import threading
+
+from offspot_metrics_backend.business.tick_worker import TickWorker
+
+
+def test_tick_worker_in_order():
+    handled: list[int] = []
+    worker = TickWorker[int](handler=handled.append)
+    worker.start()
+    for job in range(5):
+        worker.submit(job)
+    worker.join()
+    assert handled == [0, 1, 2, 3, 4]
+    assert worker.stats()["handled"] == 5
+    assert worker.stats()["pending"] == 0
+    worker.stop()
+    assert not worker.thread.is_alive()
+
+
+def test_tick_worker_failure():
+    handled: list[int] = []
+
+    def handler(job: int):
+        if job == 1:
+            raise ValueError("Failing job")
+        handled.append(job)
+
+    worker = TickWorker[int](handler=handler)
+    worker.start()
+    for job in range(3):
+        worker.submit(job)
+    worker.stop()
+    assert handled == [0, 2]
+    assert worker.stats()["handled"] == 3
+    assert worker.stats()["failed"] == 1
+
+
+def test_tick_worker_stop_handles_pending_jobs():
+    release = threading.Event()
+    handled: list[int] = []
+
+    def handler(job: int):
+        release.wait()
+        handled.append(job)
+
+    worker = TickWorker[int](handler=handler)
+    worker.start()
+    for job in range(3):
+        worker.submit(job)
+    assert handled == []
+    release.set()
+    worker.stop()
+    assert handled == [0, 1, 2]
@@ -0,0 +1,23 @@
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+from offspot_metrics_backend.business.telemetry import Metrics, telemetry
+
+
+@pytest.mark.asyncio
+async def test_telemetry(client: AsyncClient):
+    def failing_provider() -> Metrics:
+        raise ValueError("Failing provider")
+
+    telemetry.register("test", lambda: {"depth_lines": 12, "mode": "polling"})
+    telemetry.register("failing", failing_provider)
+    try:
+        response = await client.get("/v1/telemetry")
+    finally:
+        del telemetry.providers["test"]
+        del telemetry.providers["failing"]
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["values"]["test"] == {"depth_lines": 12, "mode": "polling"}
+    assert "failing" not in response.json()["values"]